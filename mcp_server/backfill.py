@@ -0,0 +1,341 @@
+# backfill.py
+import asyncio
+import json
+import os
+import time
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+import numpy as np
+from mcp_server.bar_store import (
+    COLUMNS,
+    bar_store,
+    bars_to_columns,
+    columns_to_bars,
+    duration_seconds,
+    format_start_time,
+    parse_start_time,
+    payload_meta,
+)
+from mcp_server.config import BACKFILL_CONCURRENCY, BACKFILL_RETRIES, BAR_STORE_PATH
+from mcp_server.history_rules import parse_bar_range
+from mcp_server.hmds import hmds_session
+
+
+# --- Window Planning ---
+
+def window_period(bar: str, rules: Dict[str, Any]) -> Tuple[str, int]:
+    """
+    Picks the longest HMDS period that allows `bar`, from the "bar_units_by_period" table of the history
+    rules, e.g. "1d": "mins, hrs, d (1 min -> 1 day)". Returns the period string and its length in seconds.
+    """
+    bar_seconds = duration_seconds(bar)
+    if not bar_seconds:
+        raise ValueError(f"Unrecognized bar size '{bar}'.")
+    best: Optional[Tuple[str, int]] = None
+    for period, description in rules.get("bar_units_by_period", {}).items():
+        bounds = parse_bar_range(description)
+        period_seconds = duration_seconds(period)
+        if not bounds or not period_seconds:
+            continue
+        smallest, largest = bounds
+        if smallest <= bar_seconds <= largest and (best is None or period_seconds > best[1]):
+            best = (period, period_seconds)
+    if best is None:
+        raise ValueError(f"No HMDS period allows bar size '{bar}'.")
+    return best
+
+
+def plan_windows(start: float, end: float, window_seconds: int) -> List[Tuple[float, float]]:
+    """Splits [start, end] into consecutive windows of at most `window_seconds`, newest last."""
+    windows = []
+    window_end = end
+    while window_end > start:
+        windows.append((max(window_end - window_seconds, start), window_end))
+        window_end -= window_seconds
+    return windows[::-1]
+
+
+# --- Jobs ---
+
+class BackfillJob:
+    """One backfill request: its parameters, planned windows and which of them have been fetched."""
+
+    def __init__(self, job_id: str, params: Dict[str, Any], period: str, windows: List[Tuple[float, float]]):
+        self.id = job_id
+        self.params = params
+        self.period = period
+        self.windows = windows
+        self.done: Dict[int, int] = {}  # window index -> bars fetched
+        self.errors: Dict[int, str] = {}
+        self.status = "pending"
+        self.created_at = time.time()
+        self.finished_at: Optional[float] = None
+        self.meta: Dict[str, Any] = {}
+        self.task: Optional[asyncio.Task] = None
+
+    def progress(self) -> Dict[str, Any]:
+        total = len(self.windows)
+        return {
+            "jobId": self.id,
+            "status": self.status,
+            **self.params,
+            "period": self.period,
+            "windows": total,
+            "windowsDone": len(self.done),
+            "progress": round(len(self.done) / total, 4) if total else 1.0,
+            "barsFetched": sum(self.done.values()),
+            "errors": {str(index): error for index, error in sorted(self.errors.items())},
+            "createdAt": self.created_at,
+            "finishedAt": self.finished_at,
+        }
+
+    def to_json(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "params": self.params,
+            "period": self.period,
+            "windows": self.windows,
+            "done": {str(index): count for index, count in self.done.items()},
+            "errors": {str(index): error for index, error in self.errors.items()},
+            "status": self.status,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+            "meta": self.meta,
+        }
+
+    @classmethod
+    def from_json(cls, data: Dict[str, Any]) -> "BackfillJob":
+        job = cls(data["id"], data["params"], data["period"], [tuple(window) for window in data["windows"]])
+        job.done = {int(index): count for index, count in data.get("done", {}).items()}
+        job.errors = {int(index): error for index, error in data.get("errors", {}).items()}
+        job.status = data.get("status", "pending")
+        job.created_at = data.get("created_at", job.created_at)
+        job.finished_at = data.get("finished_at")
+        job.meta = data.get("meta", {})
+        return job
+
+
+class BackfillManager:
+    """
+    Long-range HMDS backfill.
+
+    A date range is split into windows of the longest period the HMDS rules allow for the bar size. Windows
+    are fetched concurrently (bounded by `concurrency`, and by the pacing scheduler's HMDS limits), each
+    anchored with `startTime` at its end. Every finished window is written to disk with the job state, so
+    an interrupted job resumes with only the missing windows. When all windows are in, the bars are
+    de-duplicated by timestamp, clipped to the range, and merged into the historical bar store.
+    """
+
+    def __init__(self, path: str = os.path.join(BAR_STORE_PATH, "backfill"), concurrency: int = BACKFILL_CONCURRENCY, retries: int = BACKFILL_RETRIES):
+        self.path = path
+        self.concurrency = concurrency
+        self.retries = retries
+        self._jobs: Dict[str, BackfillJob] = {}
+        self._loaded = False
+
+    # --- Job lifecycle ---
+
+    def create(self, conid: str, bar: str, start_time: str, end_time: Optional[str], bar_type: str, outside_rth: bool, rules: Dict[str, Any]) -> BackfillJob:
+        start = parse_start_time(start_time)
+        end = parse_start_time(end_time) if end_time else time.time()
+        if end <= start:
+            raise ValueError("endTime must be after startTime.")
+        period, window_seconds = window_period(bar, rules)
+        params = {
+            "conid": conid,
+            "bar": bar,
+            "barType": bar_type,
+            "outsideRth": outside_rth,
+            "startTime": format_start_time(start),
+            "endTime": format_start_time(end),
+        }
+        job = BackfillJob(uuid.uuid4().hex[:12], params, period, plan_windows(start, end, window_seconds))
+        self._jobs[job.id] = job
+        self._save(job)
+        self.start(job)
+        return job
+
+    def start(self, job: BackfillJob) -> None:
+        if job.task is None or job.task.done():
+            job.status = "running"
+            job.errors.clear()
+            job.task = asyncio.get_running_loop().create_task(self._run(job))
+
+    def get(self, job_id: str) -> Optional[BackfillJob]:
+        self._load_all()
+        return self._jobs.get(job_id)
+
+    def list(self) -> List[BackfillJob]:
+        self._load_all()
+        return sorted(self._jobs.values(), key=lambda job: job.created_at, reverse=True)
+
+    async def cancel(self, job: BackfillJob) -> None:
+        if job.task is not None and not job.task.done():
+            job.task.cancel()
+            try:
+                await job.task
+            except asyncio.CancelledError:
+                pass
+        if job.status == "running":
+            job.status = "cancelled"
+            self._save(job)
+
+    async def _run(self, job: BackfillJob) -> None:
+        semaphore = asyncio.Semaphore(self.concurrency)
+        pending = [index for index in range(len(job.windows)) if index not in job.done]
+
+        async def fetch(index: int) -> None:
+            async with semaphore:
+                await self._fetch_window(job, index)
+
+        tasks = [asyncio.ensure_future(fetch(index)) for index in pending]
+        try:
+            await asyncio.gather(*tasks)
+            if job.errors:
+                job.status = "failed"
+            else:
+                self._stitch(job)
+                job.status = "completed"
+            job.finished_at = time.time()
+        except asyncio.CancelledError:
+            job.status = "cancelled"
+            raise
+        except Exception as exc:
+            job.status = "failed"
+            job.finished_at = time.time()
+            print(f"⚠️ Warning: backfill job '{job.id}' failed: {exc!r}")
+        finally:
+            # A failed window must not leave the others fetching for a job that is already over.
+            for task in tasks:
+                task.cancel()
+            self._save(job)
+
+    async def _fetch_window(self, job: BackfillJob, index: int) -> None:
+        _, window_end = job.windows[index]
+        params = {
+            "conid": job.params["conid"],
+            "period": job.period,
+            "bar": job.params["bar"],
+            "barType": job.params["barType"],
+            "outsideRth": str(job.params["outsideRth"]).lower(),
+            "startTime": format_start_time(window_end),
+        }
+        for attempt in range(self.retries + 1):
+            try:
+                response = await hmds_session.get("/hmds/history", params=params)
+                response.raise_for_status()
+                payload = response.json()
+                break
+            except httpx.HTTPStatusError as exc:
+                error = f"{exc.response.status_code}: {exc.response.text[:200]}"
+            except httpx.RequestError as exc:
+                error = str(exc) or type(exc).__name__
+            except ValueError as exc:
+                error = f"Invalid JSON: {exc}"
+            if attempt < self.retries:
+                await asyncio.sleep(2 ** attempt)
+        else:
+            job.errors[index] = error
+            return
+        if not isinstance(payload, dict):
+            job.errors[index] = f"Unexpected payload: {str(payload)[:200]}"
+            return
+        try:
+            columns = bars_to_columns(payload.get("data") or [])
+            np.savez(self._window_path(job, index), **columns)
+        except (OSError, TypeError, ValueError) as exc:
+            job.errors[index] = f"Could not store window: {exc}"
+            return
+        job.meta = payload_meta(payload)
+        job.done[index] = len(columns["t"])
+        self._save(job)
+
+    def _stitch(self, job: BackfillJob) -> None:
+        parts = [self._load_window(job, index) for index in range(len(job.windows))]
+        start, end = parse_start_time(job.params["startTime"]), parse_start_time(job.params["endTime"])
+        columns = stitch(parts, start, end)
+        np.savez(os.path.join(self._dir(job), "series.npz"), **columns)
+        key = bar_store.key("hmds", job.params["conid"], job.params["bar"], job.params["barType"], job.params["outsideRth"])
+        bar_store.absorb(key, columns, start, end, job.meta)
+
+    # --- Results ---
+
+    def bars(self, job: BackfillJob, offset: int = 0, limit: int = 5000) -> Dict[str, Any]:
+        """History-shaped page of the stitched series (or of the windows fetched so far, while running)."""
+        series_path = os.path.join(self._dir(job), "series.npz")
+        if os.path.exists(series_path):
+            with np.load(series_path) as data:
+                columns = {name: data[name] for name in COLUMNS}
+        else:
+            start, end = parse_start_time(job.params["startTime"]), parse_start_time(job.params["endTime"])
+            columns = stitch([self._load_window(job, index) for index in sorted(job.done)], start, end)
+        total = len(columns["t"])
+        page = {name: column[offset:offset + limit] for name, column in columns.items()}
+        return {
+            **job.meta,
+            "jobId": job.id,
+            "status": job.status,
+            "data": columns_to_bars(page),
+            "points": len(page["t"]),
+            "offset": offset,
+            "total": total,
+        }
+
+    # --- Persistence ---
+
+    def _dir(self, job: BackfillJob) -> str:
+        return os.path.join(self.path, job.id)
+
+    def _window_path(self, job: BackfillJob, index: int) -> str:
+        return os.path.join(self._dir(job), f"window_{index:05d}.npz")
+
+    def _load_window(self, job: BackfillJob, index: int) -> Dict[str, np.ndarray]:
+        with np.load(self._window_path(job, index)) as data:
+            return {name: data[name] for name in COLUMNS}
+
+    def _save(self, job: BackfillJob) -> None:
+        os.makedirs(self._dir(job), exist_ok=True)
+        target = os.path.join(self._dir(job), "job.json")
+        with open(target + ".tmp", "w") as handle:
+            json.dump(job.to_json(), handle)
+        os.replace(target + ".tmp", target)
+
+    def _load_all(self) -> None:
+        """Picks up jobs left on disk by a previous process; running ones are marked interrupted."""
+        if self._loaded:
+            return
+        self._loaded = True
+        if not os.path.isdir(self.path):
+            return
+        for job_id in os.listdir(self.path):
+            job_file = os.path.join(self.path, job_id, "job.json")
+            if job_id in self._jobs or not os.path.exists(job_file):
+                continue
+            try:
+                with open(job_file) as handle:
+                    job = BackfillJob.from_json(json.load(handle))
+            except (OSError, ValueError, KeyError) as exc:
+                print(f"⚠️ Warning: skipping unreadable backfill job '{job_id}': {exc}")
+                continue
+            if job.status in ("pending", "running"):
+                job.status = "interrupted"
+            self._jobs[job.id] = job
+
+
+def stitch(parts: List[Dict[str, np.ndarray]], start: float, end: float) -> Dict[str, np.ndarray]:
+    """Concatenates window columns, keeps one bar per timestamp (the later window wins) and clips to [start, end]."""
+    if not parts:
+        return bars_to_columns([])
+    merged = {name: np.concatenate([part[name] for part in parts]) for name in COLUMNS}
+    # np.unique keeps the first occurrence, so search the reversed arrays to let later windows win.
+    reversed_t = merged["t"][::-1]
+    _, first = np.unique(reversed_t, return_index=True)
+    keep = len(reversed_t) - 1 - first
+    columns = {name: column[keep] for name, column in merged.items()}
+    inside = (columns["t"] >= int(start * 1000)) & (columns["t"] <= int(end * 1000))
+    return {name: column[inside] for name, column in columns.items()}
+
+
+backfill_manager = BackfillManager()
@@ -0,0 +1,427 @@
+# bar_store.py
+import asyncio
+import json
+import math
+import os
+import re
+import time
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+from mcp_server.config import BAR_STORE_PATH
+from mcp_server.resample import can_derive, resample
+
+COLUMNS = ("t", "o", "h", "l", "c", "v")
+# Slack (seconds) allowed between a requested window end and the end a series covers before it counts as a gap.
+COVERAGE_EPSILON = 1.0
+
+# --- Period and Bar Parsing ---
+# Unit -> seconds. iServer uses min/h/d/w/m/y, HMDS uses S/secs/mins/hrs/d/w/m/y; "m" is a month in both.
+# The spelled-out units appear in the history rules tables ("1 day", "4 hrs").
+
+UNIT_SECONDS = {
+    "s": 1, "S": 1, "sec": 1, "secs": 1,
+    "min": 60, "mins": 60,
+    "h": 3600, "hr": 3600, "hrs": 3600, "hour": 3600, "hours": 3600,
+    "d": 86400, "D": 86400, "day": 86400, "days": 86400,
+    "w": 7 * 86400, "W": 7 * 86400, "week": 7 * 86400, "weeks": 7 * 86400,
+    "m": 30 * 86400, "M": 30 * 86400, "month": 30 * 86400, "months": 30 * 86400,
+    "y": 365 * 86400, "Y": 365 * 86400, "year": 365 * 86400, "years": 365 * 86400,
+}
+_DURATION = re.compile(r"^\s*(\d+)\s*([A-Za-z]+)\s*$")
+
+
+def duration_seconds(value: str) -> Optional[int]:
+    """Parses a period or bar size such as '1y', '3600S', '5min' or '1h' into seconds; None if unknown."""
+    match = _DURATION.match(value or "")
+    if not match:
+        return None
+    unit = UNIT_SECONDS.get(match.group(2))
+    return int(match.group(1)) * unit if unit else None
+
+
+def format_period(seconds: float, hmds: bool) -> str:
+    """Smallest legal period string covering `seconds`, in the unit style of the target endpoint."""
+    seconds = max(int(math.ceil(seconds)), 1)
+    if hmds:
+        if seconds <= 86400:
+            return f"{seconds}S"
+        days = math.ceil(seconds / 86400)
+        return f"{days}d" if days <= 365 else f"{math.ceil(days / 365)}y"
+    if seconds <= 30 * 60:
+        return f"{math.ceil(seconds / 60)}min"
+    if seconds <= 8 * 3600:
+        return f"{math.ceil(seconds / 3600)}h"
+    days = math.ceil(seconds / 86400)
+    if days <= 1000:
+        return f"{days}d"
+    weeks = math.ceil(days / 7)
+    return f"{weeks}w" if weeks <= 792 else f"{math.ceil(days / 365)}y"
+
+
+def min_period_seconds(bar_seconds: int) -> int:
+    """Shortest period the gateway accepts for a bar size (daily bars need >= 1w, weekly/monthly >= 1m)."""
+    if bar_seconds >= 7 * 86400:
+        return 30 * 86400
+    if bar_seconds >= 86400:
+        return 7 * 86400
+    return bar_seconds
+
+
+def parse_start_time(value: str) -> float:
+    """Parses the gateway 'YYYYMMDD-hh:mm:ss' format (UTC) into epoch seconds."""
+    return datetime.strptime(value, "%Y%m%d-%H:%M:%S").replace(tzinfo=timezone.utc).timestamp()
+
+
+def format_start_time(epoch: float) -> str:
+    return datetime.fromtimestamp(epoch, tz=timezone.utc).strftime("%Y%m%d-%H:%M:%S")
+
+
+# --- Series ---
+
+class BarSeries:
+    """
+    Bars for one (source, conid, bar, barType, outsideRth) key as column arrays, plus the time window
+    [start, end] (epoch seconds) that previous requests have covered and the latest response header.
+    """
+
+    def __init__(self, columns: Dict[str, np.ndarray], start: float, end: float, meta: Dict[str, Any]):
+        self.columns = columns
+        self.start = start
+        self.end = end
+        self.meta = meta
+
+    @classmethod
+    def from_payload(cls, payload: Dict[str, Any], start: float, end: float) -> "BarSeries":
+        return cls(bars_to_columns(payload.get("data") or []), start, end, payload_meta(payload))
+
+    def __len__(self) -> int:
+        return len(self.columns["t"])
+
+    def merge(self, payload: Dict[str, Any], start: float, end: float) -> None:
+        """Merges freshly fetched bars in; bars from the new payload replace stored bars with the same timestamp."""
+        new = bars_to_columns(payload.get("data") or [])
+        keep = ~np.isin(self.columns["t"], new["t"])
+        merged_t = np.concatenate([self.columns["t"][keep], new["t"]])
+        order = np.argsort(merged_t, kind="stable")
+        self.columns = {
+            name: np.concatenate([self.columns[name][keep], new[name]])[order] for name in COLUMNS
+        }
+        self.start = min(self.start, start)
+        self.end = max(self.end, end)
+        self.meta = payload_meta(payload)
+
+    def window(self, start: float, end: float) -> Dict[str, np.ndarray]:
+        t = self.columns["t"]
+        lo = int(np.searchsorted(t, int(start * 1000), side="left"))
+        hi = int(np.searchsorted(t, int(end * 1000), side="right"))
+        return {name: self.columns[name][lo:hi] for name in COLUMNS}
+
+
+def bars_to_columns(bars: List[Dict[str, Any]]) -> Dict[str, np.ndarray]:
+    rows = [bar for bar in bars if isinstance(bar, dict) and bar.get("t") is not None]
+    columns = {"t": np.fromiter((int(bar["t"]) for bar in rows), dtype=np.int64, count=len(rows))}
+    for name in COLUMNS[1:]:
+        columns[name] = np.fromiter((float(bar.get(name) or 0.0) for bar in rows), dtype=np.float64, count=len(rows))
+    order = np.argsort(columns["t"], kind="stable")
+    return {name: column[order] for name, column in columns.items()}
+
+
+def columns_to_bars(columns: Dict[str, np.ndarray]) -> List[Dict[str, Any]]:
+    t = columns["t"].tolist()
+    values = [columns[name].tolist() for name in COLUMNS[1:]]
+    return [
+        {"o": o, "c": c, "h": h, "l": l, "v": v, "t": ts}
+        for ts, o, h, l, c, v in zip(t, *values)
+    ]
+
+
+def payload_meta(payload: Dict[str, Any]) -> Dict[str, Any]:
+    return {key: value for key, value in payload.items() if key not in ("data", "points", "travelTime")}
+
+
+# --- Store ---
+
+# (period, startTime, bar) -> history payload; bar is None for the requested bar size, or a finer one to top up.
+Fetcher = Callable[[str, Optional[str], Optional[str]], Awaitable[Dict[str, Any]]]
+
+
+class _Unusable(Exception):
+    """Raised when the gateway answers with something other than a bar payload; it is passed through as-is."""
+
+    def __init__(self, payload: Any):
+        super().__init__("unusable history payload")
+        self.payload = payload
+
+
+class BarStore:
+    """
+    Historical bar cache with incremental range fill.
+
+    A request is turned into a time window ending at `startTime` (or now) and spanning `period`. Windows
+    inside what is already covered are answered from the column arrays without any gateway call; otherwise
+    only the missing leading and/or trailing range is fetched, using `startTime` to anchor the request.
+    A window counts as covered only up to the end the series was fetched for (plus COVERAGE_EPSILON), so a
+    request anchored to now always refetches from the last stored bar onward, replacing a bar that was still
+    forming when it was stored. Before going upstream, a window the requested bar
+    size does not cover is derived from a finer series of the same contract that does, by resampling; for a
+    window ending now, that series' trailing bars are topped up first the same way.
+    Every payload carries `barStore`: hit, partial, miss or derived. Series are persisted as .npy files under `path`
+    and re-opened memory-mapped, so a restart keeps the cache without loading every series into RAM.
+    """
+
+    def __init__(self, path: str = BAR_STORE_PATH):
+        self.path = path
+        self._series: Dict[str, BarSeries] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._keys: Optional[set] = None
+        self.hits = 0
+        self.partial = 0
+        self.misses = 0
+        self.derived = 0
+        self.upstream_calls = 0
+        self._writable = True
+
+    @staticmethod
+    def key(source: str, conid: str, bar: str, bar_type: str, outside_rth: bool, exchange: Optional[str] = None) -> str:
+        parts = [source, str(conid), bar, bar_type or "trades", "rth0" if not outside_rth else "rth1"]
+        if exchange:
+            parts.append(exchange)
+        return "_".join(re.sub(r"[^A-Za-z0-9.-]", "-", part) for part in parts)
+
+    async def get(
+        self,
+        key: str,
+        period: str,
+        bar: str,
+        fetch: Fetcher,
+        hmds: bool = False,
+        start_time: Optional[str] = None,
+    ) -> Tuple[Optional[Dict[str, Any]], str]:
+        """
+        Returns (payload, status) where status is 'hit', 'partial', 'miss' or 'derived'. The payload has the gateway's
+        history shape. Returns (None, 'bypass') when the period, bar or start time cannot be interpreted, and
+        (gateway payload, 'bypass') when the gateway answers without bars.
+        """
+        period_seconds = duration_seconds(period)
+        bar_seconds = duration_seconds(bar)
+        try:
+            end = parse_start_time(start_time) if start_time else time.time()
+        except ValueError:
+            return None, "bypass"
+        if not period_seconds or not bar_seconds:
+            return None, "bypass"
+        start = end - period_seconds
+        try:
+            payload, status = await self._get(key, start, end, period, period_seconds, bar_seconds, fetch, hmds, start_time)
+        except _Unusable as exc:
+            return exc.payload, "bypass"
+        payload["barStore"] = status
+        return payload, status
+
+    async def _get(
+        self,
+        key: str,
+        start: float,
+        end: float,
+        period: str,
+        period_seconds: int,
+        bar_seconds: int,
+        fetch: Fetcher,
+        hmds: bool,
+        start_time: Optional[str],
+    ) -> Tuple[Dict[str, Any], str]:
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            series = self._load(key)
+            # A window ending now always has a bar still forming, so only windows with a start time can be hits.
+            anchored = start_time is not None
+            if anchored and series is not None and series.start <= start and end <= series.end + COVERAGE_EPSILON:
+                self.hits += 1
+                status = "hit"
+            elif (derived := await self._derive(key, start, end, bar_seconds, period, fetch, hmds, start_time)) is not None:
+                self.derived += 1
+                return derived, "derived"
+            elif series is None or start > series.end or end < series.start or (series.start - start) + (end - series.end) > period_seconds:
+                # Nothing usable stored, or the gaps add up to more than the request itself: fetch it whole.
+                payload = await self._fetch(fetch, period, start_time)
+                series = BarSeries.from_payload(payload, start, end)
+                self.misses += 1
+                status = "miss"
+                self._save(key, series)
+            else:
+                if start < series.start:
+                    gap = max(series.start - start, min_period_seconds(bar_seconds))
+                    payload = await self._fetch(fetch, format_period(gap, hmds), format_start_time(series.start))
+                    series.merge(payload, start, series.end)
+                if not anchored or end > series.end + COVERAGE_EPSILON:
+                    await self._top_up(series, end, bar_seconds, fetch, hmds, start_time)
+                self.partial += 1
+                status = "partial"
+                self._save(key, series)
+        return self.render(series, start, end, period), status
+
+    async def _top_up(
+        self,
+        series: BarSeries,
+        end: float,
+        bar_seconds: int,
+        fetch: Fetcher,
+        hmds: bool,
+        start_time: Optional[str],
+        bar: Optional[str] = None,
+    ) -> None:
+        """Refetches from the last stored bar onward to `end`: that bar may have been a partial bar when stored."""
+        last_bar = series.columns["t"][-1] / 1000 if len(series) else series.end
+        gap = max(end - min(last_bar, series.end) + bar_seconds, min_period_seconds(bar_seconds))
+        payload = await self._fetch(fetch, format_period(gap, hmds), start_time, bar)
+        series.merge(payload, series.start, end)
+
+    async def _derive(
+        self,
+        key: str,
+        start: float,
+        end: float,
+        bar_seconds: int,
+        period: str,
+        fetch: Fetcher,
+        hmds: bool,
+        start_time: Optional[str],
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Builds the window from the coarsest stored finer series of the same contract that covers it. Without a
+        start time, a finer series counts as covering once its trailing bars are topped up, if that fetch is smaller
+        than the window itself.
+        """
+        anchored = start_time is not None
+        parts = key.split("_")
+        best: Optional[Tuple[int, str, BarSeries]] = None
+        for other in self._known_keys():
+            other_parts = other.split("_")
+            if len(other_parts) != len(parts) or other_parts[:2] != parts[:2] or other_parts[3:] != parts[3:]:
+                continue
+            fine_seconds = duration_seconds(other_parts[2])
+            if not fine_seconds or not can_derive(bar_seconds, fine_seconds) or (best and best[0] >= fine_seconds):
+                continue
+            series = self._load(other)
+            if series is None or series.start > start:
+                continue
+            # Topping up is worth it only while it returns no more bars than fetching the window whole would.
+            trailing = end - series.end
+            if trailing <= COVERAGE_EPSILON or (not anchored and trailing * bar_seconds <= (end - start) * fine_seconds):
+                best = (fine_seconds, other, series)
+        if best is None:
+            return None
+        fine_seconds, fine_key, series = best
+        fine_bar = fine_key.split("_")[2]
+        if not anchored:
+            # Lock order is always coarse to fine, so holding the requested key's lock here cannot deadlock.
+            async with self._locks.setdefault(fine_key, asyncio.Lock()):
+                series = self._load(fine_key)
+                await self._top_up(series, end, fine_seconds, fetch, hmds, None, fine_bar)
+                self._save(fine_key, series)
+        # Start one bar early so the bucket straddling `start` is built whole and then dropped.
+        columns = resample(series.window(start - bar_seconds, end), bar_seconds)
+        inside = columns["t"] >= int(start * 1000)
+        columns = {name: column[inside] for name, column in columns.items()}
+        meta = dict(series.meta)
+        if "barLength" in meta:
+            meta["barLength"] = bar_seconds
+        return {**meta, "timePeriod": period, "data": columns_to_bars(columns), "points": len(columns["t"]), "derivedFrom": fine_bar}
+
+    def _known_keys(self) -> List[str]:
+        """Keys of every stored series; the directory is listed once, after that `_save` keeps the index current."""
+        if self._keys is None:
+            self._keys = set()
+            if os.path.isdir(self.path):
+                self._keys.update(name for name in os.listdir(self.path) if os.path.exists(os.path.join(self.path, name, "meta.json")))
+        return sorted(self._keys | set(self._series))
+
+    def absorb(self, key: str, columns: Dict[str, np.ndarray], start: float, end: float, meta: Dict[str, Any]) -> None:
+        """Merges externally fetched bars (e.g. a finished backfill) covering [start, end] into a series."""
+        series = self._load(key)
+        if series is None or start > series.end or end < series.start:
+            # Disjoint ranges cannot be represented as one covered window; keep the longer one.
+            if series is not None and series.end - series.start >= end - start:
+                return
+            series = BarSeries({name: columns[name] for name in COLUMNS}, start, end, meta)
+        else:
+            series.merge({**meta, "data": columns_to_bars(columns)}, start, end)
+        self._save(key, series)
+
+    async def _fetch(self, fetch: Fetcher, period: str, start_time: Optional[str], bar: Optional[str] = None) -> Dict[str, Any]:
+        self.upstream_calls += 1
+        payload = await fetch(period, start_time, bar)
+        if not isinstance(payload, dict) or "data" not in payload:
+            raise _Unusable(payload)
+        return payload
+
+    @staticmethod
+    def render(series: BarSeries, start: float, end: float, period: str) -> Dict[str, Any]:
+        columns = series.window(start, end)
+        return {**series.meta, "timePeriod": period, "data": columns_to_bars(columns), "points": len(columns["t"])}
+
+    # --- Persistence ---
+
+    def _dir(self, key: str) -> str:
+        return os.path.join(self.path, key)
+
+    def _load(self, key: str) -> Optional[BarSeries]:
+        series = self._series.get(key)
+        if series is not None:
+            return series
+        directory = self._dir(key)
+        meta_path = os.path.join(directory, "meta.json")
+        if not os.path.exists(meta_path):
+            return None
+        try:
+            with open(meta_path) as handle:
+                meta = json.load(handle)
+            columns = {name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r") for name in COLUMNS}
+        except (OSError, ValueError) as exc:
+            print(f"⚠️ Warning: discarding unreadable bar series '{key}': {exc}")
+            return None
+        series = self._series[key] = BarSeries(columns, meta["start"], meta["end"], meta["header"])
+        return series
+
+    def _save(self, key: str, series: BarSeries) -> None:
+        self._series[key] = series
+        if self._keys is not None:
+            self._keys.add(key)
+        if not self._writable:
+            return
+        directory = self._dir(key)
+        try:
+            os.makedirs(directory, exist_ok=True)
+            for name in COLUMNS:
+                target = os.path.join(directory, f"{name}.npy")
+                with open(target + ".tmp", "wb") as handle:
+                    np.save(handle, np.ascontiguousarray(series.columns[name]))
+                os.replace(target + ".tmp", target)
+            with open(os.path.join(directory, "meta.json.tmp"), "w") as handle:
+                json.dump({"start": series.start, "end": series.end, "header": series.meta}, handle)
+            os.replace(os.path.join(directory, "meta.json.tmp"), os.path.join(directory, "meta.json"))
+        except OSError as exc:
+            self._writable = False
+            print(f"⚠️ Warning: bar store directory '{self.path}' is not writable ({exc}). Keeping bars in memory only.")
+            return
+        series.columns = {name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r") for name in COLUMNS}
+
+    def stats(self) -> Dict[str, Any]:
+        requests = self.hits + self.partial + self.misses + self.derived
+        return {
+            "path": self.path,
+            "persistent": self._writable,
+            "series_loaded": len(self._series),
+            "bars_loaded": sum(len(series) for series in self._series.values()),
+            "hits": self.hits,
+            "partial": self.partial,
+            "misses": self.misses,
+            "derived": self.derived,
+            "hit_rate": round(self.hits / requests, 4) if requests else 0.0,
+            "upstream_calls": self.upstream_calls,
+        }
+
+
+bar_store = BarStore()
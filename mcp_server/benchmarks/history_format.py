@@ -0,0 +1,65 @@
+# history_format.py
+"""
+Compares the payload size and serialization time of the history tools' `bars` (gateway) format against
+`format=columnar`, with and without a precision cap, on synthetic 1-minute bars.
+
+    python -m mcp_server.benchmarks.history_format [--points 500 5000 50000] [--repeat 20]
+"""
+import argparse
+import json
+import random
+import time
+from typing import Any, Callable, Dict, List
+
+from mcp_server.columnar import encode_columnar, format_history
+
+
+def synthetic_payload(points: int, seed: int = 7) -> Dict[str, Any]:
+    rng = random.Random(seed)
+    price = 187.25
+    t = 1_700_000_000_000
+    bars = []
+    for _ in range(points):
+        o = price
+        c = o + rng.gauss(0, 0.15)
+        h = max(o, c) + abs(rng.gauss(0, 0.05))
+        l = min(o, c) - abs(rng.gauss(0, 0.05))
+        bars.append({"o": o, "c": c, "h": h, "l": l, "v": float(rng.randint(100, 50_000)), "t": t})
+        price = c
+        t += 60_000
+    return {"serverId": "20477", "symbol": "AAPL", "text": "APPLE INC", "priceFactor": 100, "timePeriod": "1w",
+            "barLength": 60, "mdAvailability": "S", "outsideRth": False, "data": bars, "points": points}
+
+
+def measure(encode: Callable[[], Any], repeat: int) -> Dict[str, float]:
+    body = json.dumps(encode())
+    started = time.perf_counter()
+    for _ in range(repeat):
+        json.dumps(encode())
+    elapsed = (time.perf_counter() - started) / repeat
+    return {"bytes": len(body.encode()), "ms": elapsed * 1000}
+
+
+def run(points_list: List[int], repeat: int) -> None:
+    print(f"{'points':>8} {'format':<22} {'bytes':>12} {'ratio':>7} {'encode+dump ms':>15}")
+    for points in points_list:
+        payload = synthetic_payload(points)
+        variants = {
+            "bars": lambda: payload,
+            "bars precision=2": lambda: format_history(payload, "bars", 2),
+            "columnar": lambda: encode_columnar(payload),
+            "columnar precision=2": lambda: encode_columnar(payload, 2),
+        }
+        baseline = None
+        for name, encode in variants.items():
+            result = measure(encode, repeat)
+            baseline = baseline or result["bytes"]
+            print(f"{points:>8} {name:<22} {result['bytes']:>12,} {result['bytes'] / baseline:>7.2f} {result['ms']:>15.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark history response formats.")
+    parser.add_argument("--points", type=int, nargs="+", default=[500, 5000, 50000])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    run(args.points, args.repeat)
@@ -0,0 +1,143 @@
+# chain_materializer.py
+import asyncio
+import bisect
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import httpx
+
+from mcp_server.config import CHAIN_CONCURRENCY, CHAIN_MAX_REQUESTS
+from mcp_server.gateway import gateway
+from mcp_server.response_cache import cached
+
+RIGHTS = {"C": "call", "P": "put"}
+COLUMNS = ("expiry", "strike", "right", "conid")
+
+
+def parse_expiries(expiries: str) -> Tuple[List[str], Dict[str, Optional[Set[str]]]]:
+    """
+    Splits 'JAN25,20250221' into the months to query ('JAN25', 'FEB25') and, per month, the expiry dates
+    to keep (None keeps every expiry of a month given as MMMYY). Raises ValueError on anything else.
+    """
+    months: Dict[str, Optional[Set[str]]] = {}
+    for token in (part.strip().upper() for part in expiries.split(",")):
+        if not token:
+            continue
+        try:
+            if token.isdigit() and len(token) == 8:
+                month = datetime.strptime(token, "%Y%m%d").strftime("%b%y").upper()
+                if month not in months or months[month] is not None:
+                    months.setdefault(month, set()).add(token)
+            else:
+                datetime.strptime(token.title(), "%b%y")
+                months[token] = None
+        except ValueError:
+            raise ValueError(f"'{token}' is not an expiry. Use months such as 'JAN25' or dates such as '20250117'.") from None
+    if not months:
+        raise ValueError("No expiries given. Use months such as 'JAN25' or dates such as '20250117'.")
+    return list(months), months
+
+
+def strike_window(strikes: List[float], low: Optional[float], high: Optional[float], center: Optional[float], width: Optional[int]) -> List[float]:
+    """Strikes within [low, high], narrowed to the `width` strikes on each side of `center` when given."""
+    selected = sorted(strike for strike in strikes if (low is None or strike >= low) and (high is None or strike <= high))
+    if center is not None and width is not None:
+        index = bisect.bisect_left(selected, center)
+        selected = selected[max(0, index - width):index + width]
+    return selected
+
+
+async def _get(path: str, params: Dict[str, Any]) -> Any:
+    try:
+        response = await gateway.get(path, params=params)
+        response.raise_for_status()
+        return response.json()
+    except httpx.HTTPStatusError as exc:
+        return {"error": "IBKR API Error", "status_code": exc.response.status_code, "detail": exc.response.text}
+    except httpx.RequestError as exc:
+        return {"error": "Request Error", "detail": str(exc)}
+
+
+@cached(ttl=3600, max_entries=500, max_bytes=2_000_000)
+async def chain_strikes(conid: int, sec_type: str, month: str, exchange: str) -> Any:
+    """/iserver/secdef/strikes for one underlying and month."""
+    return await _get("/iserver/secdef/strikes", {"conid": conid, "secType": sec_type, "month": month, "exchange": exchange})
+
+
+@cached(ttl=3600, max_entries=20000, max_bytes=16_000_000)
+async def chain_contracts(conid: int, sec_type: str, month: str, exchange: str, strike: float, right: str) -> Any:
+    """/iserver/secdef/info for one month, strike and right: every expiry of that month."""
+    return await _get(
+        "/iserver/secdef/info",
+        {"conid": conid, "secType": sec_type, "month": month, "exchange": exchange, "strike": strike, "right": right},
+    )
+
+
+async def materialize(
+    conid: int,
+    sec_type: str,
+    expiries: str,
+    exchange: str = "SMART",
+    rights: str = "CP",
+    strike_min: Optional[float] = None,
+    strike_max: Optional[float] = None,
+    center: Optional[float] = None,
+    width: Optional[int] = None,
+) -> Dict[str, Any]:
+    """
+    Resolves an option chain to conids: strikes per month, then secdef info per (month, strike, right),
+    both run concurrently (CHAIN_CONCURRENCY at a time, paced by the gateway client) and cached. Returns a
+    compact table of (expiry, strike, right, conid) rows sorted by expiry, strike and right. Raises
+    ValueError on bad input or when the window needs more than CHAIN_MAX_REQUESTS info requests.
+    """
+    months, keep = parse_expiries(expiries)
+    rights = "".join(right for right in "CP" if right in rights.upper())
+    if not rights:
+        raise ValueError("rights must contain C, P or both.")
+    semaphore = asyncio.Semaphore(CHAIN_CONCURRENCY)
+    errors: List[Dict[str, Any]] = []
+
+    async def limited(coroutine: Any) -> Any:
+        async with semaphore:
+            return await coroutine
+
+    strike_lists = await asyncio.gather(*(limited(chain_strikes(conid, sec_type, month, exchange)) for month in months))
+    requests: List[Tuple[str, float, str]] = []
+    for month, strikes in zip(months, strike_lists):
+        if not isinstance(strikes, dict) or "error" in strikes:
+            errors.append({"month": month, **(strikes if isinstance(strikes, dict) else {"error": "Unexpected Response"})})
+            continue
+        for right in rights:
+            for strike in strike_window(strikes.get(RIGHTS[right]) or [], strike_min, strike_max, center, width):
+                requests.append((month, strike, right))
+    if len(requests) > CHAIN_MAX_REQUESTS:
+        raise ValueError(
+            f"The window covers {len(requests)} strike/right combinations (limit {CHAIN_MAX_REQUESTS}). "
+            "Narrow the strike range or the expiries."
+        )
+
+    results = await asyncio.gather(*(
+        limited(chain_contracts(conid, sec_type, month, exchange, strike, right)) for month, strike, right in requests
+    ))
+    rows: Dict[int, Tuple[str, float, str, int]] = {}
+    for (month, strike, right), contracts in zip(requests, results):
+        if not isinstance(contracts, list):
+            errors.append({"month": month, "strike": strike, "right": right, **(contracts if isinstance(contracts, dict) else {})})
+            continue
+        for contract in contracts:
+            expiry = str(contract.get("maturityDate") or "")
+            if contract.get("conid") is None or (keep[month] is not None and expiry not in keep[month]):
+                continue
+            rows[int(contract["conid"])] = (expiry, float(contract.get("strike", strike)), contract.get("right") or right, int(contract["conid"]))
+
+    return {
+        "conid": conid,
+        "secType": sec_type,
+        "exchange": exchange,
+        "months": months,
+        "columns": list(COLUMNS),
+        "rows": [list(row) for row in sorted(rows.values())],
+        "count": len(rows),
+        "requests": len(months) + len(requests),
+        "errors": errors,
+    }
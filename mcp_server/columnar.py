@@ -0,0 +1,60 @@
+# columnar.py
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+BAR_FIELDS = ("o", "h", "l", "c", "v")
+
+
+def _values(column: np.ndarray, precision: Optional[int]) -> List[Any]:
+    if precision is not None:
+        column = np.round(column, precision)
+    if np.all(np.isfinite(column)) and np.all(column == np.floor(column)):
+        return column.astype(np.int64).tolist()  # whole numbers (typically volume) serialize without ".0"
+    return column.tolist()
+
+
+def round_bars(bars: List[Dict[str, Any]], precision: int) -> List[Dict[str, Any]]:
+    """Caps the float precision of per-bar dicts, keeping the gateway's row format."""
+    return [
+        {key: round(value, precision) if isinstance(value, float) else value for key, value in bar.items()}
+        for bar in bars
+    ]
+
+
+def encode_columnar(payload: Dict[str, Any], precision: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Re-encodes a history payload from a list of {o, h, l, c, v, t} dicts into one array per field.
+    Timestamps become a shared epoch base `t0` (ms) plus `dt`, the deltas between consecutive bars,
+    so t[i] = t0 + sum(dt[:i + 1]) with dt[0] = 0. `precision` caps the decimals of the value arrays.
+    """
+    bars = [bar for bar in payload.get("data") or [] if isinstance(bar, dict) and bar.get("t") is not None]
+    t = np.fromiter((int(bar["t"]) for bar in bars), dtype=np.int64, count=len(bars))
+    encoded = {key: value for key, value in payload.items() if key != "data"}
+    encoded["format"] = "columnar"
+    encoded["points"] = len(bars)
+    encoded["t0"] = int(t[0]) if len(t) else None
+    encoded["dt"] = np.diff(t, prepend=t[:1]).tolist()
+    for field in BAR_FIELDS:
+        column = np.fromiter((float(bar.get(field) or 0.0) for bar in bars), dtype=np.float64, count=len(bars))
+        encoded[field] = _values(column, precision)
+    return encoded
+
+
+def decode_columnar(encoded: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Inverse of encode_columnar's bar arrays, for clients and tests."""
+    if not encoded.get("points"):
+        return []
+    t = (encoded["t0"] + np.cumsum(encoded["dt"])).tolist()
+    return [dict(zip(("t", *BAR_FIELDS), row)) for row in zip(t, *(encoded[field] for field in BAR_FIELDS))]
+
+
+def format_history(payload: Any, response_format: str, precision: Optional[int]) -> Any:
+    """Applies the history tools' `format` and `precision` options to a gateway-shaped payload."""
+    if not isinstance(payload, dict) or not isinstance(payload.get("data"), list):
+        return payload
+    if response_format == "columnar":
+        return encode_columnar(payload, precision)
+    if precision is not None:
+        return {**payload, "data": round_bars(payload["data"], precision)}
+    return payload
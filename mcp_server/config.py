@@ -39,6 +39,90 @@ except ValueError:
 BASE_URL = f"{GATEWAY_INTERNAL_BASE_URL}:{GATEWAY_PORT}{GATEWAY_ENDPOINT}"
 print("BASE_URL:", BASE_URL)
 
+# --- Gateway Client Pool ---
+# Shared keep-alive pool used by every router to reach the Client Portal gateway.
+GATEWAY_MAX_CONNECTIONS = int(os.environ.get("GATEWAY_MAX_CONNECTIONS", "20"))
+GATEWAY_MAX_KEEPALIVE_CONNECTIONS = int(os.environ.get("GATEWAY_MAX_KEEPALIVE_CONNECTIONS", "10"))
+GATEWAY_KEEPALIVE_EXPIRY = float(os.environ.get("GATEWAY_KEEPALIVE_EXPIRY", "30"))
+GATEWAY_HTTP2 = os.environ.get("GATEWAY_HTTP2", "false").lower() == "true"
+
+# Global request pacing (requests per second and burst size) enforced before every gateway call.
+GATEWAY_RATE_LIMIT = float(os.environ.get("GATEWAY_RATE_LIMIT", "10"))
+GATEWAY_RATE_BURST = float(os.environ.get("GATEWAY_RATE_BURST", "10"))
+
+# Timeouts (seconds) per endpoint group. Override with GATEWAY_TIMEOUT_<GROUP>, e.g. GATEWAY_TIMEOUT_HMDS=45.
+GATEWAY_TIMEOUTS = {
+    "default": 10.0,
+    "history": 20.0,
+    "hmds": 30.0,
+    "scanner": 30.0,
+    "chains": 30.0,
+    "portfolio_bulk": 30.0,
+}
+for _group in GATEWAY_TIMEOUTS:
+    _override = os.environ.get(f"GATEWAY_TIMEOUT_{_group.upper()}")
+    if _override:
+        GATEWAY_TIMEOUTS[_group] = float(_override)
+
+# --- Market Data Snapshots ---
+# How long a conid counts as subscribed after its last snapshot, and how long cold conids are polled for fields.
+SNAPSHOT_WARM_TTL = float(os.environ.get("SNAPSHOT_WARM_TTL", "300"))
+SNAPSHOT_WARMUP_DEADLINE = float(os.environ.get("SNAPSHOT_WARMUP_DEADLINE", "3"))
+# Maximum conids per gateway snapshot request; larger lists are split and fetched concurrently.
+SNAPSHOT_CHUNK_SIZE = int(os.environ.get("SNAPSHOT_CHUNK_SIZE", "100"))
+# Concurrent streaming market data lines allowed by the account, and how many to keep free below that cap.
+MARKET_DATA_LINE_LIMIT = int(os.environ.get("MARKET_DATA_LINE_LIMIT", "100"))
+MARKET_DATA_LINE_HEADROOM = int(os.environ.get("MARKET_DATA_LINE_HEADROOM", "5"))
+
+# --- Live Quote Cache ---
+# Background poll cadence for hot conids, and how long a conid stays hot after its last request.
+QUOTE_POLL_INTERVAL = float(os.environ.get("QUOTE_POLL_INTERVAL", "2"))
+QUOTE_IDLE_TTL = float(os.environ.get("QUOTE_IDLE_TTL", "120"))
+# Maximum conids kept in the live quote cache; the least recently used are evicted past it.
+QUOTE_CACHE_MAX_ENTRIES = int(os.environ.get("QUOTE_CACHE_MAX_ENTRIES", "5000"))
+
+# --- Websocket Streaming ---
+# Consume the gateway /ws endpoint for market data, live orders and P&L instead of polling the REST API.
+STREAMING_ENABLED = os.environ.get("STREAMING_ENABLED", "false").lower() in ("1", "true", "yes")
+STREAMING_URL = os.environ.get("STREAMING_URL") or BASE_URL.replace("https://", "wss://", 1).replace("http://", "ws://", 1) + "/ws"
+STREAMING_HEARTBEAT = float(os.environ.get("STREAMING_HEARTBEAT", "55"))
+
+# --- Contract Master ---
+# SQLite file holding contract metadata across restarts. Mount its directory as a volume to persist it.
+CONTRACT_STORE_PATH = os.environ.get("CONTRACT_STORE_PATH", "/app/data/contracts.sqlite")
+CONTRACT_STORE_MAX_AGE = float(os.environ.get("CONTRACT_STORE_MAX_AGE_DAYS", "7")) * 86400
+# Contracts held in the in-memory symbol index used to resolve symbols and names without the gateway.
+SYMBOL_INDEX_MAX_ENTRIES = int(os.environ.get("SYMBOL_INDEX_MAX_ENTRIES", "50000"))
+# Bulk contract details: conids per /trsrv/secdef call, per-conid requests in flight, and conids per request.
+SECDEF_BATCH_SIZE = int(os.environ.get("SECDEF_BATCH_SIZE", "100"))
+CONTRACT_BATCH_CONCURRENCY = int(os.environ.get("CONTRACT_BATCH_CONCURRENCY", "5"))
+CONTRACT_BATCH_MAX_CONIDS = int(os.environ.get("CONTRACT_BATCH_MAX_CONIDS", "500"))
+
+# --- Order Validation ---
+# Check orders against cached contract rules (order types, TIF, size and price increments) before sending them.
+ORDER_VALIDATION = os.environ.get("ORDER_VALIDATION", "true").lower() in ("1", "true", "yes")
+# How long (seconds) /iserver/contract/rules results are reused per conid and side.
+ORDER_RULES_TTL = float(os.environ.get("ORDER_RULES_TTL", "21600"))
+
+# --- Option Chains ---
+# Chain materializer: strikes/secdef info requests in flight, and the most info requests one chain may need.
+CHAIN_CONCURRENCY = int(os.environ.get("CHAIN_CONCURRENCY", "8"))
+CHAIN_MAX_REQUESTS = int(os.environ.get("CHAIN_MAX_REQUESTS", "400"))
+# Most option contracts valued by one chain greeks request.
+CHAIN_MAX_CONTRACTS = int(os.environ.get("CHAIN_MAX_CONTRACTS", "10000"))
+
+# --- Historical Bar Store ---
+# Directory for the memory-mapped bar columns. Keep it on the same volume as the contract master to persist it.
+BAR_STORE_PATH = os.environ.get("BAR_STORE_PATH", "/app/data/bars")
+# Parallel HMDS windows per backfill job, and retries per window before the job is marked failed.
+BACKFILL_CONCURRENCY = int(os.environ.get("BACKFILL_CONCURRENCY", "4"))
+BACKFILL_RETRIES = int(os.environ.get("BACKFILL_RETRIES", "2"))
+# A pause in trading at least this long (seconds) starts a new session when coarser bars are derived from finer ones.
+RESAMPLE_SESSION_GAP = float(os.environ.get("RESAMPLE_SESSION_GAP", "3600"))
+# Batch history: contracts loaded at once (each still waits for its pacing slot), and conids per request.
+HISTORY_BATCH_CONCURRENCY = int(os.environ.get("HISTORY_BATCH_CONCURRENCY", "5"))
+HISTORY_BATCH_MAX_CONIDS = int(os.environ.get("HISTORY_BATCH_MAX_CONIDS", "200"))
+
 # Create FastAPI object description based on filters
 base_description = """
 A comprehensive FastAPI wrapper for the Interactive Brokers Web API. 
@@ -53,6 +137,7 @@ ALL_MODULES = {
     "Events Contracts": "Get details on contracts that settle based on the outcome of future events.",
     "FA Allocation Management": "Manage Financial Advisor allocation groups for trade distribution.",
     "FYIs & Notifications": "Manage and retrieve notifications, disclaimers, and delivery options.",
+    "Gateway": "Inspect the MCP server's own connection pool and request statistics for the Client Portal gateway.",
     "Market Data": "Access live and historical market data, including snapshots, history, and deep history from HMDS.",
     "Options Chains": "Retrieve full option chains for underlying symbols.",
     "Order Monitoring": "Check the status of live orders and view a list of recent trades.",
@@ -0,0 +1,222 @@
+# contract_store.py
+import json
+import os
+import sqlite3
+import time
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from mcp_server.config import CONTRACT_STORE_PATH, CONTRACT_STORE_MAX_AGE
+
+# --- Schema ---
+# `contracts` holds one row per conid with the raw gateway payloads it has been seen in. `updated_at` dates
+# the identity columns; each payload column has its own timestamp, so identity-only writes never make a
+# stale payload look fresh.
+# `lookups` holds symbol- or query-keyed responses (secdef search, trsrv stocks) verbatim.
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS contracts (
+    conid INTEGER PRIMARY KEY,
+    symbol TEXT,
+    sec_type TEXT,
+    exchange TEXT,
+    name TEXT,
+    info TEXT,
+    secdef TEXT,
+    updated_at REAL NOT NULL,
+    info_updated_at REAL,
+    secdef_updated_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_contracts_symbol ON contracts (symbol);
+CREATE INDEX IF NOT EXISTS idx_contracts_symbol_type_exchange ON contracts (symbol, sec_type, exchange);
+CREATE TABLE IF NOT EXISTS lookups (
+    endpoint TEXT NOT NULL,
+    query TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (endpoint, query)
+);
+"""
+PAYLOAD_COLUMNS = ("info", "secdef")
+
+
+class ContractStore:
+    """
+    Persistent SQLite contract master. Contract metadata is effectively static, so routers read through
+    this store before calling the gateway and write back on a miss. The database is opened on first use,
+    which keeps server start-up fast; rows older than `max_age` seconds are treated as misses.
+    """
+
+    def __init__(self, path: str = CONTRACT_STORE_PATH, max_age: float = CONTRACT_STORE_MAX_AGE):
+        self.path = path
+        self.max_age = max_age
+        self._conn: Optional[sqlite3.Connection] = None
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._conn = self._open()
+        return self._conn
+
+    def _open(self) -> sqlite3.Connection:
+        path = self.path
+        if path != ":memory:":
+            try:
+                os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            except OSError as exc:
+                print(f"⚠️ Warning: contract store directory for '{path}' is not writable ({exc}). Using an in-memory store.")
+                path = ":memory:"
+        conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(SCHEMA)
+        # Databases created before per-payload timestamps lack these columns; their payloads count as stale.
+        existing = {row[1] for row in conn.execute("PRAGMA table_info(contracts)")}
+        for column in PAYLOAD_COLUMNS:
+            if f"{column}_updated_at" not in existing:
+                conn.execute(f"ALTER TABLE contracts ADD COLUMN {column}_updated_at REAL")
+        return conn
+
+    def close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def _fresh_since(self) -> float:
+        return time.time() - self.max_age
+
+    def _count(self, found: bool) -> None:
+        if found:
+            self.hits += 1
+        else:
+            self.misses += 1
+
+    # --- Per-conid payloads ---
+
+    def get_info(self, conid: int) -> Optional[Dict[str, Any]]:
+        """Returns the stored /iserver/contract/{conid}/info payload."""
+        return self._get_column(conid, "info")
+
+    def get_secdef(self, conid: int) -> Optional[Dict[str, Any]]:
+        """Returns the stored /trsrv/secdef entry for a conid."""
+        return self._get_column(conid, "secdef")
+
+    def _get_column(self, conid: int, column: str) -> Optional[Dict[str, Any]]:
+        row = self.conn.execute(
+            f"SELECT {column} FROM contracts WHERE conid = ? AND {column}_updated_at >= ?",
+            (int(conid), self._fresh_since()),
+        ).fetchone()
+        found = row is not None and row[0] is not None
+        self._count(found)
+        return json.loads(row[0]) if found else None
+
+    def put_info(self, conid: int, info: Dict[str, Any]) -> None:
+        self._upsert(
+            int(conid),
+            symbol=info.get("symbol"),
+            sec_type=info.get("instrument_type"),
+            exchange=info.get("exchange"),
+            name=info.get("company_name"),
+            info=json.dumps(info),
+        )
+
+    def put_secdef(self, entry: Dict[str, Any]) -> None:
+        self._upsert(
+            int(entry["conid"]),
+            symbol=entry.get("ticker"),
+            sec_type=entry.get("assetClass"),
+            exchange=entry.get("listingExchange"),
+            name=entry.get("name"),
+            secdef=json.dumps(entry),
+        )
+
+    def put_contracts(self, rows: Iterable[Dict[str, Any]]) -> None:
+        """Upserts bare identity rows (conid, symbol, sec_type, exchange, name) without payloads."""
+        for row in rows:
+            self._upsert(int(row["conid"]), **{key: row.get(key) for key in ("symbol", "sec_type", "exchange", "name")})
+
+    def _upsert(self, conid: int, **columns: Any) -> None:
+        now = time.time()
+        columns = {key: value for key, value in columns.items() if value is not None}
+        columns.update({f"{key}_updated_at": now for key in PAYLOAD_COLUMNS if key in columns})
+        names = ["conid", "updated_at", *columns]
+        values = [conid, now, *columns.values()]
+        updates = ", ".join(f"{name} = excluded.{name}" for name in names[1:])
+        self.conn.execute(
+            f"INSERT INTO contracts ({', '.join(names)}) VALUES ({', '.join('?' * len(names))}) "
+            f"ON CONFLICT (conid) DO UPDATE SET {updates}",
+            values,
+        )
+        self.writes += 1
+
+    # --- Query-keyed payloads ---
+
+    def get_lookup(self, endpoint: str, query: str) -> Optional[Any]:
+        row = self.conn.execute(
+            "SELECT payload FROM lookups WHERE endpoint = ? AND query = ? AND updated_at >= ?",
+            (endpoint, query, self._fresh_since()),
+        ).fetchone()
+        self._count(row is not None)
+        return json.loads(row[0]) if row else None
+
+    def put_lookup(self, endpoint: str, query: str, payload: Any) -> None:
+        self.conn.execute(
+            "INSERT OR REPLACE INTO lookups (endpoint, query, payload, updated_at) VALUES (?, ?, ?, ?)",
+            (endpoint, query, json.dumps(payload), time.time()),
+        )
+        self.writes += 1
+
+    # --- Symbol resolution ---
+
+    def find(self, symbol: str, sec_type: Optional[str] = None, exchange: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Returns identity rows for a symbol, optionally narrowed by security type and exchange."""
+        sql = "SELECT conid, symbol, sec_type, exchange, name FROM contracts WHERE symbol = ?"
+        args: List[Any] = [symbol.upper()]
+        if sec_type:
+            sql += " AND sec_type = ?"
+            args.append(sec_type)
+        if exchange:
+            sql += " AND exchange = ?"
+            args.append(exchange)
+        rows = self.conn.execute(sql, args).fetchall()
+        return [dict(zip(("conid", "symbol", "sec_type", "exchange", "name"), row)) for row in rows]
+
+    def iter_contracts(self, limit: int) -> Iterator[Dict[str, Any]]:
+        """Yields up to `limit` fresh identity rows, most recently updated last."""
+        rows = self.conn.execute(
+            "SELECT conid, symbol, sec_type, exchange, name FROM ("
+            "SELECT * FROM contracts WHERE symbol IS NOT NULL AND updated_at >= ? ORDER BY updated_at DESC LIMIT ?"
+            ") ORDER BY updated_at",
+            (self._fresh_since(), limit),
+        )
+        for row in rows:
+            yield dict(zip(("conid", "symbol", "sec_type", "exchange", "name"), row))
+
+    def iter_lookups(self, endpoint: str) -> Iterator[Any]:
+        """Yields the fresh stored payloads of one lookup endpoint, oldest first."""
+        rows = self.conn.execute(
+            "SELECT payload FROM lookups WHERE endpoint = ? AND updated_at >= ? ORDER BY updated_at",
+            (endpoint, self._fresh_since()),
+        )
+        for (payload,) in rows:
+            yield json.loads(payload)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        stats = {
+            "path": self.path,
+            "loaded": self._conn is not None,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "writes": self.writes,
+        }
+        if self._conn is not None:
+            stats["contracts"] = self._conn.execute("SELECT COUNT(*) FROM contracts").fetchone()[0]
+            stats["lookups"] = self._conn.execute("SELECT COUNT(*) FROM lookups").fetchone()[0]
+        return stats
+
+
+contract_store = ContractStore()
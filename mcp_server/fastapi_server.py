@@ -1,8 +1,14 @@
+import asyncio
 import os
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastmcp import FastMCP
 from fastmcp.server.openapi import RouteMap, MCPType
 from mcp_server.config import MCP_SERVER_HOST, MCP_SERVER_PORT, MCP_TRANSPORT_PROTOCOL, FINAL_DESCRIPTION, EXCLUDED_TAGS_SET
+from mcp_server.contract_store import contract_store
+from mcp_server.gateway import gateway
+from mcp_server.quotes import quote_service
+from mcp_server.streaming import ensure_stream, gateway_stream
 
 # Import Router Files
 import alerts
@@ -10,6 +16,7 @@ import contract
 import events_contracts
 import fa_allocation_management
 import fyis_and_notifications
+import gateway_admin
 import market_data
 import options_chains
 import order_monitoring
@@ -20,10 +27,29 @@ import session
 import watchlists
 
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Opens the shared gateway pool (and the websocket stream, if enabled) on startup; stops background services and
+    closes the pool and contract master on shutdown. FastAPI runs it only when the app is served directly; the MCP
+    server calls the app in-process, so `main` wraps the MCP server in it instead.
+    """
+    await gateway.start()
+    ensure_stream()
+    try:
+        yield
+    finally:
+        await gateway_stream.stop()
+        await quote_service.stop()
+        contract_store.close()
+        await gateway.close()
+
+
 app = FastAPI(
     title="IBKR API",
     description=FINAL_DESCRIPTION,
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 app.include_router(alerts.router)
@@ -31,6 +57,7 @@ app.include_router(contract.router)
 app.include_router(events_contracts.router)
 app.include_router(fa_allocation_management.router)
 app.include_router(fyis_and_notifications.router)
+app.include_router(gateway_admin.router)
 app.include_router(market_data.router)
 app.include_router(options_chains.router)
 app.include_router(order_monitoring.router)
@@ -53,10 +80,14 @@ mcp = FastMCP.from_fastapi(
     route_maps = route_maps_list,
     )
 
+async def main():
+    async with lifespan(app):
+        await mcp.run_async(
+            transport=MCP_TRANSPORT_PROTOCOL,
+            host=MCP_SERVER_HOST,
+            port=MCP_SERVER_PORT,
+            log_level="DEBUG",
+        )
+
 if __name__ == "__main__":
-    mcp.run(
-        transport=MCP_TRANSPORT_PROTOCOL,
-        host=MCP_SERVER_HOST,
-        port=MCP_SERVER_PORT,
-        log_level="DEBUG",
-    )
+    asyncio.run(main())
@@ -0,0 +1,114 @@
+# field_index.py
+import re
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+NUMERIC_TYPES = ("Number", "Percent")
+MARKERS = ("C", "H")  # C: no trade yet today, the value is the prior close; H: trading is halted
+SUFFIX_SCALE = {"K": 1e3, "M": 1e6, "B": 1e9, "T": 1e12}
+
+
+def field_key(name: str) -> str:
+    """Snake-case key for a field name, e.g. "Change %" -> "change_pct"."""
+    name = name.replace("%", " pct").replace("/", " ")
+    return re.sub(r"[^a-z0-9]+", "_", name.lower()).strip("_")
+
+
+def decode_numbers(cells: List[Any]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Parses a flat batch of raw snapshot values into float64 with whole-array string operations: strips
+    thousands separators, `%`, the C/H markers and scales the K/M/B/T suffixes. Returns the values (NaN
+    where a cell is missing or not numeric) and the marker of each cell ("" when none).
+    """
+    if not cells:
+        return np.empty(0), np.empty(0, dtype=str)
+    text = np.char.strip(np.array(["" if cell is None else str(cell) for cell in cells], dtype=str))
+    text = np.char.replace(text, ",", "")
+    first = text.astype("U1")
+    marked = np.isin(first, MARKERS)
+    text = np.where(marked, np.char.lstrip(text, "".join(MARKERS)), text)
+    scale = np.ones(len(text))
+    for suffix, factor in SUFFIX_SCALE.items():
+        scale[np.char.endswith(text, suffix)] = factor
+    text = np.char.rstrip(text, "".join(SUFFIX_SCALE) + "%")
+    # A plain decimal once its sign and one decimal point are removed; everything else ("N/A", "") is NaN.
+    valid = np.char.isdigit(np.char.replace(np.char.lstrip(text, "+-"), ".", "", count=1))
+    values = np.full(len(text), np.nan)
+    values[valid] = text[valid].astype(np.float64) * scale[valid]
+    return values, np.where(marked, first, "")
+
+
+class FieldIndex:
+    """
+    Precompiled lookup over the snapshot field table: field code -> entry, snake-case key -> code, and the
+    set of codes whose values decode to numbers. Built once from MARKET_DATA_FIELDS.
+    """
+
+    def __init__(self, fields: Iterable[Dict[str, str]]):
+        self.by_code: Dict[str, Dict[str, str]] = {}
+        self.by_key: Dict[str, str] = {}
+        for entry in fields:
+            code, key = entry["field_code"], field_key(entry["name"])
+            if code in self.by_code or key in self.by_key:
+                raise ValueError(f"Duplicate market data field {code} ({key}).")
+            self.by_code[code] = {**entry, "key": key}
+            self.by_key[key] = code
+        self.numeric = frozenset(code for code, entry in self.by_code.items() if entry["type"] in NUMERIC_TYPES)
+
+    def describe(self) -> List[Dict[str, str]]:
+        return list(self.by_code.values())
+
+    def resolve(self, fields: Iterable[str]) -> List[str]:
+        """
+        Maps requested fields to gateway codes. Each item may be a code ("31", "87_raw"), a key ("last_price")
+        or a field name ("Last Price"). Unknown numeric codes pass through; unknown names raise ValueError.
+        """
+        codes: List[str] = []
+        for field in fields:
+            code = field if field in self.by_code or field.isdigit() else self.by_key.get(field_key(field))
+            if code is None:
+                raise ValueError(f"Unknown market data field '{field}'. See /iserver/marketdata/fields for codes and keys.")
+            if code not in codes:
+                codes.append(code)
+        return codes
+
+    def key(self, code: str) -> str:
+        entry = self.by_code.get(code)
+        return entry["key"] if entry else code
+
+    def decode(self, rows: List[Dict[str, Any]], fields: Optional[List[str]] = None) -> Dict[str, Any]:
+        """
+        Turns a batch of snapshot rows into named columns, one value per row: numeric fields as floats (None
+        when missing), text fields as returned. `markers` lists the C/H prefix per row for numeric fields that
+        carried one, and `errors` the rows that failed upstream. Without `fields`, every field code present
+        in the rows is decoded, in order of first appearance.
+        """
+        rows = [row for row in rows if isinstance(row, dict)]
+        if fields is None:
+            fields = list(dict.fromkeys(key for row in rows for key in row if key in self.by_code or key.isdigit()))
+        numeric = [code for code in fields if code in self.numeric]
+        values, markers = decode_numbers([row.get(code) for code in numeric for row in rows])
+        values = values.reshape(len(numeric), len(rows))
+        markers = markers.reshape(len(numeric), len(rows))
+
+        columns: Dict[str, List[Any]] = {}
+        marker_columns: Dict[str, List[Optional[str]]] = {}
+        position = {code: index for index, code in enumerate(numeric)}
+        for code in fields:
+            key = self.key(code)
+            index = position.get(code)
+            if index is None:
+                columns[key] = [row.get(code) for row in rows]
+                continue
+            column = values[index]
+            columns[key] = np.where(np.isnan(column), None, column).tolist()
+            if markers[index].any():
+                marker_columns[key] = [marker or None for marker in markers[index].tolist()]
+        return {
+            "format": "decoded",
+            "conids": [row.get("conid") for row in rows],
+            "columns": columns,
+            "markers": marker_columns,
+            "errors": {str(row.get("conid")): row["error"] for row in rows if "error" in row},
+        }
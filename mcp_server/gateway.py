@@ -0,0 +1,209 @@
+# gateway.py
+import asyncio
+import time
+from typing import Any, Dict, Optional
+
+import httpx
+from mcp_server.config import (
+    BASE_URL,
+    GATEWAY_HTTP2,
+    GATEWAY_KEEPALIVE_EXPIRY,
+    GATEWAY_MAX_CONNECTIONS,
+    GATEWAY_MAX_KEEPALIVE_CONNECTIONS,
+    GATEWAY_TIMEOUTS,
+)
+from mcp_server.pacing import PacingScheduler
+
+# --- Endpoint Groups ---
+# Maps a gateway path prefix to the timeout group in GATEWAY_TIMEOUTS. The first matching prefix wins.
+
+ENDPOINT_GROUPS = [
+    ("/iserver/marketdata/history", "history"),
+    ("/hmds/", "hmds"),
+    ("/iserver/scanner/run", "scanner"),
+    ("/trsrv/secdef/chains", "chains"),
+    ("/portfolio/subaccounts2", "portfolio_bulk"),
+    ("/portfolio/allocation", "portfolio_bulk"),
+]
+
+
+def endpoint_group(path: str) -> str:
+    """Returns the endpoint group name for a gateway path."""
+    for prefix, group in ENDPOINT_GROUPS:
+        if path.startswith(prefix):
+            return group
+    return "default"
+
+
+def coalescing_key(method: str, path: str, params: Any = None) -> str:
+    """Builds the single-flight key from the method, path and the query with parameters sorted."""
+    query = sorted(httpx.QueryParams(params).multi_items()) if params else []
+    return f"{method} {path}?{httpx.QueryParams(query)}"
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+# --- Gateway Client ---
+
+class GatewayClient:
+    """
+    Application-scoped, pooled HTTP client for the Client Portal gateway.
+    Routers share one keep-alive connection pool instead of opening a new client (and TLS handshake) per call.
+    """
+
+    def __init__(
+        self,
+        base_url: str = BASE_URL,
+        max_connections: int = GATEWAY_MAX_CONNECTIONS,
+        max_keepalive_connections: int = GATEWAY_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry: float = GATEWAY_KEEPALIVE_EXPIRY,
+        http2: bool = GATEWAY_HTTP2,
+        timeouts: Optional[Dict[str, float]] = None,
+    ):
+        self.base_url = base_url
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        if http2 and not _http2_available():
+            print("⚠️ Warning: GATEWAY_HTTP2 is enabled but the 'h2' package is not installed. Falling back to HTTP/1.1.")
+            http2 = False
+        self.http2 = http2
+        self.timeouts = dict(timeouts or GATEWAY_TIMEOUTS)
+        self.pacer = PacingScheduler()
+        self._client: Optional[httpx.AsyncClient] = None
+        self._started_at: Optional[float] = None
+        self._requests = 0
+        self._errors = 0
+        self._in_flight = 0
+        self._by_group: Dict[str, int] = {}
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._coalesce_lookups = 0
+        self._coalesce_hits = 0
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """The underlying httpx client, created on first use if the app lifespan has not started it."""
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                verify=False,
+                limits=self.limits,
+                http2=self.http2,
+            )
+            self._started_at = time.time()
+        return self._client
+
+    async def start(self) -> None:
+        """Opens the connection pool."""
+        self.client
+
+    async def close(self) -> None:
+        """Closes the connection pool. Safe to call more than once."""
+        if self._client is not None and not self._client.is_closed:
+            await self._client.aclose()
+        self._client = None
+
+    def timeout_for(self, path: str) -> float:
+        return self.timeouts.get(endpoint_group(path), self.timeouts["default"])
+
+    async def request(self, method: str, path: str, lane: Optional[int] = None, coalesce: bool = True, **kwargs: Any) -> httpx.Response:
+        """
+        Sends a request to the gateway. `path` is relative to BASE_URL, e.g. '/portfolio/accounts'.
+        The endpoint group timeout applies unless an explicit `timeout` is given, and also bounds
+        how long the request may wait in the pacing queue. `lane` overrides the pacing priority lane.
+
+        Concurrent identical GETs (same path and query) share one upstream request unless `coalesce` is False.
+        """
+        if method != "GET" or not coalesce:
+            return await self._send(method, path, lane, **kwargs)
+        key = coalescing_key(method, path, kwargs.get("params"))
+        self._coalesce_lookups += 1
+        task = self._inflight.get(key)
+        if task is not None:
+            self._coalesce_hits += 1
+        else:
+            # The upstream call runs as its own task so a cancelled caller does not cancel it for the others.
+            task = asyncio.ensure_future(self._send(method, path, lane, **kwargs))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _, key=key: self._inflight.pop(key, None))
+        return await asyncio.shield(task)
+
+    async def _send(self, method: str, path: str, lane: Optional[int] = None, **kwargs: Any) -> httpx.Response:
+        group = endpoint_group(path)
+        timeout = kwargs.setdefault("timeout", self.timeouts.get(group, self.timeouts["default"]))
+        self._requests += 1
+        self._by_group[group] = self._by_group.get(group, 0) + 1
+        self._in_flight += 1
+        try:
+            async with self.pacer.slot(method, path, timeout=timeout, lane=lane):
+                response = await self.client.request(method, path, **kwargs)
+            if response.status_code == 429:
+                self.pacer.penalize(method, path)
+            return response
+        except httpx.RequestError:
+            self._errors += 1
+            raise
+        finally:
+            self._in_flight -= 1
+
+    async def get(self, path: str, **kwargs: Any) -> httpx.Response:
+        return await self.request("GET", path, **kwargs)
+
+    async def post(self, path: str, **kwargs: Any) -> httpx.Response:
+        return await self.request("POST", path, **kwargs)
+
+    async def put(self, path: str, **kwargs: Any) -> httpx.Response:
+        return await self.request("PUT", path, **kwargs)
+
+    async def delete(self, path: str, **kwargs: Any) -> httpx.Response:
+        return await self.request("DELETE", path, **kwargs)
+
+    def pool_stats(self) -> Dict[str, Any]:
+        """Returns connection pool and request counters."""
+        connections = []
+        if self._client is not None:
+            # httpx does not expose pool state publicly; read it from the httpcore pool when available.
+            pool = getattr(getattr(self._client, "_transport", None), "_pool", None)
+            connections = list(getattr(pool, "connections", []))
+        return {
+            "open": self._client is not None and not self._client.is_closed,
+            "uptime_seconds": round(time.time() - self._started_at, 1) if self._started_at and self._client else 0,
+            "http2": self.http2,
+            "limits": {
+                "max_connections": self.limits.max_connections,
+                "max_keepalive_connections": self.limits.max_keepalive_connections,
+                "keepalive_expiry": self.limits.keepalive_expiry,
+            },
+            "connections": {
+                "total": len(connections),
+                "idle": sum(1 for conn in connections if conn.is_idle()),
+                "active": sum(1 for conn in connections if not conn.is_idle() and not conn.is_closed()),
+            },
+            "requests": {
+                "total": self._requests,
+                "in_flight": self._in_flight,
+                "transport_errors": self._errors,
+                "by_group": dict(self._by_group),
+            },
+            "timeouts": dict(self.timeouts),
+        }
+
+    def coalescing_stats(self) -> Dict[str, Any]:
+        """Returns single-flight counters for GET requests."""
+        return {
+            "lookups": self._coalesce_lookups,
+            "hits": self._coalesce_hits,
+            "hit_rate": round(self._coalesce_hits / self._coalesce_lookups, 4) if self._coalesce_lookups else 0.0,
+            "in_flight_keys": len(self._inflight),
+        }
+
+
+gateway = GatewayClient()
@@ -0,0 +1,122 @@
+# greeks.py
+from typing import Dict
+
+import numpy as np
+
+SQRT_2PI = np.sqrt(2.0 * np.pi)
+IV_LOW, IV_HIGH = 1e-4, 5.0  # implied volatility search bracket
+IV_TOLERANCE = 1e-8  # price tolerance, relative to the underlying
+IV_MAX_ITERATIONS = 50
+
+# Chebyshev fit of erfc (Numerical Recipes `erfcc`), relative error below 1.2e-7 in both tails.
+_ERFC = (-1.26551223, 1.00002368, 0.37409196, 0.09678418, -0.18628806, 0.27886807, -1.13520398, 1.48851587, -0.82215223, 0.17087277)
+
+
+def norm_pdf(x: np.ndarray) -> np.ndarray:
+    return np.exp(-0.5 * x * x) / SQRT_2PI
+
+
+def norm_cdf(x: np.ndarray) -> np.ndarray:
+    """
+    Standard normal CDF through a rational erfc approximation, so whole chains evaluate without scipy.
+    The error is relative, which keeps far out-of-the-money prices (and their implied vols) accurate.
+    """
+    z = np.abs(x) / np.sqrt(2.0)
+    t = 1.0 / (1.0 + 0.5 * z)
+    poly = _ERFC[-1]
+    for coefficient in _ERFC[-2::-1]:
+        poly = coefficient + t * poly
+    tail = 0.5 * t * np.exp(-z * z + poly)
+    return np.where(x >= 0, 1.0 - tail, tail)
+
+
+def _d1_d2(s, k, t, r, q, sigma):
+    root_t = np.sqrt(t)
+    d1 = (np.log(s / k) + (r - q + 0.5 * sigma * sigma) * t) / (sigma * root_t)
+    return d1, d1 - sigma * root_t
+
+
+def _price(discounted_s, discounted_k, cdf_d1, cdf_d2, is_call) -> np.ndarray:
+    # Puts by N(-x) = 1 - N(x), so each of d1 and d2 goes through the CDF once.
+    call = discounted_s * cdf_d1 - discounted_k * cdf_d2
+    put = discounted_k * (1.0 - cdf_d2) - discounted_s * (1.0 - cdf_d1)
+    return np.where(is_call, call, put)
+
+
+def bs_price(s, k, t, r, q, sigma, is_call) -> np.ndarray:
+    """Black-Scholes-Merton prices with continuous dividend yield `q`. All inputs broadcast; `t` in years."""
+    d1, d2 = _d1_d2(s, k, t, r, q, sigma)
+    return _price(s * np.exp(-q * t), k * np.exp(-r * t), norm_cdf(d1), norm_cdf(d2), is_call)
+
+
+def bs_greeks(s, k, t, r, q, sigma, is_call) -> Dict[str, np.ndarray]:
+    """
+    Price, delta, gamma, vega and theta. Vega is per volatility point (0.01) and theta per calendar day,
+    as the gateway reports them.
+    """
+    d1, d2 = _d1_d2(s, k, t, r, q, sigma)
+    root_t = np.sqrt(t)
+    carry, discount = np.exp(-q * t), np.exp(-r * t)
+    pdf = norm_pdf(d1)
+    cdf_d1, cdf_d2 = norm_cdf(d1), norm_cdf(d2)
+    decay = -s * carry * pdf * sigma / (2.0 * root_t)
+    call_theta = decay - r * k * discount * cdf_d2 + q * s * carry * cdf_d1
+    put_theta = decay + r * k * discount * (1.0 - cdf_d2) - q * s * carry * (1.0 - cdf_d1)
+    return {
+        "price": _price(s * carry, k * discount, cdf_d1, cdf_d2, is_call),
+        "delta": np.where(is_call, carry * cdf_d1, carry * (cdf_d1 - 1.0)),
+        "gamma": carry * pdf / (s * sigma * root_t),
+        "vega": s * carry * pdf * root_t / 100.0,
+        "theta": np.where(is_call, call_theta, put_theta) / 365.0,
+    }
+
+
+def implied_vol(price, s, k, t, r, q, is_call, max_iterations: int = IV_MAX_ITERATIONS) -> np.ndarray:
+    """
+    Implied volatility for every option at once by safeguarded Newton iteration: each step is a Newton step
+    on the price, replaced by bisection of the [IV_LOW, IV_HIGH] bracket whenever it would leave the bracket
+    or vega is too small, so the solver converges like Newton and is as robust as bisection. Options priced
+    outside the no-arbitrage bounds, without time value, or that do not converge, are NaN.
+    """
+    price, s, k, t, r, q, is_call = np.broadcast_arrays(*(np.asarray(value, dtype=float) for value in (price, s, k, t, r, q)), np.asarray(is_call, dtype=bool))
+    discounted_s, discounted_k = s * np.exp(-q * t), k * np.exp(-r * t)
+    intrinsic = np.where(is_call, np.maximum(discounted_s - discounted_k, 0.0), np.maximum(discounted_k - discounted_s, 0.0))
+    ceiling = np.where(is_call, discounted_s, discounted_k)
+    tolerance = IV_TOLERANCE * np.where(np.isfinite(s) & (s > 0), s, 1.0)
+    # Without time value above the tolerance the price says nothing about volatility.
+    valid = np.isfinite(price) & (s > 0) & (k > 0) & (t > 0) & (price - intrinsic > tolerance) & (price < ceiling)
+
+    low = np.full(price.shape, IV_LOW)
+    high = np.full(price.shape, IV_HIGH)
+    # Brenner-Subrahmanyam starting point, clipped into the bracket.
+    with np.errstate(divide="ignore", invalid="ignore"):
+        sigma = np.clip(np.sqrt(2.0 * np.pi / t) * price / s, 0.05, 2.0)
+    sigma = np.where(valid, sigma, np.nan)
+    active = valid.copy()
+    for _ in range(max_iterations):
+        if not active.any():
+            break
+        index = np.flatnonzero(active)
+        sig, ss, kk, tt, rr, qq = sigma[index], s[index], k[index], t[index], r[index], q[index]
+        d1, d2 = _d1_d2(ss, kk, tt, rr, qq, sig)
+        diff = _price(discounted_s[index], discounted_k[index], norm_cdf(d1), norm_cdf(d2), is_call[index]) - price[index]
+        vega = discounted_s[index] * norm_pdf(d1) * np.sqrt(tt)
+        done = np.abs(diff) < tolerance[index]
+        # Price rises with volatility, so the sign of the error tells which side of the root sigma is on.
+        low[index] = np.where(diff < 0, sig, low[index])
+        high[index] = np.where(diff > 0, sig, high[index])
+        with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+            step = sig - diff / vega
+        bisect = ~np.isfinite(step) | (step <= low[index]) | (step >= high[index])
+        sigma[index] = np.where(done, sig, np.where(bisect, 0.5 * (low[index] + high[index]), step))
+        active[index[done]] = False
+    sigma[active] = np.nan
+    return sigma
+
+
+def chain_analytics(price, s, k, t, r, q, is_call) -> Dict[str, np.ndarray]:
+    """Implied volatility plus greeks at that volatility; NaN wherever the volatility could not be solved."""
+    iv = implied_vol(price, s, k, t, r, q, is_call)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        greeks = bs_greeks(np.asarray(s, dtype=float), np.asarray(k, dtype=float), np.asarray(t, dtype=float), r, q, iv, np.asarray(is_call, dtype=bool))
+    return {"iv": iv, **{name: values for name, values in greeks.items() if name != "price"}}
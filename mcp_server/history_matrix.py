@@ -0,0 +1,51 @@
+# history_matrix.py
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+JOINS = ("outer", "inner")
+VALUES = ("close", "returns", "log_returns")
+
+
+def align(series: List[Dict[str, np.ndarray]], join: str = "outer") -> Dict[str, np.ndarray]:
+    """
+    Aligns several close series (`t` in epoch ms, `c`) on a common timestamp index. Returns `t` and a
+    (timestamps x series) close matrix with NaN where a series has no bar. `outer` keeps every timestamp
+    seen in any series, `inner` only those present in all of them.
+    """
+    if not series:
+        return {"t": np.empty(0, dtype=np.int64), "c": np.empty((0, 0))}
+    t = np.unique(np.concatenate([np.asarray(item["t"], dtype=np.int64) for item in series]))
+    closes = np.full((len(t), len(series)), np.nan)
+    for column, item in enumerate(series):
+        closes[np.searchsorted(t, item["t"]), column] = item["c"]
+    if join == "inner":
+        keep = ~np.isnan(closes).any(axis=1)
+        t, closes = t[keep], closes[keep]
+    return {"t": t, "c": closes}
+
+
+def forward_fill(matrix: np.ndarray) -> np.ndarray:
+    """Carries the last value of each column forward over NaN gaps; leading NaNs stay NaN."""
+    if not matrix.size:
+        return matrix
+    rows = np.where(np.isnan(matrix), 0, np.arange(len(matrix))[:, None])
+    np.maximum.accumulate(rows, axis=0, out=rows)
+    return matrix[rows, np.arange(matrix.shape[1])]
+
+
+def returns(closes: np.ndarray, log: bool = False) -> np.ndarray:
+    """Bar-over-bar returns per column. The first row, and any row next to a gap, is NaN."""
+    out = np.full(closes.shape, np.nan)
+    if len(closes) > 1:
+        with np.errstate(divide="ignore", invalid="ignore"):
+            ratio = closes[1:] / closes[:-1]
+            out[1:] = np.log(ratio) if log else ratio - 1.0
+    return out
+
+
+def matrix_rows(matrix: np.ndarray, precision: Optional[int] = None) -> List[List[Any]]:
+    """Converts a float matrix to JSON-ready rows, with NaN as None."""
+    if precision is not None:
+        matrix = np.round(matrix, precision)
+    return np.where(np.isnan(matrix), None, matrix).tolist()
@@ -0,0 +1,208 @@
+# history_rules.py
+import math
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+from mcp_server.bar_store import UNIT_SECONDS, duration_seconds
+
+_DURATION = re.compile(r"^\s*(\d+)\s*([A-Za-z]+)\s*$")
+_PERIOD_LIMIT = re.compile(r"\{(\d+)-(\d+)\}([A-Za-z]+)")
+_BAR_RANGE = re.compile(r"\(([^)]+?)\s*->\s*([^)]+?)\)")
+
+# Spellings accepted for each canonical unit. "m" is always months, as on the gateway.
+ISERVER_UNITS = {
+    "min": ("min", "mins", "minute", "minutes"),
+    "h": ("h", "hr", "hrs", "hour", "hours"),
+    "d": ("d", "D", "day", "days"),
+    "w": ("w", "W", "week", "weeks"),
+    "m": ("m", "M", "month", "months"),
+    "y": ("y", "Y", "year", "years"),
+}
+HMDS_UNITS = {
+    "S": ("S", "s", "sec", "secs", "second", "seconds"),
+    "d": ISERVER_UNITS["d"],
+    "w": ISERVER_UNITS["w"],
+    "m": ISERVER_UNITS["m"],
+    "y": ISERVER_UNITS["y"],
+}
+
+
+def _alias_table(units: Dict[str, Tuple[str, ...]]) -> Dict[str, str]:
+    return {alias: unit for unit, aliases in units.items() for alias in aliases}
+
+
+def split_duration(value: str) -> Tuple[int, str]:
+    """Splits '5 mins' into (5, 'mins'). Raises ValueError if the value is not a count followed by a unit."""
+    match = _DURATION.match(value or "")
+    if not match:
+        raise ValueError(f"'{value}' is not a duration such as '1d' or '5min'.")
+    return int(match.group(1)), match.group(2)
+
+
+def parse_bar_range(description: str) -> Optional[Tuple[int, int]]:
+    """Smallest and largest bar size in seconds of an HMDS rule such as 'mins, hrs, d (1 min -> 1 day)'."""
+    match = _BAR_RANGE.search(description)
+    if not match:
+        return None
+    smallest, largest = duration_seconds(match.group(1)), duration_seconds(match.group(2))
+    return (smallest, largest) if smallest and largest else None
+
+
+def _steps_around(steps: List[Tuple[int, Any]], period_seconds: int) -> Tuple[Any, Any]:
+    """
+    The rows of a step table (sorted by period) on either side of a period: the longest step not longer
+    than it and the shortest step not shorter than it. Outside the table both are the nearest end row.
+    """
+    below = [row for step_seconds, row in steps if step_seconds <= period_seconds]
+    above = [row for step_seconds, row in steps if step_seconds >= period_seconds]
+    return (below[-1] if below else steps[0][1]), (above[0] if above else steps[-1][1])
+
+
+def _bar_bounds(steps: List[Tuple[int, Any]], period_seconds: int) -> Tuple[int, int]:
+    """
+    Finest and coarsest bar for a period between two table steps. The finest comes from the step below and
+    the coarsest from the step above (capped at the period), so only sizes no neighbouring step allows are
+    refused.
+    """
+    below, above = _steps_around(steps, period_seconds)
+    return below[1], min(above[2], max(period_seconds, below[1]))
+
+
+class IserverHistoryRules:
+    """
+    ISERVER_HISTORY_RULES compiled into lookups: period unit limits, the legal bar values and the step-size
+    table. `normalize` checks a period/bar pair locally, fixes what has an unambiguous fix and fills in the
+    default bar, so illegal requests never reach the gateway.
+    """
+
+    def __init__(self, rules: Dict[str, Any]):
+        self.aliases = _alias_table(ISERVER_UNITS)
+        self.period_limits = {
+            unit: (int(low), int(high)) for low, high, unit in _PERIOD_LIMIT.findall(rules["period_format"])
+        }
+        self.bars = sorted(
+            ((duration_seconds(bar), bar) for bar in (part.strip() for part in rules["bar_values"].split(","))),
+        )
+        steps = rules["step_size"]
+        self.steps = []
+        for period, bar_range, default_bar in zip(steps["period"], steps["bar_range"], steps["default_bar"]):
+            bounds = [duration_seconds(part.strip()) for part in re.split(r"[–-]", bar_range)]
+            default_seconds = duration_seconds(default_bar)
+            # A few published defaults sit outside their own range; the default is always legal.
+            low, high = min(bounds[0], default_seconds), max(bounds[-1], default_seconds)
+            self.steps.append((duration_seconds(period), (period, low, high, default_bar)))
+        self.steps.sort(key=lambda step: step[0])
+
+    def _period(self, period: str, adjusted: List[str]) -> Tuple[str, int]:
+        count, raw_unit = split_duration(period)
+        unit = self.aliases.get(raw_unit)
+        if unit is None or unit not in self.period_limits:
+            raise ValueError(f"Unknown period unit '{raw_unit}'. Periods look like {', '.join(self.period_limits)} counts, e.g. '1d', '6m'.")
+        low, high = self.period_limits[unit]
+        if count < low:
+            raise ValueError(f"Period '{period}' is shorter than {low}{unit}.")
+        seconds = count * UNIT_SECONDS[unit]
+        if count > high:
+            # Re-express in the first coarser unit whose limit the (rounded-up) period fits.
+            units = list(self.period_limits)
+            for coarser in units[units.index(unit) + 1:]:
+                coarser_count = math.ceil(seconds / UNIT_SECONDS[coarser])
+                if coarser_count <= self.period_limits[coarser][1]:
+                    count, unit, seconds = coarser_count, coarser, coarser_count * UNIT_SECONDS[coarser]
+                    break
+            else:
+                raise ValueError(f"Period '{period}' exceeds the longest iServer history period.")
+        normalized = f"{count}{unit}"
+        if normalized != period:
+            adjusted.append(f"period {period} -> {normalized}")
+        return normalized, seconds
+
+    def _bar(self, bar: str, adjusted: List[str]) -> Tuple[str, int]:
+        count, raw_unit = split_duration(bar)
+        unit = self.aliases.get(raw_unit)
+        if unit is None or not count:
+            raise ValueError(f"Unknown bar size '{bar}'. Valid bars: {', '.join(name for _, name in self.bars)}.")
+        seconds = count * UNIT_SECONDS[unit]
+        # Unsupported sizes snap to the closest legal bar (finer on ties).
+        bar_seconds, normalized = min(self.bars, key=lambda item: (abs(math.log(item[0] / seconds)), item[0]))
+        if normalized != bar:
+            adjusted.append(f"bar {bar} -> {normalized}")
+        return normalized, bar_seconds
+
+    def normalize(self, period: str, bar: Optional[str]) -> Tuple[str, str, List[str]]:
+        """
+        Returns the (period, bar) to send and a list of the adjustments made. Raises ValueError when the
+        request cannot be made legal.
+        """
+        adjusted: List[str] = []
+        period, period_seconds = self._period(period, adjusted)
+        low, high = _bar_bounds(self.steps, period_seconds)
+        legal = [(seconds, name) for seconds, name in self.bars if low <= seconds <= high]
+        if not bar:
+            default_bar = _steps_around(self.steps, period_seconds)[1][3]
+            default_seconds = duration_seconds(default_bar)
+            if default_seconds < low or default_seconds > high:
+                default_bar = legal[0 if default_seconds < low else -1][1]
+            adjusted.append(f"bar defaulted to {default_bar}")
+            return period, default_bar, adjusted
+        bar, bar_seconds = self._bar(bar, adjusted)
+        if not low <= bar_seconds <= high:
+            _, clamped = legal[0] if bar_seconds < low else legal[-1]
+            adjusted.append(f"bar {bar} -> {clamped} (a {period} period allows {legal[0][1]} to {legal[-1][1]} bars)")
+            bar = clamped
+        return period, bar, adjusted
+
+
+class HmdsHistoryRules:
+    """
+    HMDS_HISTORY_RULES compiled into lookups: the period units and the bar range allowed for each period.
+    `normalize` converts periods to HMDS units and rejects bar sizes outside the range for the period.
+    """
+
+    def __init__(self, rules: Dict[str, Any]):
+        self.aliases = _alias_table({unit: HMDS_UNITS[unit] for unit in rules["period_units"]})
+        self.steps = []
+        for period, description in rules["bar_units_by_period"].items():
+            bounds = parse_bar_range(description)
+            if bounds:
+                self.steps.append((duration_seconds(period), (period, *bounds)))
+        self.steps.sort(key=lambda step: step[0])
+
+    def _period(self, period: str, adjusted: List[str]) -> Tuple[str, int]:
+        count, raw_unit = split_duration(period)
+        unit = self.aliases.get(raw_unit)
+        if unit is None:
+            seconds = duration_seconds(f"{count}{raw_unit}")
+            if not seconds or seconds >= 86400:
+                raise ValueError(f"Unknown period unit '{raw_unit}'. HMDS periods use {', '.join(sorted(set(self.aliases.values())))}.")
+            count, unit = seconds, "S"  # minutes and hours are sent as seconds
+        if count < 1:
+            raise ValueError(f"Period '{period}' must be at least 1{unit}.")
+        normalized = f"{count}{unit}"
+        if normalized != period:
+            adjusted.append(f"period {period} -> {normalized}")
+        return normalized, count * UNIT_SECONDS[unit]
+
+    def normalize(self, period: str, bar: Optional[str]) -> Tuple[str, Optional[str], List[str]]:
+        """Returns the (period, bar) to send and the adjustments made; raises ValueError for illegal pairs."""
+        adjusted: List[str] = []
+        period, period_seconds = self._period(period, adjusted)
+        if not bar:
+            return period, bar, adjusted
+        bar_seconds = duration_seconds(bar.strip())
+        if not bar_seconds:
+            raise ValueError(f"Unknown bar size '{bar}'.")
+        low, high = _bar_bounds(self.steps, period_seconds)
+        if not low <= bar_seconds <= high:
+            raise ValueError(
+                f"Bar '{bar}' is not allowed for period '{period}': HMDS allows {self._describe(low)} to "
+                f"{self._describe(high)} bars for it."
+            )
+        return period, bar.strip(), adjusted
+
+    @staticmethod
+    def _describe(seconds: int) -> str:
+        for unit in ("y", "m", "w", "d", "h", "min", "s"):
+            if seconds % UNIT_SECONDS[unit] == 0:
+                return f"{seconds // UNIT_SECONDS[unit]}{unit}"
+        return f"{seconds}s"
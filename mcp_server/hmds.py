@@ -0,0 +1,68 @@
+# hmds.py
+import asyncio
+from typing import Any, Dict
+
+import httpx
+from mcp_server.gateway import gateway
+
+HMDS_INIT_PATH = "/hmds/auth/init"
+
+
+def is_not_initialized(response: httpx.Response) -> bool:
+    """HMDS answers 404 on every endpoint until /hmds/auth/init has been called for the brokerage session."""
+    return response.status_code == 404
+
+
+class HmdsSession:
+    """
+    Initializes the Historical Market Data Service once per brokerage session.
+
+    The first HMDS request runs /hmds/auth/init; concurrent callers wait on the same lock and share that
+    single init. After that, requests go straight to the gateway. If HMDS answers with its "not initialized"
+    404 (e.g. after the gateway session was reset), the session is re-initialized once and the request retried.
+    """
+
+    def __init__(self):
+        self._lock = asyncio.Lock()
+        self._initialized = False
+        self._generation = 0
+        self.inits = 0
+        self.reinits = 0
+
+    async def _ensure(self, stale_generation: int = -1) -> None:
+        async with self._lock:
+            # Another caller may have re-initialized while we were waiting for the lock.
+            if self._initialized and self._generation != stale_generation:
+                return
+            response = await gateway.get(HMDS_INIT_PATH)
+            response.raise_for_status()
+            self._initialized = True
+            self._generation += 1
+            self.inits += 1
+
+    def reset(self) -> None:
+        """Forgets the init, e.g. after logout or re-authentication starts a new brokerage session."""
+        self._initialized = False
+
+    async def request(self, method: str, path: str, **kwargs: Any) -> httpx.Response:
+        if not self._initialized:
+            await self._ensure()
+        generation = self._generation
+        response = await gateway.request(method, path, **kwargs)
+        if is_not_initialized(response):
+            self.reinits += 1
+            await self._ensure(stale_generation=generation)
+            response = await gateway.request(method, path, **kwargs)
+        return response
+
+    async def get(self, path: str, **kwargs: Any) -> httpx.Response:
+        return await self.request("GET", path, **kwargs)
+
+    async def post(self, path: str, **kwargs: Any) -> httpx.Response:
+        return await self.request("POST", path, **kwargs)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"initialized": self._initialized, "inits": self.inits, "reinits": self.reinits}
+
+
+hmds_session = HmdsSession()
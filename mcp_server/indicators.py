@@ -0,0 +1,180 @@
+# indicators.py
+import math
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from mcp_server.resample import session_starts
+
+# --- Smoothing Primitives ---
+
+
+def rolling_mean(x: np.ndarray, n: int) -> np.ndarray:
+    out = np.full(len(x), np.nan)
+    if 0 < n <= len(x):
+        sums = np.cumsum(np.insert(x, 0, 0.0))
+        out[n - 1:] = (sums[n:] - sums[:-n]) / n
+    return out
+
+
+def rolling_std(x: np.ndarray, n: int) -> np.ndarray:
+    """Population standard deviation over a trailing window of `n` values."""
+    out = np.full(len(x), np.nan)
+    if 0 < n <= len(x):
+        out[n - 1:] = sliding_window_view(x, n).std(axis=-1)
+    return out
+
+
+def ewm(x: np.ndarray, alpha: float, seed: float) -> np.ndarray:
+    """
+    Exponential smoothing y[i] = alpha * x[i] + (1 - alpha) * y[i - 1] with y[-1] = seed, computed in closed
+    form with cumulative sums. The series is processed in blocks short enough that the decay factors stay
+    within float range.
+    """
+    out = np.empty(len(x))
+    beta = 1.0 - alpha
+    if beta <= 0.0:
+        out[:] = x
+        return out
+    block = max(int(math.log(1e-100) / math.log(beta)), 1)
+    previous = seed
+    for start in range(0, len(x), block):
+        segment = x[start:start + block]
+        powers = beta ** np.arange(len(segment))
+        # y[j] = beta^(j+1) * previous + alpha * beta^j * sum_{i<=j} x[i] / beta^i
+        values = beta * powers * previous + alpha * powers * np.cumsum(segment / powers)
+        out[start:start + len(segment)] = values
+        previous = values[-1]
+    return out
+
+
+def seeded_ewm(x: np.ndarray, n: int, alpha: float) -> np.ndarray:
+    """EMA-style smoothing seeded with the simple mean of the first `n` values, NaN before that."""
+    out = np.full(len(x), np.nan)
+    if 0 < n <= len(x):
+        seed = float(x[:n].mean())
+        out[n - 1] = seed
+        out[n:] = ewm(x[n:], alpha, seed)
+    return out
+
+
+# --- Indicators ---
+# Each takes the bar columns (t, o, h, l, c, v) and its parameters, and returns named output series.
+
+def sma(bars: Dict[str, np.ndarray], n: int = 20) -> Dict[str, np.ndarray]:
+    return {f"sma_{n}": rolling_mean(bars["c"], n)}
+
+
+def ema(bars: Dict[str, np.ndarray], n: int = 20) -> Dict[str, np.ndarray]:
+    return {f"ema_{n}": seeded_ewm(bars["c"], n, 2.0 / (n + 1))}
+
+
+def rsi(bars: Dict[str, np.ndarray], n: int = 14) -> Dict[str, np.ndarray]:
+    """Wilder's RSI."""
+    out = np.full(len(bars["c"]), np.nan)
+    change = np.diff(bars["c"])
+    gains = seeded_ewm(np.clip(change, 0.0, None), n, 1.0 / n)
+    losses = seeded_ewm(np.clip(-change, 0.0, None), n, 1.0 / n)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        out[1:] = np.where(losses == 0.0, 100.0, 100.0 - 100.0 / (1.0 + gains / losses))
+    out[1:][np.isnan(losses)] = np.nan
+    return {f"rsi_{n}": out}
+
+
+def atr(bars: Dict[str, np.ndarray], n: int = 14) -> Dict[str, np.ndarray]:
+    """Wilder's average true range."""
+    high, low, close = bars["h"], bars["l"], bars["c"]
+    true_range = high - low
+    if len(close) > 1:
+        previous = close[:-1]
+        true_range[1:] = np.maximum.reduce([high[1:] - low[1:], np.abs(high[1:] - previous), np.abs(low[1:] - previous)])
+    return {f"atr_{n}": seeded_ewm(true_range, n, 1.0 / n)}
+
+
+def vwap(bars: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    """Volume-weighted average of the typical price, reset at every session start."""
+    typical = (bars["h"] + bars["l"] + bars["c"]) / 3.0
+    volume = bars["v"]
+    starts = session_starts(bars["t"])
+    session = np.cumsum(starts) - 1
+    cum_pv = np.cumsum(typical * volume)
+    cum_v = np.cumsum(volume)
+    first = np.flatnonzero(starts)
+    base_pv = np.concatenate([[0.0], cum_pv[first[1:] - 1]])[session]
+    base_v = np.concatenate([[0.0], cum_v[first[1:] - 1]])[session]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return {"vwap": np.where(cum_v - base_v > 0, (cum_pv - base_pv) / (cum_v - base_v), np.nan)}
+
+
+def bollinger(bars: Dict[str, np.ndarray], n: int = 20, k: float = 2.0) -> Dict[str, np.ndarray]:
+    middle = rolling_mean(bars["c"], n)
+    width = k * rolling_std(bars["c"], n)
+    label = f"bb_{n}_{k:g}"
+    return {f"{label}_upper": middle + width, f"{label}_middle": middle, f"{label}_lower": middle - width}
+
+
+def volatility(bars: Dict[str, np.ndarray], n: int = 20) -> Dict[str, np.ndarray]:
+    """
+    Rolling standard deviation of log returns, and the same annualized with the number of bars per year
+    estimated from the data (median bars per session x 252 sessions).
+    """
+    close = bars["c"]
+    out = np.full(len(close), np.nan)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        returns = np.diff(np.log(close))
+        if len(returns):
+            out[1:] = rolling_std(returns, n)
+    starts = np.flatnonzero(session_starts(bars["t"]))
+    per_session = np.median(np.diff(np.append(starts, len(close)))) if len(starts) else 1.0
+    return {f"vol_{n}": out, f"vol_{n}_annualized": out * math.sqrt(252 * per_session)}
+
+
+INDICATORS: Dict[str, Tuple[Callable[..., Dict[str, np.ndarray]], List[type]]] = {
+    "sma": (sma, [int]),
+    "ema": (ema, [int]),
+    "rsi": (rsi, [int]),
+    "atr": (atr, [int]),
+    "vwap": (vwap, []),
+    "bb": (bollinger, [int, float]),
+    "vol": (volatility, [int]),
+}
+
+
+def parse_indicators(spec: str) -> List[Tuple[str, List[Any]]]:
+    """
+    Parses a comma-separated indicator list such as "sma:200,ema:20,rsi,bb:20:2,vwap" into (name, args).
+    Raises ValueError on unknown names or bad parameters.
+    """
+    parsed = []
+    for item in (part.strip() for part in spec.split(",")):
+        if not item:
+            continue
+        name, *raw_args = item.lower().split(":")
+        if name not in INDICATORS:
+            raise ValueError(f"Unknown indicator '{name}'. Available: {', '.join(INDICATORS)}.")
+        types = INDICATORS[name][1]
+        if len(raw_args) > len(types):
+            raise ValueError(f"Too many parameters for '{name}'.")
+        try:
+            args = [kind(value) for kind, value in zip(types, raw_args)]
+        except ValueError:
+            raise ValueError(f"Invalid parameters for '{name}': {':'.join(raw_args)}.")
+        if any(isinstance(arg, int) and arg < 1 for arg in args):
+            raise ValueError(f"Window for '{name}' must be at least 1.")
+        parsed.append((name, args))
+    return parsed
+
+
+def _tail_values(series: np.ndarray, tail: int) -> List[Optional[float]]:
+    return [None if math.isnan(value) else round(value, 6) for value in series[-tail:].tolist()]
+
+
+def compute(bars: Dict[str, np.ndarray], spec: List[Tuple[str, List[Any]]], tail: int = 1) -> Dict[str, Any]:
+    """Computes the indicators over the full bar columns and returns the last `tail` values of each."""
+    columns = {name: np.asarray(column, dtype=np.int64 if name == "t" else np.float64) for name, column in bars.items()}
+    values: Dict[str, List[Optional[float]]] = {}
+    for name, args in spec:
+        function = INDICATORS[name][0]
+        for label, series in function(columns, *args).items():
+            values[label] = _tail_values(series, tail)
+    return {"t": columns["t"][-tail:].tolist(), "values": values}
@@ -0,0 +1,142 @@
+# market_data_lines.py
+import asyncio
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from mcp_server.config import MARKET_DATA_LINE_HEADROOM, MARKET_DATA_LINE_LIMIT
+from mcp_server.gateway import gateway
+
+UNSUBSCRIBE_PATH = "/iserver/marketdata/unsubscribe"
+
+
+class LineManager:
+    """
+    Tracks the streaming market data lines the gateway holds open for us.
+
+    Every iServer snapshot opens a subscription that stays open until it is released, and IBKR caps the
+    number of concurrent lines. Conids are kept in least-recently-used order; before new conids are
+    subscribed, the oldest unpinned conids are released through /iserver/marketdata/unsubscribe so the
+    total stays `headroom` lines below the cap. Conids that are being fetched or kept hot by the quote
+    cache are pinned and never evicted. A fetch that needs more lines than can be released waits until
+    other fetches finish and unpin theirs.
+    """
+
+    def __init__(self, limit: int = MARKET_DATA_LINE_LIMIT, headroom: int = MARKET_DATA_LINE_HEADROOM):
+        self.limit = limit
+        self.headroom = headroom
+        self._lines: "OrderedDict[str, None]" = OrderedDict()
+        self._pins: Dict[str, int] = {}
+        self._listeners: List[Callable[[Optional[List[str]]], None]] = []
+        self._changed = asyncio.Condition()
+        self._fetches = 0  # reservations currently held by fetches
+        self.evictions = 0
+        self.eviction_errors = 0
+        self.over_limit = 0
+        self.waits = 0
+
+    @property
+    def target(self) -> int:
+        return max(self.limit - self.headroom, 1)
+
+    def on_release(self, listener: Callable[[Optional[List[str]]], None]) -> None:
+        """Registers a callback run with the released conids (None for all) whenever lines are dropped."""
+        self._listeners.append(listener)
+
+    # --- Pinning ---
+
+    def pin(self, conids: Iterable[str]) -> None:
+        for conid in conids:
+            self._pins[conid] = self._pins.get(conid, 0) + 1
+
+    def unpin(self, conids: Iterable[str]) -> None:
+        for conid in conids:
+            count = self._pins.get(conid, 0) - 1
+            if count > 0:
+                self._pins[conid] = count
+            else:
+                self._pins.pop(conid, None)
+
+    def is_pinned(self, conid: str) -> bool:
+        return conid in self._pins
+
+    # --- Lines ---
+
+    def touch(self, conids: Iterable[str]) -> None:
+        """Records conids as open lines and marks them most recently used."""
+        for conid in conids:
+            self._lines[conid] = None
+            self._lines.move_to_end(conid)
+
+    async def reserve(self, conids: Iterable[str]) -> None:
+        """
+        Makes room for `conids` and pins them for a fetch, evicting least-recently-used unpinned lines.
+        While other fetches pin the lines that would have to go, waits for them to `finish`; with no other
+        fetch in flight it goes ahead, over the limit if it must. Every reserve is paired with `finish`.
+        """
+        conids = list(conids)
+        wanted = set(conids)
+        async with self._changed:
+            while True:
+                requested = len(self._lines) + sum(1 for conid in conids if conid not in self._lines)
+                excess = requested - self.target
+                victims = [conid for conid in self._lines if conid not in wanted and not self.is_pinned(conid)][:max(excess, 0)]
+                if len(victims) >= excess or not self._fetches:
+                    break
+                self.waits += 1
+                await self._changed.wait()
+            if len(victims) < excess:
+                self.over_limit += 1
+                print(f"⚠️ Warning: {requested} market data lines requested but only {len(victims)} can be released (limit {self.limit}).")
+            self.pin(conids)
+            self._fetches += 1
+            await self._evict(victims)
+            self.touch(conids)
+
+    async def finish(self, conids: Iterable[str]) -> None:
+        """Unpins the conids of a finished fetch and wakes fetches waiting for lines."""
+        async with self._changed:
+            self.unpin(conids)
+            self._fetches -= 1
+            self._changed.notify_all()
+
+    async def _evict(self, conids: List[str]) -> None:
+        if not conids:
+            return
+        results = await asyncio.gather(
+            *(gateway.post(UNSUBSCRIBE_PATH, json={"conid": int(conid) if conid.isdigit() else conid}) for conid in conids),
+            return_exceptions=True,
+        )
+        for result in results:
+            if isinstance(result, Exception) or result.status_code >= 400:
+                self.eviction_errors += 1
+        self.evictions += len(conids)
+        self.release(conids)
+
+    def release(self, conids: Optional[Iterable[str]] = None) -> None:
+        """Forgets lines that were unsubscribed (all of them when None) and notifies listeners."""
+        if conids is None:
+            self._lines.clear()
+            released = None
+        else:
+            released = [str(conid) for conid in conids]
+            for conid in released:
+                self._lines.pop(conid, None)
+        for listener in self._listeners:
+            listener(released)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "limit": self.limit,
+            "target": self.target,
+            "active": len(self._lines),
+            "utilization": round(len(self._lines) / self.limit, 4) if self.limit else 0.0,
+            "pinned": sum(1 for conid in self._lines if self.is_pinned(conid)),
+            "evictions": self.evictions,
+            "eviction_errors": self.eviction_errors,
+            "over_limit": self.over_limit,
+            "waits": self.waits,
+            "least_recently_used": list(self._lines)[:20],
+        }
+
+
+line_manager = LineManager()
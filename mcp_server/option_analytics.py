@@ -0,0 +1,140 @@
+# option_analytics.py
+import asyncio
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+import httpx
+import numpy as np
+
+from mcp_server.config import SECDEF_BATCH_SIZE
+from mcp_server.contract_store import contract_store
+from mcp_server.field_index import decode_numbers
+from mcp_server.gateway import gateway
+from mcp_server.greeks import chain_analytics
+from mcp_server.quotes import quote_service
+
+QUOTE_FIELDS = ["84", "86", "31"]  # bid, ask, last
+PRICE_SOURCES = ("mid", "last", "bid", "ask")
+EXPIRY_ZONE = ZoneInfo("America/New_York")
+EXPIRY_HOUR = 16  # options are valued up to the 16:00 New York close of their expiry date
+YEAR_SECONDS = 365.0 * 86400
+COLUMNS = ("conid", "expiry", "strike", "right", "bid", "ask", "last", "price", "t", "iv", "delta", "gamma", "vega", "theta")
+
+Contract = Tuple[int, str, float, str]  # (conid, expiry YYYYMMDD, strike, right)
+
+
+async def option_contracts(conids: List[str]) -> Tuple[List[Contract], List[Optional[int]], List[Dict[str, Any]]]:
+    """
+    Expiry, strike and right for option conids from their security definitions (contract master first,
+    then /trsrv/secdef in batches). Returns the contracts, the underlying conid of each and one error entry per failed conid.
+    """
+    entries: Dict[str, Any] = {}
+    missing = []
+    for conid in conids:
+        entry = contract_store.get_secdef(int(conid))
+        if entry is not None:
+            entries[conid] = entry
+        else:
+            missing.append(conid)
+
+    async def load(batch: List[str]) -> Any:
+        try:
+            response = await gateway.get("/trsrv/secdef", params={"conids": ",".join(batch)})
+            response.raise_for_status()
+            return response.json()
+        except httpx.HTTPStatusError as exc:
+            return {"error": "IBKR API Error", "status_code": exc.response.status_code, "detail": exc.response.text}
+        except httpx.RequestError as exc:
+            return {"error": "Request Error", "detail": str(exc)}
+
+    batches = [missing[start:start + SECDEF_BATCH_SIZE] for start in range(0, len(missing), SECDEF_BATCH_SIZE)]
+    errors: Dict[str, Any] = {}
+    for batch, data in zip(batches, await asyncio.gather(*(load(batch) for batch in batches))):
+        if isinstance(data, dict) and "error" in data:
+            errors.update({conid: data for conid in batch})
+            continue
+        for entry in data.get("secdef", []) if isinstance(data, dict) else []:
+            if isinstance(entry, dict) and entry.get("conid") is not None:
+                entries[str(entry["conid"])] = entry
+                contract_store.put_secdef(entry)
+
+    contracts: List[Contract] = []
+    underlyings: List[Optional[int]] = []
+    for conid in conids:
+        entry = entries.get(conid)
+        if entry is None:
+            errors.setdefault(conid, {"error": "Unknown Contract", "detail": "No security definition for this conid."})
+        elif not (entry.get("maturityDate") and entry.get("strike") is not None and entry.get("right") in ("C", "P")):
+            errors[conid] = {"error": "Not An Option", "detail": "The conid has no expiry, strike and right."}
+        else:
+            contracts.append((int(conid), str(entry["maturityDate"]), float(entry["strike"]), entry["right"]))
+            underlyings.append(int(entry["undConid"]) if entry.get("undConid") else None)
+    return contracts, underlyings, [{"conid": int(conid), **error} for conid, error in errors.items()]
+
+
+async def quotes(conids: List[str]) -> Dict[str, np.ndarray]:
+    """Batch snapshot of bid, ask and last for `conids`, as float columns in input order (NaN when missing)."""
+    rows, _ = await quote_service.snapshot(conids, QUOTE_FIELDS)
+    by_conid = {str(row.get("conid")): row for row in rows if isinstance(row, dict)} if isinstance(rows, list) else {}
+    cells = [by_conid.get(conid, {}).get(code) for code in QUOTE_FIELDS for conid in conids]
+    values, _ = decode_numbers(cells)
+    values = values.reshape(len(QUOTE_FIELDS), len(conids))
+    return {"bid": values[0], "ask": values[1], "last": values[2]}
+
+
+def reference_price(bid: np.ndarray, ask: np.ndarray, last: np.ndarray, source: str) -> np.ndarray:
+    """Price to value each option at. `mid` needs a two-sided quote and falls back to the last price."""
+    if source == "mid":
+        two_sided = (bid > 0) & (ask > 0) & (ask >= bid)
+        return np.where(two_sided, 0.5 * (bid + ask), last)
+    return {"last": last, "bid": bid, "ask": ask}[source]
+
+
+def years_to_expiry(expiries: List[str], now: float) -> np.ndarray:
+    """Year fractions from `now` to each expiry's close; each distinct date is converted once."""
+    distinct, positions = np.unique(np.asarray(expiries), return_inverse=True)
+    closes = np.array([
+        datetime.strptime(expiry, "%Y%m%d").replace(hour=EXPIRY_HOUR, tzinfo=EXPIRY_ZONE).timestamp() for expiry in distinct
+    ])
+    return (closes[positions] - now) / YEAR_SECONDS
+
+
+async def underlying_price(conid: int, source: str) -> float:
+    columns = await quotes([str(conid)])
+    return float(reference_price(columns["bid"], columns["ask"], columns["last"], source)[0])
+
+
+async def analyze(
+    contracts: List[Contract],
+    spot: float,
+    rate: float,
+    dividend_yield: float,
+    source: str,
+    now: float,
+    precision: Optional[int] = 6,
+) -> Dict[str, Any]:
+    """
+    Snapshots every option in one batch, then solves implied volatility and computes delta, gamma, vega
+    (per vol point) and theta (per day) for the whole chain at once. Returns a compact table with one row
+    per contract; values that could not be computed are None.
+    """
+    conids = [str(contract[0]) for contract in contracts]
+    columns = await quotes(conids) if conids else {name: np.empty(0) for name in ("bid", "ask", "last")}
+    price = reference_price(columns["bid"], columns["ask"], columns["last"], source)
+    strikes = np.array([contract[2] for contract in contracts], dtype=float)
+    is_call = np.array([contract[3] == "C" for contract in contracts], dtype=bool)
+    t = years_to_expiry([contract[1] for contract in contracts], now) if contracts else np.empty(0)
+    results = chain_analytics(price, spot, strikes, t, rate, dividend_yield, is_call)
+
+    numeric = np.column_stack([columns["bid"], columns["ask"], columns["last"], price, t, *(results[name] for name in COLUMNS[9:])])
+    if precision is not None:
+        numeric = np.round(numeric, precision)
+    numeric_rows = np.where(np.isnan(numeric), None, numeric).tolist() if len(numeric) else []
+    rows = [[conid, expiry, strike, right, *values] for (conid, expiry, strike, right), values in zip(contracts, numeric_rows)]
+    return {
+        "columns": list(COLUMNS),
+        "rows": rows,
+        "count": len(rows),
+        "solved": int(np.isfinite(results["iv"]).sum()),
+    }
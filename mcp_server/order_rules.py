@@ -0,0 +1,242 @@
+# order_rules.py
+import asyncio
+import math
+import time
+from decimal import ROUND_CEILING, ROUND_FLOOR, Decimal
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+
+from mcp_server.config import ORDER_RULES_TTL
+from mcp_server.gateway import gateway
+
+# OrderModel.orderType values and the names /iserver/contract/rules uses for them in `orderTypes`.
+ORDER_TYPE_NAMES = {
+    "LMT": "limit",
+    "MKT": "market",
+    "STP": "stop",
+    "STOP_LIMIT": "stop_limit",
+    "STP_LMT": "stop_limit",
+    "MIDPRICE": "midprice",
+    "MIT": "mit",
+    "LIT": "lit",
+    "TRAIL": "trailing_stop",
+    "TRAILLMT": "trailing_stop_limit",
+    "REL": "relative",
+    "MOC": "marketonclose",
+    "LOC": "limitonclose",
+}
+MARKET_TYPES = {"MKT", "MOC", "MIDPRICE"}
+# Order fields that are trigger prices; every other `price` is a limit price. For TRAIL and TRAILLMT
+# auxPrice is a trailing amount, not a price, and is left alone.
+TRIGGER_FIELDS = {
+    "STP": ("price",),
+    "MIT": ("price",),
+    "TRAIL": ("price",),
+    "STOP_LIMIT": ("auxPrice",),
+    "STP_LMT": ("auxPrice",),
+    "LIT": ("auxPrice",),
+}
+
+
+def _compact(name: str) -> str:
+    return name.replace("_", "").upper()
+
+
+def _conid(order: Dict[str, Any]) -> Optional[int]:
+    if order.get("conid") is not None:
+        return int(order["conid"])
+    conidex = str(order.get("conidex") or "").split("@")[0]
+    return int(conidex) if conidex.isdigit() else None
+
+
+class ContractRules:
+    """
+    One /iserver/contract/rules payload compiled for order checks: allowed order types (in and outside
+    regular hours), time in force per order type, size increments and the price increment ladder.
+    """
+
+    def __init__(self, rules: Dict[str, Any]):
+        self.order_types = {name.lower() for name in rules.get("orderTypes") or []}
+        self.order_types_outside = {name.lower() for name in rules.get("orderTypesOutside") or []}
+        self.fractional_types = {name.lower() for name in rules.get("fraqTypes") or []}
+        # tifTypes entries look like "IOC/MARKET,LIMIT,RELATIVE,a" or "GTC/o,a": the TIF, then the order
+        # types it is limited to. Lower-case tokens are flags; "o" alone means every order type.
+        self.tifs: Dict[str, Optional[set]] = {}
+        for entry in rules.get("tifTypes") or []:
+            tif, _, allowed = str(entry).partition("/")
+            types = {_compact(token) for token in allowed.split(",") if token and not token.islower()}
+            self.tifs[tif.upper()] = types or None
+        self.size_increment = float(rules.get("sizeIncrement") or 0)
+        self.accounts = set(rules.get("canTradeAcctIds") or [])
+        self.negative_capable = bool(rules.get("negativeCapable"))
+        ladder = rules.get("incrementRules") or []
+        if not ladder and rules.get("increment"):
+            ladder = [{"lowerEdge": 0.0, "increment": rules["increment"]}]
+        self.ladder = sorted((float(rule["lowerEdge"]), Decimal(str(rule["increment"]))) for rule in ladder if rule.get("increment"))
+
+    def increment(self, price: float) -> Optional[Decimal]:
+        """Price increment that applies at `price` (the rule with the highest lower edge not above it)."""
+        step = None
+        for lower_edge, increment in self.ladder:
+            if abs(price) >= lower_edge:
+                step = increment
+        return step
+
+    def round_price(self, price: float, mode: str) -> float:
+        step = self.increment(price)
+        if not step:
+            return price
+        ticks = (Decimal(str(price)) / step).quantize(Decimal(1), rounding=mode)
+        return float(ticks * step)
+
+    def check(self, order: Dict[str, Any], account_id: Optional[str]) -> Tuple[Dict[str, Any], List[str], List[str]]:
+        """
+        Checks one order against the rules. Returns the order to send (prices rounded to valid
+        increments), the reasons it must be rejected, and the adjustments made.
+        """
+        order = dict(order)
+        errors: List[str] = []
+        adjusted: List[str] = []
+        order_type = str(order.get("orderType", "")).upper()
+        type_name = ORDER_TYPE_NAMES.get(order_type)
+        tif = str(order.get("tif", "")).upper()
+
+        if self.accounts and account_id and account_id not in self.accounts:
+            errors.append(f"Account {account_id} cannot trade this contract.")
+        if type_name and self.order_types and type_name not in self.order_types:
+            errors.append(f"Order type {order_type} is not supported for this contract.")
+        if order.get("outsideRTH") and type_name and self.order_types_outside and type_name not in self.order_types_outside:
+            errors.append(f"Order type {order_type} cannot be placed outside regular trading hours.")
+        if self.tifs:
+            if tif not in self.tifs:
+                errors.append(f"Time in force {tif} is not supported; allowed: {', '.join(sorted(self.tifs))}.")
+            elif type_name and self.tifs[tif] is not None and _compact(type_name) not in self.tifs[tif]:
+                errors.append(f"Time in force {tif} is not allowed for {order_type} orders.")
+
+        quantity = float(order.get("quantity") or 0)
+        if quantity <= 0:
+            errors.append("Quantity must be positive.")
+        elif not quantity.is_integer():
+            if type_name not in self.fractional_types:
+                errors.append(f"Fractional quantities are not allowed for {order_type} orders on this contract.")
+        elif self.size_increment and not math.isclose(quantity / self.size_increment, round(quantity / self.size_increment)):
+            errors.append(f"Quantity {quantity:g} is not a multiple of the size increment {self.size_increment:g}.")
+
+        # Limit prices are rounded down for buys and up for sells.
+        # Trigger prices are rounded the other way (up for buys, down for sells).
+        is_buy = str(order.get("side", "")).upper() == "BUY"
+        triggers = TRIGGER_FIELDS.get(order_type, ())
+        fields = ["price"] + [field for field in triggers if field != "price"]
+        for field in fields:
+            value = order.get(field)
+            if value is None or order_type in MARKET_TYPES:
+                continue
+            if value < 0 and not self.negative_capable:
+                errors.append(f"{field} cannot be negative for this contract.")
+                continue
+            mode = (ROUND_CEILING if is_buy else ROUND_FLOOR) if field in triggers else (ROUND_FLOOR if is_buy else ROUND_CEILING)
+            rounded = self.round_price(value, mode)
+            if rounded != value:
+                order[field] = rounded
+                adjusted.append(f"{field} {value:g} -> {rounded:g} (increment {self.increment(value)})")
+        return order, errors, adjusted
+
+
+class RulesCache:
+    """
+    Trading rules per (conid, side), from /iserver/contract/rules or the `rules` part of info-and-rules.
+    Entries live for ORDER_RULES_TTL seconds, so orders on the same contract are checked without a round trip.
+    """
+
+    def __init__(self, ttl: float = ORDER_RULES_TTL):
+        self.ttl = ttl
+        self.entries: Dict[Tuple[int, bool], Tuple[Dict[str, Any], ContractRules, float]] = {}
+        self.pending: Dict[Tuple[int, bool], "asyncio.Future[Any]"] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def put(self, conid: int, is_buy: bool, rules: Any) -> None:
+        if isinstance(rules, dict) and rules and not rules.get("error"):
+            self.entries[(int(conid), bool(is_buy))] = (rules, ContractRules(rules), time.monotonic() + self.ttl)
+
+    def _entry(self, conid: int, is_buy: bool) -> Optional[Tuple[Dict[str, Any], ContractRules, float]]:
+        entry = self.entries.get((int(conid), bool(is_buy)))
+        if entry is not None and entry[2] > time.monotonic():
+            self.hits += 1
+            return entry
+        self.misses += 1
+        return None
+
+    async def raw(self, conid: int, is_buy: bool) -> Any:
+        """
+        The rules payload, fetched from the gateway on a miss. Concurrent misses for the same key share one
+        request. Gateway errors are returned, not cached.
+        """
+        entry = self._entry(conid, is_buy)
+        if entry is not None:
+            return entry[0]
+        key = (int(conid), bool(is_buy))
+        if key not in self.pending:
+            self.pending[key] = asyncio.ensure_future(self._fetch(*key))
+            self.pending[key].add_done_callback(lambda _: self.pending.pop(key, None))
+        return await asyncio.shield(self.pending[key])
+
+    async def _fetch(self, conid: int, is_buy: bool) -> Any:
+        try:
+            response = await gateway.post("/iserver/contract/rules", json={"conid": conid, "isBuy": is_buy})
+            response.raise_for_status()
+            rules = response.json()
+        except httpx.HTTPStatusError as exc:
+            return {"error": "IBKR API Error", "status_code": exc.response.status_code, "detail": exc.response.text}
+        except httpx.RequestError as exc:
+            return {"error": "Request Error", "detail": str(exc)}
+        self.put(conid, is_buy, rules)
+        return rules
+
+    async def get(self, conid: int, is_buy: bool) -> Optional[ContractRules]:
+        """Compiled rules, or None when they cannot be fetched; expired rules are never used."""
+        await self.raw(conid, is_buy)
+        entry = self.entries.get((int(conid), bool(is_buy)))
+        return entry[1] if entry is not None and entry[2] > time.monotonic() else None
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "pending": len(self.pending),
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+rules_cache = RulesCache()
+
+
+async def validate_orders(orders: List[Dict[str, Any]], account_id: Optional[str]) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """
+    Checks orders against their contracts' cached rules. Returns the orders to send, the rejections
+    (index, conid, errors) and the adjustments (index, conid, changes). Orders whose conid or rules are
+    unavailable are passed through unchanged and left for the gateway to judge.
+    """
+    async def check(order: Dict[str, Any]) -> Tuple[Optional[int], Dict[str, Any], List[str], List[str]]:
+        conid = _conid(order)
+        side = str(order.get("side", "")).upper()
+        if side not in ("BUY", "SELL"):
+            return conid, order, [f"Side must be BUY or SELL, not '{order.get('side')}'."], []
+        rules = await rules_cache.get(conid, side == "BUY") if conid is not None else None
+        if rules is None:
+            return conid, order, [], []
+        return (conid, *rules.check(order, account_id))
+
+    results = await asyncio.gather(*(check(order) for order in orders))
+    checked, rejected, adjusted = [], [], []
+    for index, (conid, order, errors, changes) in enumerate(results):
+        checked.append(order)
+        if errors:
+            rejected.append({"index": index, "conid": conid, "errors": errors})
+        if changes:
+            adjusted.append({"index": index, "conid": conid, "changes": changes})
+    return checked, rejected, adjusted
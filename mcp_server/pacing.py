@@ -0,0 +1,279 @@
+# pacing.py
+import asyncio
+import bisect
+import itertools
+import re
+import time
+from contextlib import asynccontextmanager
+from typing import Any, Dict, List, Optional
+
+import httpx
+from mcp_server.config import GATEWAY_RATE_LIMIT, GATEWAY_RATE_BURST
+
+# --- Priority Lanes ---
+# Lower value is served first. Order placement, modification and cancellation always preempt other traffic.
+
+LANE_ORDERS = 0
+LANE_DEFAULT = 1
+LANE_BULK = 2
+
+LANE_NAMES = {LANE_ORDERS: "orders", LANE_DEFAULT: "default", LANE_BULK: "bulk"}
+
+ORDER_PATHS = re.compile(r"^/iserver/(account/[^/]+/orders?(/.*)?|reply/[^/]+)$")
+BULK_PATHS = re.compile(r"^/(hmds/|iserver/marketdata/history|iserver/scanner/|iserver/secdef/|iserver/contract/|trsrv/)")
+
+# --- Per-Endpoint Pacing Rules ---
+# Published Client Portal pacing limits. Each rule is (method or None for any, path pattern, rule name,
+# requests per second or None, burst size, max concurrent requests or None). The first matching rule wins.
+
+PACING_RULES = [
+    ("GET", r"^/iserver/marketdata/history", "iserver_history", None, 1, 5),
+    ("GET", r"^/hmds/history", "hmds_history", None, 1, 5),
+    ("GET", r"^/iserver/marketdata/snapshot", "snapshot", 10, 10, None),
+    ("POST", r"^/iserver/scanner/run", "scanner_run", 1, 1, None),
+    ("GET", r"^/iserver/scanner/params", "scanner_params", 1 / 900, 1, None),
+    ("GET", r"^/iserver/account/orders$", "live_orders", 1 / 5, 1, None),
+    ("GET", r"^/iserver/account/trades", "trades", 1 / 5, 1, None),
+    ("GET", r"^/portfolio/accounts", "portfolio_accounts", 1 / 5, 1, None),
+    ("GET", r"^/portfolio/subaccounts", "portfolio_subaccounts", 1 / 5, 1, None),
+    (None, r"^/fyi/", "fyi", 1, 1, None),
+    ("POST", r"^/sso/validate", "sso_validate", 1 / 60, 1, None),
+    ("GET", r"^/tickle", "tickle", 1, 1, None),
+]
+
+_COMPILED_RULES = [(method, re.compile(pattern), name, rate, burst, concurrent) for method, pattern, name, rate, burst, concurrent in PACING_RULES]
+
+
+def lane_for(method: str, path: str) -> int:
+    """Returns the priority lane for a gateway request."""
+    if method != "GET" and ORDER_PATHS.match(path):
+        return LANE_ORDERS
+    if BULK_PATHS.match(path):
+        return LANE_BULK
+    return LANE_DEFAULT
+
+
+class PacingTimeout(httpx.TimeoutException):
+    """Raised when a request cannot be scheduled within its timeout without breaking gateway pacing."""
+
+
+class TokenBucket:
+    """Classic token bucket. `rate` tokens are added per second up to `capacity`."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def ready(self, now: float) -> bool:
+        self._refill(now)
+        return self.tokens >= 1
+
+    def take(self) -> None:
+        self.tokens -= 1
+
+    def delay(self, now: float) -> float:
+        """Seconds until one token is available."""
+        self._refill(now)
+        return max(0.0, (1 - self.tokens) / self.rate)
+
+    def drain(self) -> None:
+        self.tokens = 0
+        self.updated = time.monotonic()
+
+
+class _EndpointPacer:
+    def __init__(self, name: str, rate: Optional[float], burst: float, max_concurrent: Optional[int]):
+        self.name = name
+        self.bucket = TokenBucket(rate, burst) if rate else None
+        self.max_concurrent = max_concurrent
+        self.active = 0
+        self.granted = 0
+        self.throttled = 0
+
+    def ready(self, now: float) -> bool:
+        if self.max_concurrent is not None and self.active >= self.max_concurrent:
+            return False
+        return self.bucket is None or self.bucket.ready(now)
+
+    def delay(self, now: float) -> Optional[float]:
+        """Seconds until a token frees up, or None if only a concurrency slot can unblock it."""
+        if self.bucket is None or (self.max_concurrent is not None and self.active >= self.max_concurrent):
+            return None
+        return self.bucket.delay(now)
+
+
+class _Waiter:
+    __slots__ = ("lane", "seq", "pacer", "future", "enqueued_at")
+
+    def __init__(self, lane: int, seq: int, pacer: Optional[_EndpointPacer], future: asyncio.Future):
+        self.lane = lane
+        self.seq = seq
+        self.pacer = pacer
+        self.future = future
+        self.enqueued_at = time.monotonic()
+
+    def __lt__(self, other: "_Waiter") -> bool:
+        return (self.lane, self.seq) < (other.lane, other.seq)
+
+
+class _WaitStats:
+    __slots__ = ("count", "total", "max")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds: float) -> None:
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def as_dict(self) -> Dict[str, float]:
+        return {
+            "granted": self.count,
+            "avg_wait_ms": round(1000 * self.total / self.count, 2) if self.count else 0.0,
+            "max_wait_ms": round(1000 * self.max, 2),
+        }
+
+
+# --- Pacing Scheduler ---
+
+class PacingScheduler:
+    """
+    Token-bucket scheduler in front of every outbound gateway call.
+    A global bucket enforces the overall request rate; per-endpoint pacers enforce stricter limits.
+    Waiting requests are granted in priority-lane order, so order traffic jumps ahead of queued history or reference-data calls.
+    """
+
+    def __init__(self, rate: float = GATEWAY_RATE_LIMIT, burst: float = GATEWAY_RATE_BURST):
+        self._global = TokenBucket(rate, burst)
+        self._pacers: Dict[str, _EndpointPacer] = {
+            name: _EndpointPacer(name, rate_, burst_, concurrent)
+            for _, _, name, rate_, burst_, concurrent in _COMPILED_RULES
+        }
+        self._waiters: List[_Waiter] = []
+        self._seq = itertools.count()
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._wait_stats = {lane: _WaitStats() for lane in LANE_NAMES}
+        self._timeouts = 0
+        self._penalties = 0
+
+    def _pacer_for(self, method: str, path: str) -> Optional[_EndpointPacer]:
+        for rule_method, pattern, name, *_ in _COMPILED_RULES:
+            if (rule_method is None or rule_method == method) and pattern.match(path):
+                return self._pacers[name]
+        return None
+
+    @asynccontextmanager
+    async def slot(self, method: str, path: str, timeout: Optional[float] = None, lane: Optional[int] = None):
+        """Waits for pacing clearance for one request and holds its concurrency slot until the block exits."""
+        lane = lane_for(method, path) if lane is None else lane
+        pacer = self._pacer_for(method, path)
+        waiter = _Waiter(lane, next(self._seq), pacer, asyncio.get_running_loop().create_future())
+        bisect.insort(self._waiters, waiter)
+        self._pump()
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter.future), timeout)
+        except asyncio.TimeoutError:
+            if not waiter.future.done():
+                self._remove(waiter)
+                self._timeouts += 1
+                rule = pacer.name if pacer else "global"
+                raise PacingTimeout(f"Gateway pacing limit ({rule}): request to {path} could not be scheduled within {timeout}s.")
+        except asyncio.CancelledError:
+            if not waiter.future.done():
+                self._remove(waiter)
+            else:
+                self._release(pacer)
+            raise
+        try:
+            yield
+        finally:
+            self._release(pacer)
+
+    def penalize(self, method: str, path: str) -> None:
+        """Empties the buckets for a request the gateway rejected with 429 so queued callers back off."""
+        self._penalties += 1
+        self._global.drain()
+        pacer = self._pacer_for(method, path)
+        if pacer is not None:
+            pacer.throttled += 1
+            if pacer.bucket is not None:
+                pacer.bucket.drain()
+
+    def _remove(self, waiter: _Waiter) -> None:
+        try:
+            self._waiters.remove(waiter)
+        except ValueError:
+            pass
+
+    def _release(self, pacer: Optional[_EndpointPacer]) -> None:
+        if pacer is not None and pacer.max_concurrent is not None:
+            pacer.active -= 1
+        self._pump()
+
+    def _pump(self) -> None:
+        """Grants every waiter that can run now, in lane order, and arms a timer for the next token."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        now = time.monotonic()
+        next_delay: Optional[float] = None
+        remaining = []
+        for waiter in self._waiters:
+            if waiter.future.done():
+                continue
+            if not self._global.ready(now):
+                remaining.append(waiter)
+                delay = self._global.delay(now)
+                next_delay = delay if next_delay is None else min(next_delay, delay)
+                continue
+            pacer = waiter.pacer
+            if pacer is not None and not pacer.ready(now):
+                remaining.append(waiter)
+                delay = pacer.delay(now)
+                if delay is not None:
+                    next_delay = delay if next_delay is None else min(next_delay, delay)
+                continue
+            self._global.take()
+            if pacer is not None:
+                if pacer.bucket is not None:
+                    pacer.bucket.take()
+                if pacer.max_concurrent is not None:
+                    pacer.active += 1
+                pacer.granted += 1
+            self._wait_stats[waiter.lane].add(now - waiter.enqueued_at)
+            waiter.future.set_result(None)
+        self._waiters = remaining
+        if remaining and next_delay is not None:
+            self._timer = asyncio.get_running_loop().call_later(max(next_delay, 0.001), self._pump)
+
+    def stats(self) -> Dict[str, Any]:
+        """Returns queue depth per lane, wait-time statistics and per-endpoint pacer state."""
+        depth = {name: 0 for name in LANE_NAMES.values()}
+        for waiter in self._waiters:
+            depth[LANE_NAMES[waiter.lane]] += 1
+        return {
+            "global": {"rate_per_second": self._global.rate, "burst": self._global.capacity},
+            "queue_depth": depth,
+            "lanes": {LANE_NAMES[lane]: stats.as_dict() for lane, stats in self._wait_stats.items()},
+            "endpoints": {
+                name: {
+                    "rate_per_second": pacer.bucket.rate if pacer.bucket else None,
+                    "max_concurrent": pacer.max_concurrent,
+                    "active": pacer.active,
+                    "granted": pacer.granted,
+                    "throttled_429": pacer.throttled,
+                }
+                for name, pacer in self._pacers.items()
+            },
+            "pacing_timeouts": self._timeouts,
+            "penalties_429": self._penalties,
+        }
@@ -0,0 +1,280 @@
+# quotes.py
+import asyncio
+import math
+import time
+from array import array
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from mcp_server.config import QUOTE_CACHE_MAX_ENTRIES, QUOTE_IDLE_TTL, QUOTE_POLL_INTERVAL
+from mcp_server.field_index import decode_numbers
+from mcp_server.snapshots import snapshot_engine
+
+# --- Field Slots ---
+# Every field code seen gets a fixed slot number, so a quote is a few flat arrays instead of a dict per conid.
+
+_FIELD_SLOTS: Dict[str, int] = {}
+_SLOT_FIELDS: List[str] = []
+
+
+def field_slot(field: str) -> int:
+    slot = _FIELD_SLOTS.get(field)
+    if slot is None:
+        slot = _FIELD_SLOTS[field] = len(_SLOT_FIELDS)
+        _SLOT_FIELDS.append(field)
+    return slot
+
+
+class Quote:
+    """
+    Latest snapshot values for one conid. Numeric fields are kept decoded in `numbers[slot]`, fields that
+    are not plain numbers keep their raw gateway text in `text[slot]`, and `stamps[slot]` holds when each
+    field arrived (0 if it never did).
+    """
+
+    __slots__ = ("conid", "numbers", "text", "stamps", "extra")
+
+    def __init__(self, conid: str):
+        self.conid = conid
+        size = len(_SLOT_FIELDS)
+        self.numbers = array("d", [math.nan]) * size
+        self.stamps = array("d", [0.0]) * size
+        self.text: Dict[int, Any] = {}
+        self.extra: Dict[str, Any] = {}  # non-field keys such as conidEx or server_id
+
+    def _grow(self, size: int) -> None:
+        missing = size - len(self.stamps)
+        if missing > 0:
+            self.numbers.extend([math.nan] * missing)
+            self.stamps.extend([0.0] * missing)
+
+    def set(self, slot: int, number: Optional[float], raw: Any, now: float) -> None:
+        """Stores one field: the decoded `number`, or the `raw` value when it is not a plain number."""
+        self._grow(slot + 1)
+        if number is None:
+            self.numbers[slot] = math.nan
+            self.text[slot] = raw
+        else:
+            self.numbers[slot] = number
+            self.text.pop(slot, None)
+        self.stamps[slot] = now
+
+    def age(self, fields: Iterable[str], now: float) -> float:
+        """Age in seconds of the oldest requested field; infinite if any field is missing."""
+        oldest = now
+        for field in fields:
+            slot = _FIELD_SLOTS.get(field)
+            if slot is None or slot >= len(self.stamps) or not self.stamps[slot]:
+                return float("inf")
+            oldest = min(oldest, self.stamps[slot])
+        return now - oldest
+
+    def row(self) -> Dict[str, Any]:
+        """
+        Snapshot-shaped row with every field stored for the conid, as the gateway returns every field of a
+        subscription: plain numbers as floats, everything else as the gateway's text.
+        """
+        row: Dict[str, Any] = {"conid": int(self.conid) if self.conid.isdigit() else self.conid, **self.extra}
+        for slot, stamp in enumerate(self.stamps):
+            if stamp:
+                row[_SLOT_FIELDS[slot]] = self.text[slot] if slot in self.text else self.numbers[slot]
+        return row
+
+
+# --- Live Quote Service ---
+
+class QuoteService:
+    """
+    In-memory live quote cache fed by a background snapshot poller.
+
+    Conids requested with a `max_age` become "hot": the poller refreshes them in batches every
+    `poll_interval` seconds through the snapshot engine, and snapshot tools answer from the cache while
+    the data is fresher than the caller's max age. Conids not requested for `idle_ttl` seconds age out,
+    and the cache keeps at most `max_entries` conids (least recently used evicted first).
+    Hot conids are not pinned in the line manager: when their line is released, the next poll opens it again.
+
+    When the gateway websocket stream is attached, hot conids are subscribed there instead and the
+    poller skips every conid the stream already delivers.
+    """
+
+    def __init__(
+        self,
+        poll_interval: float = QUOTE_POLL_INTERVAL,
+        idle_ttl: float = QUOTE_IDLE_TTL,
+        max_entries: int = QUOTE_CACHE_MAX_ENTRIES,
+    ):
+        self.poll_interval = poll_interval
+        self.idle_ttl = idle_ttl
+        self.max_entries = max_entries
+        self._quotes: "OrderedDict[str, Quote]" = OrderedDict()
+        self._hot: Dict[str, Tuple[float, frozenset]] = {}  # conid -> (last requested, fields)
+        self._task: Optional[asyncio.Task] = None
+        self._stream: Any = None  # GatewayStream, attached by the streaming module
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.polls = 0
+        self.poll_errors = 0
+
+    # --- Cache ---
+
+    def update(self, rows: Iterable[Dict[str, Any]]) -> None:
+        """Stores snapshot rows. All field values of the batch are decoded to numbers in one pass."""
+        now = time.time()
+        cells: List[Tuple[Quote, int, Any]] = []
+        for row in rows:
+            if not isinstance(row, dict) or row.get("conid") is None or "error" in row:
+                continue
+            conid = str(row["conid"])
+            quote = self._quotes.get(conid)
+            if quote is None:
+                quote = self._quotes[conid] = Quote(conid)
+            else:
+                self._quotes.move_to_end(conid)
+            for key, value in row.items():
+                if not key.isdigit():
+                    if key != "conid":
+                        quote.extra[key] = value
+                elif value not in (None, ""):
+                    cells.append((quote, field_slot(key), value))
+        numbers, markers = decode_numbers([value for _, _, value in cells])
+        for (quote, slot, value), number, marker in zip(cells, numbers.tolist(), markers.tolist()):
+            # Only plain numbers are stored decoded; C/H-marked, K/M-scaled and percent values stay as text.
+            plain = not math.isnan(number) and not marker and str(value)[-1:].isdigit()
+            quote.set(slot, number if plain else None, value, now)
+        while len(self._quotes) > self.max_entries:
+            self._quotes.popitem(last=False)
+            self.evictions += 1
+
+    def get(self, conid: str, fields: List[str], max_age: float) -> Optional[Dict[str, Any]]:
+        """Returns a snapshot-shaped row if every requested field is at most `max_age` seconds old."""
+        quote = self._quotes.get(conid)
+        if quote is not None and quote.age(fields, time.time()) <= max_age:
+            self._quotes.move_to_end(conid)
+            self.hits += 1
+            return quote.row()
+        self.misses += 1
+        return None
+
+    def touch(self, conids: Iterable[str], fields: Iterable[str]) -> None:
+        """Marks conids as hot so the poller keeps them fresh, and starts the poller if needed."""
+        now = time.monotonic()
+        fields = frozenset(fields)
+        for conid in conids:
+            _, known = self._hot.get(conid, (now, frozenset()))
+            self._hot[conid] = (now, known | fields)
+        if self._stream is not None:
+            self._stream.want_quotes(conids, fields)
+        self.start()
+
+    def attach_stream(self, stream: Any) -> None:
+        """Routes hot conids to a websocket stream (or back to polling only, with None)."""
+        self._stream = stream
+
+    async def snapshot(
+        self, conids: List[str], fields: Optional[List[str]], max_age: Optional[float] = None, md: bool = False
+    ) -> Tuple[Any, int]:
+        """
+        Snapshot rows for `conids` in input order plus the number of gateway polls used. With `max_age`,
+        conids whose requested fields are fresh enough are answered from the cache and only the rest are
+        fetched; the conids are also registered as hot, and every row, fetched or cached, is rendered from
+        the cache so values have the same types either way. `md` selects /md/snapshot instead of the iServer snapshot.
+        """
+        cached: Dict[str, Dict[str, Any]] = {}
+        if max_age is not None and fields:
+            self.touch(conids, fields)
+            for conid in conids:
+                row = self.get(conid, fields, max_age)
+                if row is not None:
+                    cached[conid] = row
+        stale = [conid for conid in conids if conid not in cached]
+        fetched: Any = []
+        polls = 0
+        if stale:
+            if md:
+                fetched = await snapshot_engine.fetch_md(stale, fields)
+            else:
+                fetched, polls = await snapshot_engine.fetch(stale, fields)
+            if isinstance(fetched, list):
+                self.update(fetched)
+        if max_age is None or not fields:
+            return fetched, polls
+        if isinstance(fetched, list):
+            fetched = [self._render(row) for row in fetched]
+        by_conid = {str(row.get("conid")): row for row in fetched if isinstance(row, dict)} if isinstance(fetched, list) else {}
+        by_conid.update(cached)
+        return [by_conid[conid] for conid in conids if conid in by_conid], polls
+
+    def _render(self, row: Any) -> Any:
+        quote = self._quotes.get(str(row.get("conid"))) if isinstance(row, dict) and "error" not in row else None
+        return quote.row() if quote is not None else row
+
+    # --- Poller ---
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def _expire(self) -> None:
+        cutoff = time.monotonic() - self.idle_ttl
+        expired = [conid for conid, (last, _) in self._hot.items() if last < cutoff]
+        for conid in expired:
+            del self._hot[conid]
+            self._quotes.pop(conid, None)
+        if expired and self._stream is not None:
+            self._stream.drop_quotes(expired)
+
+    async def poll_once(self) -> None:
+        """Refreshes every hot conid, one batched snapshot call per distinct field set."""
+        self._expire()
+        groups: Dict[frozenset, List[str]] = {}
+        for conid, (_, fields) in self._hot.items():
+            if self._stream is not None and self._stream.covers(conid, fields):
+                continue
+            groups.setdefault(fields, []).append(conid)
+        for fields, conids in groups.items():
+            try:
+                rows, _ = await snapshot_engine.fetch(conids, sorted(fields))
+            except Exception as exc:  # keep polling through gateway hiccups
+                self.poll_errors += 1
+                print(f"⚠️ Warning: quote poller snapshot failed: {exc}")
+                continue
+            self.polls += 1
+            if isinstance(rows, list):
+                self.update(rows)
+
+    async def _run(self) -> None:
+        while self._hot:
+            await asyncio.sleep(self.poll_interval)
+            await self.poll_once()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "hot_conids": len(self._hot),
+            "cached_conids": len(self._quotes),
+            "max_entries": self.max_entries,
+            "evictions": self.evictions,
+            "field_slots": len(_SLOT_FIELDS),
+            "poll_interval_seconds": self.poll_interval,
+            "idle_ttl_seconds": self.idle_ttl,
+            "poller_running": self._task is not None and not self._task.done(),
+            "streaming": self._stream is not None and self._stream.connected,
+            "polls": self.polls,
+            "poll_errors": self.poll_errors,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+quote_service = QuoteService()
@@ -0,0 +1,72 @@
+# resample.py
+from typing import Dict
+
+import numpy as np
+from mcp_server.config import RESAMPLE_SESSION_GAP
+
+DAY_MS = 86_400_000
+WEEK_SECONDS = 7 * 86400
+MONTH_SECONDS = 30 * 86400
+
+
+def session_starts(t: np.ndarray, gap_seconds: float = RESAMPLE_SESSION_GAP) -> np.ndarray:
+    """
+    Boolean mask of bars that open a trading session: the first bar, and every bar that follows a pause
+    in trading of at least `gap_seconds`. Bars fetched with outsideRth=false have the overnight gap between
+    regular sessions; extended-hours series only break on the real session pauses.
+    """
+    starts = np.empty(len(t), dtype=bool)
+    if len(t):
+        starts[0] = True
+        starts[1:] = np.diff(t) >= gap_seconds * 1000
+    return starts
+
+
+def bucket_starts(t: np.ndarray, bar_seconds: int, gap_seconds: float = RESAMPLE_SESSION_GAP) -> np.ndarray:
+    """
+    Boolean mask of bars that open a new output bar. Intraday bars are aligned to clock multiples of the
+    bar size and never span two sessions; daily bars are one per session; weekly bars start on Mondays and
+    monthly bars on calendar months, both anchored at session starts.
+    """
+    sessions = session_starts(t, gap_seconds)
+    if bar_seconds < 86400:
+        slot = t // (bar_seconds * 1000)
+    elif bar_seconds < WEEK_SECONDS:
+        return sessions
+    else:
+        # A bar belongs to the period of the session it trades in.
+        session_t = t[np.flatnonzero(sessions)][np.cumsum(sessions) - 1]
+        if bar_seconds < MONTH_SECONDS:
+            slot = (session_t // DAY_MS + 3) // 7  # 1970-01-01 was a Thursday; weeks start on Monday
+        else:
+            slot = session_t.astype("datetime64[ms]").astype("datetime64[M]").astype(np.int64)
+    change = sessions.copy()
+    change[1:] |= slot[1:] != slot[:-1]
+    return change
+
+
+def resample(columns: Dict[str, np.ndarray], bar_seconds: int, gap_seconds: float = RESAMPLE_SESSION_GAP) -> Dict[str, np.ndarray]:
+    """
+    Aggregates finer OHLCV column arrays (sorted by `t`, in epoch ms) into `bar_seconds` bars with
+    vectorized reductions. Each output bar is stamped with the time of its first input bar.
+    """
+    t = np.asarray(columns["t"])
+    if not len(t):
+        return {name: np.asarray(column)[:0] for name, column in columns.items()}
+    starts = np.flatnonzero(bucket_starts(t, bar_seconds, gap_seconds))
+    ends = np.append(starts[1:], len(t)) - 1
+    return {
+        "t": t[starts],
+        "o": np.asarray(columns["o"])[starts],
+        "h": np.maximum.reduceat(np.asarray(columns["h"]), starts),
+        "l": np.minimum.reduceat(np.asarray(columns["l"]), starts),
+        "c": np.asarray(columns["c"])[ends],
+        "v": np.add.reduceat(np.asarray(columns["v"]), starts),
+    }
+
+
+def can_derive(target_seconds: int, source_seconds: int) -> bool:
+    """Whether `target` bars can be built from `source` bars: finer, intraday, and (for intraday targets) evenly dividing."""
+    if source_seconds >= target_seconds or source_seconds >= 86400:
+        return False
+    return target_seconds >= 86400 or target_seconds % source_seconds == 0
@@ -0,0 +1,151 @@
+# response_cache.py
+import copy
+import functools
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+
+from fastapi.responses import Response
+
+# --- Route Cache Registry ---
+# Route name -> RouteCache. Populated by the @cached decorator when the router modules are imported.
+
+ROUTE_CACHES: Dict[str, "RouteCache"] = {}
+
+
+def freeze(value: Any) -> Any:
+    """Stored form of a route result: its JSON text, or the Response itself (its body is already bytes)."""
+    return value if isinstance(value, Response) else json.dumps(value, default=str)
+
+
+def thaw(stored: Any) -> Any:
+    """A fresh copy of a stored result, so callers can change what they get without touching the cache."""
+    if isinstance(stored, Response):
+        clone = copy.copy(stored)
+        clone.raw_headers = list(stored.raw_headers)
+        return clone
+    return json.loads(stored)
+
+
+def response_size(stored: Any) -> int:
+    """Approximate memory footprint of a stored route result, measured as its serialized size in bytes."""
+    if isinstance(stored, Response):
+        return len(stored.body)
+    return len(stored)
+
+
+def is_cacheable(value: Any) -> bool:
+    """Error payloads and non-2xx responses are never cached."""
+    if isinstance(value, Response):
+        return value.status_code < 400
+    return not (isinstance(value, dict) and "error" in value)
+
+
+class RouteCache:
+    """
+    TTL cache for one route with LRU eviction bounded by entry count and total bytes. Results are stored
+    serialized and every hit returns a new copy.
+    """
+
+    def __init__(self, name: str, ttl: float, max_entries: int, max_bytes: int):
+        self.name = name
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (stored, size, expires_at)
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        stored, size, expires_at = entry
+        if expires_at <= time.monotonic():
+            self._drop(key)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return thaw(stored)
+
+    def put(self, key: str, value: Any) -> None:
+        stored = freeze(value)
+        size = response_size(stored)
+        if size > self.max_bytes:
+            return
+        if key in self._entries:
+            self._drop(key)
+        self._entries[key] = (stored, size, time.monotonic() + self.ttl)
+        self.bytes += size
+        while len(self._entries) > self.max_entries or self.bytes > self.max_bytes:
+            self._drop(next(iter(self._entries)))
+            self.evictions += 1
+
+    def _drop(self, key: str) -> None:
+        _, size, _ = self._entries.pop(key)
+        self.bytes -= size
+
+    def clear(self) -> int:
+        count = len(self._entries)
+        self._entries.clear()
+        self.bytes = 0
+        return count
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "policy": {"ttl_seconds": self.ttl, "max_entries": self.max_entries, "max_bytes": self.max_bytes},
+            "entries": len(self._entries),
+            "bytes": self.bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+        }
+
+
+def cached(ttl: float, max_entries: int = 256, max_bytes: int = 1_000_000) -> Callable:
+    """
+    Declares a response cache policy for a route. Place it directly under the `@router.get(...)` decorator.
+    Results are keyed by the route's arguments; cache hits skip the gateway round trip entirely.
+    """
+    def decorator(func: Callable) -> Callable:
+        cache = RouteCache(func.__name__, ttl, max_entries, max_bytes)
+        ROUTE_CACHES[func.__name__] = cache
+
+        @functools.wraps(func)
+        async def wrapper(*args: Any, **kwargs: Any) -> Any:
+            key = repr(args) + repr(sorted(kwargs.items()))
+            value = cache.get(key)
+            if value is not None:
+                return value
+            value = await func(*args, **kwargs)
+            if is_cacheable(value):
+                cache.put(key, value)
+            return value
+
+        wrapper.cache = cache
+        return wrapper
+    return decorator
+
+
+def invalidate(route: Optional[str] = None) -> int:
+    """Flushes one route's cache, or every route cache when `route` is None. Returns the number of entries removed."""
+    if route is not None:
+        cache = ROUTE_CACHES.get(route)
+        return cache.clear() if cache else 0
+    return sum(cache.clear() for cache in ROUTE_CACHES.values())
+
+
+def cache_stats() -> Dict[str, Any]:
+    routes = {name: cache.stats() for name, cache in ROUTE_CACHES.items()}
+    return {
+        "entries": sum(route["entries"] for route in routes.values()),
+        "bytes": sum(route["bytes"] for route in routes.values()),
+        "routes": routes,
+    }
@@ -1,9 +1,18 @@
 # contract.py
 from fastapi import APIRouter, Query, Body, Path
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
+import asyncio
+import time
+from datetime import datetime, timezone
 import httpx
 from pydantic import BaseModel, Field, ConfigDict
-from mcp_server.config import BASE_URL
+from mcp_server.config import CONTRACT_BATCH_CONCURRENCY, CONTRACT_BATCH_MAX_CONIDS, SECDEF_BATCH_SIZE
+from mcp_server.contract_store import contract_store
+from mcp_server.gateway import gateway
+from mcp_server.order_rules import rules_cache
+from mcp_server.response_cache import cached
+from mcp_server.symbol_index import EXACT, FUZZY, NAME, PREFIX, symbol_index
+from mcp_server.trading_hours import Schedule, schedule_index
 
 router = APIRouter()
 
@@ -32,6 +41,7 @@ class ContractRulesRequest(BaseModel):
     summary="Get IB Algos",
     description="Returns a list of available IB Algos for a contract."
 )
+@cached(ttl=21600, max_entries=500, max_bytes=2_000_000)
 async def get_contract_algos(
     conid: int = Path(..., description="The contract ID."),
     algos: Optional[str] = Query(None, description="A comma-separated list of IB Algos to query."),
@@ -49,15 +59,14 @@ async def get_contract_algos(
     if addParams:
         params["addParams"] = addParams
 
-    async with httpx.AsyncClient(verify=False) as client:
-        try:
-            response = await client.get(f"{BASE_URL}/iserver/contract/{conid}/algos", params=params, timeout=10)
-            response.raise_for_status()
-            return response.json()
-        except httpx.HTTPStatusError as exc:
-            return {"error": "IBKR API Error", "status_code": exc.response.status_code, "detail": exc.response.text}
-        except httpx.RequestError as exc:
-            return {"error": "Request Error", "detail": str(exc)}
+    try:
+        response = await gateway.get(f"/iserver/contract/{conid}/algos", params=params)
+        response.raise_for_status()
+        return response.json()
+    except httpx.HTTPStatusError as exc:
+        return {"error": "IBKR API Error", "status_code": exc.response.status_code, "detail": exc.response.text}
+    except httpx.RequestError as exc:
+        return {"error": "Request Error", "detail": str(exc)}
 
 @router.get(
     "/iserver/contract/{conid}/info-and-rules",
@@ -65,23 +74,27 @@ async def get_contract_algos(
     summary="Get Contract Info and Rules",
     description="Returns a conglomeration of contract information and trading rules."
 )
+@cached(ttl=21600, max_entries=1000, max_bytes=8_000_000)
 async def get_contract_info_and_rules(
     conid: int = Path(..., description="The contract ID."),
     isBuy: bool = Query(..., description="Side of the market: true for Buy, false for Sell.")
 ):
     """
     Retrieves a combination of contract details and associated trading rules in a single call.
+    The rules part is shared with the order validation rules cache.
     """
     params = {"isBuy": isBuy}
-    async with httpx.AsyncClient(verify=False) as client:
-        try:
-            response = await client.get(f"{BASE_URL}/iserver/contract/{conid}/info-and-rules", params=params, timeout=10)
-            response.raise_for_status()
-            return response.json()
-        except httpx.HTTPStatusError as exc:
-            return {"error": "IBKR API Error", "status_code": exc.response.status_code, "detail": exc.response.text}
-        except httpx.RequestError as exc:
-            return {"error": "Request Error", "detail": str(exc)}
+    try:
+        response = await gateway.get(f"/iserver/contract/{conid}/info-and-rules", params=params)
+        response.raise_for_status()
+        payload = response.json()
+        if isinstance(payload, dict):
+            rules_cache.put(conid, isBuy, payload.get("rules"))
+        return payload
+    except httpx.HTTPStatusError as exc:
+        return {"error": "IBKR API Error", "status_code": exc.response.status_code, "detail": exc.response.text}
+    except httpx.RequestError as exc:
+        return {"error": "Request Error", "detail": str(exc)}
 
 
 @router.get(
@@ -90,21 +103,88 @@ async def get_contract_info_and_rules(
     summary="Contract Information",
     description="Get full contract details for a given contract ID (conid)."
 )
+@cached(ttl=21600, max_entries=2000, max_bytes=4_000_000)
 async def get_contract_info(
     conid: int = Path(..., description="The contract ID.")
 ):
     """
     Retrieves detailed information about a specific contract using its conid.
+    Reads through the persistent contract master before calling the gateway.
     """
-    async with httpx.AsyncClient(verify=False) as client:
-        try:
-            response = await client.get(f"{BASE_URL}/iserver/contract/{conid}/info", timeout=10)
-            response.raise_for_status()
-            return response.json()
-        except httpx.HTTPStatusError as exc:
-            return {"error": "IBKR API Error", "status_code": exc.response.status_code, "detail": exc.response.text}
-        except httpx.RequestError as exc:
-            return {"error": "Request Error", "detail": str(exc)}
+    info = contract_store.get_info(conid)
+    if info is not None:
+        return info
+    try:
+        response = await gateway.get(f"/iserver/contract/{conid}/info")
+        response.raise_for_status()
+        info = response.json()
+        if isinstance(info, dict) and "error" not in info:
+            contract_store.put_info(conid, info)
+        return info
+    except httpx.HTTPStatusError as exc:
+        return {"error": "IBKR API Error", "status_code": exc.response.status_code, "detail": exc.response.text}
+    except httpx.RequestError as exc:
+        return {"error": "Request Error", "detail": str(exc)}
+
+
+@router.get(
+    "/iserver/contract/info/batch",
+    tags=["Contract"],
+    summary="Bulk Contract Details",
+    description="Returns contract details for many conids in one call, keyed by conid, with an error entry for each conid that failed."
+)
+async def get_contract_info_batch(
+    conids: str = Query(..., description="A comma-separated list of contract IDs. Duplicates are fetched once."),
+    detail: str = Query("secdef", pattern="^(secdef|info|rules)$", description="'secdef' (batched security definitions), 'info' (full /iserver/contract/{conid}/info) or 'rules' (info and trading rules)."),
+    isBuy: bool = Query(True, description="Side of the market for detail=rules: true for Buy, false for Sell.")
+) -> Dict[str, Any]:
+    """
+    Replaces one contract-info call per conid. With `detail=secdef` the conids are requested from
+    `/trsrv/secdef` in batches of `SECDEF_BATCH_SIZE`, and any the gateway does not return are fetched
+    individually from `/iserver/contract/{conid}/info`. Per-conid requests run `CONTRACT_BATCH_CONCURRENCY`
+    at a time under the gateway pacing. Every path reads through the contract master and route caches.
+    """
+    requested = list(dict.fromkeys(conid.strip() for conid in conids.split(",") if conid.strip()))
+    if not requested:
+        return {"error": "Invalid Conids", "detail": "No conids given."}
+    if len(requested) > CONTRACT_BATCH_MAX_CONIDS:
+        return {"error": "Invalid Conids", "detail": f"At most {CONTRACT_BATCH_MAX_CONIDS} conids per request."}
+    results: Dict[str, Any] = {
+        conid: {"error": "Invalid Conid", "detail": "Contract IDs are numeric."} for conid in requested if not conid.isdigit()
+    }
+    pending = [conid for conid in requested if conid.isdigit()]
+    semaphore = asyncio.Semaphore(CONTRACT_BATCH_CONCURRENCY)
+    batched = 0
+
+    if detail == "secdef" and pending:
+        async def load_batch(batch: List[str]) -> Any:
+            async with semaphore:
+                return await get_secdef_by_conids(conids=",".join(batch))
+
+        batches = [pending[start:start + SECDEF_BATCH_SIZE] for start in range(0, len(pending), SECDEF_BATCH_SIZE)]
+        for data in await asyncio.gather(*(load_batch(batch) for batch in batches)):
+            for entry in data.get("secdef", []) if isinstance(data, dict) else []:
+                if isinstance(entry, dict) and str(entry.get("conid")) in pending:
+                    results[str(entry["conid"])] = entry
+                    batched += 1
+        pending = [conid for conid in pending if conid not in results]
+
+    async def load_one(conid: str) -> Any:
+        async with semaphore:
+            if detail == "rules":
+                return await get_contract_info_and_rules(conid=int(conid), isBuy=isBuy)
+            return await get_contract_info(conid=int(conid))
+
+    for conid, data in zip(pending, await asyncio.gather(*(load_one(conid) for conid in pending))):
+        results[conid] = data
+    errors = [conid for conid in requested if isinstance(results[conid], dict) and "error" in results[conid]]
+    return {
+        "contracts": {conid: results[conid] for conid in requested},
+        "count": len(requested),
+        "batched": batched,
+        "individual": len(pending),
+        "errors": errors,
+    }
 
 @router.get(
     "/iserver/secdef/bond-filters",
@@ -112,6 +192,7 @@ async def get_contract_info(
     summary="Get Bond Filters",
     description="Returns a list of available bond filters for a given issuer."
 )
+@cached(ttl=86400, max_entries=100, max_bytes=1_000_000)
 async def get_bond_filters(
     issuerId: str = Query(..., description="Specifies the issuerId value used to designate the bond issuer type.")
 ):
@@ -122,15 +203,14 @@ async def get_bond_filters(
         "symbol": "BOND",
         "issuerId": issuerId
     }
-    async with httpx.AsyncClient(verify=False) as client:
-        try:
-            response = await client.get(f"{BASE_URL}/iserver/secdef/bond-filters", params=params, timeout=10)
-            response.raise_for_status()
-            return response.json()
-        except httpx.HTTPStatusError as exc:
-            return {"error": "IBKR API Error", "status_code": exc.response.status_code, "detail": exc.response.text}
-        except httpx.RequestError as exc:
-            return {"error": "Request Error", "detail": str(exc)}
+    try:
+        response = await gateway.get("/iserver/secdef/bond-filters", params=params)
+        response.raise_for_status()
+        return response.json()
+    except httpx.HTTPStatusError as exc:
+        return {"error": "IBKR API Error", "status_code": exc.response.status_code, "detail": exc.response.text}
+    except httpx.RequestError as exc:
+        return {"error": "Request Error", "detail": str(exc)}
 
 @router.get(
     "/iserver/secdef/currency",
@@ -145,15 +225,14 @@ async def search_currency_pairs(
     Retrieves information about a currency pair. Corresponds to the user's request for /iserver/currency/pairs.
     """
     params = {"symbol": symbol}
-    async with httpx.AsyncClient(verify=False) as client:
-        try:
-            response = await client.get(f"{BASE_URL}/iserver/secdef/currency", params=params, timeout=10)
-            response.raise_for_status()
-            return response.json()
-        except httpx.HTTPStatusError as exc:
-            return {"error": "IBKR API Error", "status_code": exc.response.status_code, "detail": exc.response.text}
-        except httpx.RequestError as exc:
-            return {"error": "Request Error", "detail": str(exc)}
+    try:
+        response = await gateway.get("/iserver/secdef/currency", params=params)
+        response.raise_for_status()
+        return response.json()
+    except httpx.HTTPStatusError as exc:
+        return {"error": "IBKR API Error", "status_code": exc.response.status_code, "detail": exc.response.text}
+    except httpx.RequestError as exc:
+        return {"error": "Request Error", "detail": str(exc)}
 
 @router.get(
     "/iserver/secdef/info",
@@ -182,15 +261,14 @@ async def get_secdef_info(
     if right:
         params["right"] = right
 
-    async with httpx.AsyncClient(verify=False) as client:
-        try:
-            response = await client.get(f"{BASE_URL}/iserver/secdef/info", params=params, timeout=10)
-            response.raise_for_status()
-            return response.json()
-        except httpx.HTTPStatusError as exc:
-            return {"error": "IBKR API Error", "status_code": exc.response.status_code, "detail": exc.response.text}
-        except httpx.RequestError as exc:
-            return {"error": "Request Error", "detail": str(exc)}
+    try:
+        response = await gateway.get("/iserver/secdef/info", params=params)
+        response.raise_for_status()
+        return response.json()
+    except httpx.HTTPStatusError as exc:
+        return {"error": "IBKR API Error", "status_code": exc.response.status_code, "detail": exc.response.text}
+    except httpx.RequestError as exc:
+        return {"error": "Request Error", "detail": str(exc)}
 
 @router.get(
     "/iserver/secdef/search",
@@ -205,6 +283,9 @@ async def search_contract_by_symbol_or_name(
 ):
     """
     Searches for contracts based on a symbol or name. This is a primary method for finding a contract's conid.
+    Every search goes to the gateway, which only lists strikes and secdef info for an underlying after a
+    search in the current session. The results are written to the contract master and the symbol index
+    used by `/iserver/secdef/resolve`, but never served from there.
     """
     params = {"symbol": symbol}
     if name is not None:
@@ -212,15 +293,67 @@ async def search_contract_by_symbol_or_name(
     if secType:
         params["secType"] = secType
 
-    async with httpx.AsyncClient(verify=False) as client:
-        try:
-            response = await client.get(f"{BASE_URL}/iserver/secdef/search", params=params, timeout=10)
-            response.raise_for_status()
-            return response.json()
-        except httpx.HTTPStatusError as exc:
-            return {"error": "IBKR API Error", "status_code": exc.response.status_code, "detail": exc.response.text}
-        except httpx.RequestError as exc:
-            return {"error": "Request Error", "detail": str(exc)}
+    lookup_key = f"{symbol.upper()}|{params.get('name', '')}|{secType or ''}"
+    try:
+        response = await gateway.get("/iserver/secdef/search", params=params)
+        response.raise_for_status()
+        results = response.json()
+        if isinstance(results, list) and results:
+            symbol_index.add_search_results(results)
+            contract_store.put_lookup("secdef_search", lookup_key, results)
+            contract_store.put_contracts(
+                {
+                    "conid": item["conid"],
+                    "symbol": item.get("symbol"),
+                    "sec_type": (item.get("sections") or [{}])[0].get("secType"),
+                    "exchange": item.get("description"),
+                    "name": item.get("companyName"),
+                }
+                for item in results
+                if isinstance(item, dict) and str(item.get("conid", "")).isdigit()
+            )
+        return results
+    except httpx.HTTPStatusError as exc:
+        return {"error": "IBKR API Error", "status_code": exc.response.status_code, "detail": exc.response.text}
+    except httpx.RequestError as exc:
+        return {"error": "Request Error", "detail": str(exc)}
+
+@router.get(
+    "/iserver/secdef/resolve",
+    tags=["Contract"],
+    summary="Resolve Symbol or Name",
+    description="Resolves a symbol or company name to contracts from the local symbol index (exact, prefix, name and fuzzy matches), searching the gateway only when nothing is known."
+)
+async def resolve_symbol(
+    query: str = Query(..., description="A symbol ('AAPL', 'ES'), symbol prefix ('AAP') or company name ('apple', 'micro')."),
+    secType: Optional[str] = Query(None, description="The security type to filter by (e.g., STK, FUT)."),
+    mode: str = Query("auto", pattern="^(auto|exact|prefix|name)$", description="'exact' symbol, symbol 'prefix', company 'name' tokens, or 'auto' for all of them."),
+    fuzzy: bool = Query(True, description="Allow near matches (one or two typos) when nothing matches exactly."),
+    limit: int = Query(10, ge=1, le=50, description="Maximum number of matches to return.")
+):
+    """
+    Answers from the in-memory symbol index, which is fed by secdef searches, /trsrv/stocks, /trsrv/futures
+    and the contract master. On a miss the query is searched on the gateway once (as a symbol, then as a
+    name), the results are indexed and the lookup is repeated. `source` tells which path answered.
+    """
+    kinds = {"auto": (EXACT, PREFIX, NAME, FUZZY), "exact": (EXACT,), "prefix": (EXACT, PREFIX), "name": (NAME,)}[mode]
+    symbol_index.load(contract_store)
+    matches = symbol_index.search(query, secType, limit, fuzzy, kinds)
+    source = "index"
+    if not matches:
+        source = "gateway"
+        for by_name in (False, True):
+            results = await search_contract_by_symbol_or_name(symbol=query, name=by_name, secType=secType)
+            if isinstance(results, dict) and results.get("error"):
+                return results
+            matches = symbol_index.search(query, secType, limit, fuzzy, kinds)
+            if matches:
+                break
+    return {
+        "query": query,
+        "source": source,
+        "matches": [{key: value for key, value in match.items() if key != "item"} for match in matches],
+    }
 
 @router.post(
     "/iserver/contract/rules",
@@ -231,20 +364,9 @@ async def search_contract_by_symbol_or_name(
 async def get_contract_rules(body: ContractRulesRequest = Body(...)):
     """
     Fetches the trading rules for a given contract, such as order types and sizes.
+    Served from the rules cache that order validation uses, keyed by conid and side.
     """
-    async with httpx.AsyncClient(verify=False) as client:
-        try:
-            response = await client.post(
-                f"{BASE_URL}/iserver/contract/rules",
-                json=body.dict(),
-                timeout=10
-            )
-            response.raise_for_status()
-            return response.json()
-        except httpx.HTTPStatusError as exc:
-            return {"error": "IBKR API Error", "status_code": exc.response.status_code, "detail": exc.response.text}
-        except httpx.RequestError as exc:
-            return {"error": "Request Error", "detail": str(exc)}
+    return await rules_cache.raw(body.conid, body.isBuy)
 
 @router.get(
     "/iserver/secdef/strikes",
@@ -265,15 +387,14 @@ async def get_strikes(
     if exchange:
         params["exchange"] = exchange
         
-    async with httpx.AsyncClient(verify=False) as client:
-        try:
-            response = await client.get(f"{BASE_URL}/iserver/secdef/strikes", params=params, timeout=10)
-            response.raise_for_status()
-            return response.json()
-        except httpx.HTTPStatusError as exc:
-            return {"error": "IBKR API Error", "status_code": exc.response.status_code, "detail": exc.response.text}
-        except httpx.RequestError as exc:
-            return {"error": "Request Error", "detail": str(exc)}
+    try:
+        response = await gateway.get("/iserver/secdef/strikes", params=params)
+        response.raise_for_status()
+        return response.json()
+    except httpx.HTTPStatusError as exc:
+        return {"error": "IBKR API Error", "status_code": exc.response.status_code, "detail": exc.response.text}
+    except httpx.RequestError as exc:
+        return {"error": "Request Error", "detail": str(exc)}
 
 @router.get(
     "/trsrv/futures",
@@ -281,6 +402,7 @@ async def get_strikes(
     summary="Futures Details by Symbol",
     description="Returns a list of futures for the given symbols."
 )
+@cached(ttl=21600, max_entries=200, max_bytes=4_000_000)
 async def get_trsrv_futures_by_symbol(
     symbols: str = Query(..., description="A comma-separated list of underlying symbols.")
 ):
@@ -288,15 +410,16 @@ async def get_trsrv_futures_by_symbol(
     Get detailed information about futures contracts for given symbols.
     """
     params = {"symbols": symbols}
-    async with httpx.AsyncClient(verify=False) as client:
-        try:
-            response = await client.get(f"{BASE_URL}/trsrv/futures", params=params, timeout=10)
-            response.raise_for_status()
-            return response.json()
-        except httpx.HTTPStatusError as exc:
-            return {"error": "IBKR API Error", "status_code": exc.response.status_code, "detail": exc.response.text}
-        except httpx.RequestError as exc:
-            return {"error": "Request Error", "detail": str(exc)}
+    try:
+        response = await gateway.get("/trsrv/futures", params=params)
+        response.raise_for_status()
+        data = response.json()
+        symbol_index.add_futures(data)
+        return data
+    except httpx.HTTPStatusError as exc:
+        return {"error": "IBKR API Error", "status_code": exc.response.status_code, "detail": exc.response.text}
+    except httpx.RequestError as exc:
+        return {"error": "Request Error", "detail": str(exc)}
 
 @router.get(
     "/trsrv/secdef",
@@ -309,17 +432,29 @@ async def get_secdef_by_conids(
 ):
     """
     Retrieves security definitions for one or more contracts.
+    Conids already in the persistent contract master are served locally; only the rest are requested.
     """
-    params = {"conids": conids}
-    async with httpx.AsyncClient(verify=False) as client:
-        try:
-            response = await client.get(f"{BASE_URL}/trsrv/secdef", params=params, timeout=10)
-            response.raise_for_status()
-            return response.json()
-        except httpx.HTTPStatusError as exc:
-            return {"error": "IBKR API Error", "status_code": exc.response.status_code, "detail": exc.response.text}
-        except httpx.RequestError as exc:
-            return {"error": "Request Error", "detail": str(exc)}
+    requested = [conid.strip() for conid in conids.split(",") if conid.strip()]
+    known = {conid: contract_store.get_secdef(conid) for conid in requested if conid.isdigit()}
+    missing = [conid for conid in requested if known.get(conid) is None]
+    if not missing:
+        return {"secdef": [known[conid] for conid in requested]}
+    params = {"conids": ",".join(missing)}
+    try:
+        response = await gateway.get("/trsrv/secdef", params=params)
+        response.raise_for_status()
+        data = response.json()
+        if not isinstance(data, dict) or not isinstance(data.get("secdef"), list):
+            return data
+        for entry in data["secdef"]:
+            if isinstance(entry, dict) and entry.get("conid") is not None:
+                contract_store.put_secdef(entry)
+                known[str(entry["conid"])] = entry
+        return {"secdef": [known[conid] for conid in requested if known.get(conid) is not None]}
+    except httpx.HTTPStatusError as exc:
+        return {"error": "IBKR API Error", "status_code": exc.response.status_code, "detail": exc.response.text}
+    except httpx.RequestError as exc:
+        return {"error": "Request Error", "detail": str(exc)}
 
 @router.get(
     "/trsrv/stocks",
@@ -332,17 +467,34 @@ async def get_stocks_by_symbol(
 ):
     """
     Fetches stock contracts for a list of symbols. This is more direct than a general search if you know you are looking for stocks.
+    Symbols already in the persistent contract master are served locally; only the rest are requested.
     """
-    params = {"symbols": symbols}
-    async with httpx.AsyncClient(verify=False) as client:
-        try:
-            response = await client.get(f"{BASE_URL}/trsrv/stocks", params=params, timeout=10)
-            response.raise_for_status()
-            return response.json()
-        except httpx.HTTPStatusError as exc:
-            return {"error": "IBKR API Error", "status_code": exc.response.status_code, "detail": exc.response.text}
-        except httpx.RequestError as exc:
-            return {"error": "Request Error", "detail": str(exc)}
+    requested = [symbol.strip().upper() for symbol in symbols.split(",") if symbol.strip()]
+    known = {symbol: contract_store.get_lookup("trsrv_stocks", symbol) for symbol in requested}
+    missing = [symbol for symbol in requested if known[symbol] is None]
+    if not missing:
+        return known
+    params = {"symbols": ",".join(missing)}
+    try:
+        response = await gateway.get("/trsrv/stocks", params=params)
+        response.raise_for_status()
+        data = response.json()
+        if not isinstance(data, dict):
+            return data
+        symbol_index.add_stocks(data)
+        for symbol, entries in data.items():
+            contract_store.put_lookup("trsrv_stocks", symbol.upper(), entries)
+            known[symbol.upper()] = entries
+            contract_store.put_contracts(
+                {"conid": contract["conid"], "symbol": symbol.upper(), "sec_type": entry.get("assetClass"), "exchange": contract.get("exchange"), "name": entry.get("name")}
+                for entry in entries if isinstance(entry, dict)
+                for contract in entry.get("contracts", []) if contract.get("conid") is not None
+            )
+        return {symbol: entries for symbol, entries in known.items() if entries is not None}
+    except httpx.HTTPStatusError as exc:
+        return {"error": "IBKR API Error", "status_code": exc.response.status_code, "detail": exc.response.text}
+    except httpx.RequestError as exc:
+        return {"error": "Request Error", "detail": str(exc)}
 
 @router.get(
     "/trsrv/secdef/schedule",
@@ -350,6 +502,7 @@ async def get_stocks_by_symbol(
     summary="Trading Schedule",
     description="Returns the trading schedule for a contract."
 )
+@cached(ttl=3600, max_entries=500, max_bytes=4_000_000)
 async def get_trading_schedule(
     assetClass: str = Query(..., description="The asset class of the contract, e.g., 'STK', 'OPT', 'FUT'."),
     symbol: str = Query(..., description="The underlying symbol."),
@@ -365,12 +518,71 @@ async def get_trading_schedule(
     if exchangeFilter:
         params["exchangeFilter"] = exchangeFilter
 
-    async with httpx.AsyncClient(verify=False) as client:
-        try:
-            response = await client.get(f"{BASE_URL}/trsrv/secdef/schedule", params=params, timeout=10)
-            response.raise_for_status()
-            return response.json()
-        except httpx.HTTPStatusError as exc:
-            return {"error": "IBKR API Error", "status_code": exc.response.status_code, "detail": exc.response.text}
-        except httpx.RequestError as exc:
-            return {"error": "Request Error", "detail": str(exc)}
+    try:
+        response = await gateway.get("/trsrv/secdef/schedule", params=params)
+        response.raise_for_status()
+        return response.json()
+    except httpx.HTTPStatusError as exc:
+        return {"error": "IBKR API Error", "status_code": exc.response.status_code, "detail": exc.response.text}
+    except httpx.RequestError as exc:
+        return {"error": "Request Error", "detail": str(exc)}
+
+@router.get(
+    "/trsrv/secdef/schedule/status",
+    tags=["Contract"],
+    summary="Market Open Status",
+    description="Returns whether the market is open, and the next open and close, for many conids at once from locally indexed trading schedules."
+)
+async def get_market_status(
+    conids: str = Query(..., description="A comma-separated list of contract IDs."),
+    at: Optional[str] = Query(None, description="Point in time to evaluate in 'YYYYMMDD-hh:mm:ss' (UTC) format; defaults to now.")
+) -> Dict[str, Any]:
+    """
+    Resolves each conid to its asset class, symbol and listing exchange (through the bulk contract details
+    tool), then answers from parsed trading schedules. A schedule is fetched once per asset class, symbol
+    and exchange and reused until its horizon is nearly over, so repeated checks make no gateway calls.
+    `regular` covers liquid hours and `extended` the full trading hours; times are ISO 8601 in exchange time.
+    """
+    try:
+        now = datetime.strptime(at, "%Y%m%d-%H:%M:%S").replace(tzinfo=timezone.utc).timestamp() if at else time.time()
+    except ValueError:
+        return {"error": "Invalid Time", "detail": "at must be in 'YYYYMMDD-hh:mm:ss' format."}
+    details = await get_contract_info_batch(conids=conids, detail="secdef", isBuy=True)
+    if "contracts" not in details:
+        return details
+
+    keys: Dict[str, Any] = {}
+    for conid, contract in details["contracts"].items():
+        if isinstance(contract, dict) and "error" not in contract:
+            asset_class = contract.get("assetClass") or contract.get("instrument_type")
+            symbol = contract.get("ticker") or contract.get("symbol")
+            exchange = contract.get("listingExchange") or contract.get("exchange") or ""
+            keys[conid] = (asset_class, symbol, exchange) if asset_class and symbol else None
+
+    async def load_schedule(key: Any) -> Any:
+        payload = await get_trading_schedule(assetClass=key[0], symbol=key[1], exchange=key[2] or None, exchangeFilter=None)
+        return schedule_index.put(key, payload, now) if not (isinstance(payload, dict) and "error" in payload) else payload
+
+    schedules = {key: schedule_index.get(key, now) for key in set(keys.values()) if key}
+    missing = [key for key, schedule in schedules.items() if schedule is None]
+    schedules.update(zip(missing, await asyncio.gather(*(load_schedule(key) for key in missing))))
+
+    results: Dict[str, Any] = {}
+    for conid, contract in details["contracts"].items():
+        key = keys.get(conid)
+        schedule = schedules.get(key)
+        if isinstance(contract, dict) and "error" in contract:
+            results[conid] = contract
+        elif key is None:
+            results[conid] = {"error": "Unknown Contract", "detail": "Asset class or symbol not available for this conid."}
+        elif not isinstance(schedule, Schedule):
+            results[conid] = schedule or {"error": "No Schedule", "detail": "The gateway returned no trading schedule."}
+        else:
+            results[conid] = {
+                "symbol": key[1],
+                "exchange": schedule.exchange,
+                "timezone": schedule.timezone,
+                "regular": schedule.status(now, "regular"),
+                "extended": schedule.status(now, "extended"),
+            }
+    return {"at": datetime.fromtimestamp(now, timezone.utc).isoformat(), "contracts": results, "fetched": len(missing)}
@@ -0,0 +1,76 @@
+# gateway_admin.py
+from fastapi import APIRouter, Query
+from typing import Dict, Any, Optional
+from mcp_server.bar_store import bar_store
+from mcp_server.contract_store import contract_store
+from mcp_server.gateway import gateway
+from mcp_server.hmds import hmds_session
+from mcp_server.market_data_lines import line_manager
+from mcp_server.order_rules import rules_cache
+from mcp_server.quotes import quote_service
+from mcp_server.response_cache import ROUTE_CACHES, cache_stats, invalidate
+from mcp_server.snapshots import snapshot_engine
+from mcp_server.streaming import gateway_stream
+from mcp_server.symbol_index import symbol_index
+from mcp_server.trading_hours import schedule_index
+
+router = APIRouter()
+
+# --- Gateway Admin Router Endpoints ---
+# These endpoints report on the MCP server itself and never call the Client Portal gateway.
+
+@router.get(
+    "/gateway/stats",
+    tags=["Gateway"],
+    summary="Gateway Client Statistics",
+    description="Returns connection pool limits, open/idle connection counts, request counters, pacing queue depth and wait times, the GET coalescing hit rate, contract master hit rate, symbol index size and hit rate, historical bar store hit rate, HMDS session inits, snapshot warm-up poll counts, market data line utilization, live quote cache state, and websocket stream state."
+)
+async def get_gateway_stats() -> Dict[str, Any]:
+    """
+    Reports the state of the MCP server's pooled connection to the Client Portal gateway.
+    """
+    return {
+        "pool": gateway.pool_stats(),
+        "pacing": gateway.pacer.stats(),
+        "coalescing": gateway.coalescing_stats(),
+        "contract_store": contract_store.stats(),
+        "symbol_index": symbol_index.stats(),
+        "schedule_index": schedule_index.stats(),
+        "order_rules": rules_cache.stats(),
+        "bar_store": bar_store.stats(),
+        "hmds": hmds_session.stats(),
+        "snapshots": snapshot_engine.stats(),
+        "market_data_lines": line_manager.stats(),
+        "quotes": quote_service.stats(),
+        "streaming": gateway_stream.stats(),
+    }
+
+
+@router.get(
+    "/gateway/cache",
+    tags=["Gateway"],
+    summary="Response Cache Status",
+    description="Returns the cache policy, entry count, memory footprint, hit rate and evictions for every cached route."
+)
+async def get_response_cache() -> Dict[str, Any]:
+    """
+    Inspects the per-route response cache.
+    """
+    return cache_stats()
+
+
+@router.delete(
+    "/gateway/cache",
+    tags=["Gateway"],
+    summary="Flush Response Cache",
+    description="Flushes the response cache for one route, or for all routes when no route is given."
+)
+async def flush_response_cache(
+    route: Optional[str] = Query(None, description="The route function name to flush, e.g. 'get_contract_info'. Omit to flush every route.")
+) -> Dict[str, Any]:
+    """
+    Removes cached responses so the next call goes to the gateway.
+    """
+    if route is not None and route not in ROUTE_CACHES:
+        return {"error": "Unknown Route", "detail": f"No cache policy is declared for '{route}'.", "routes": sorted(ROUTE_CACHES)}
+    return {"flushed": invalidate(route), "route": route}
@@ -1,9 +1,23 @@
 # market_data.py
-from fastapi import APIRouter, Query, Body, Path
-from typing import List, Dict, Any, Union, Optional
+from fastapi import APIRouter, Query, Body, Path, Response
+from typing import List, Dict, Any, Tuple, Union, Optional
+import asyncio
 import httpx
+import numpy as np
 from pydantic import BaseModel, Field
-from mcp_server.config import BASE_URL
+from mcp_server.backfill import backfill_manager
+from mcp_server.bar_store import bar_store, bars_to_columns
+from mcp_server.columnar import format_history
+from mcp_server.config import HISTORY_BATCH_CONCURRENCY, HISTORY_BATCH_MAX_CONIDS
+from mcp_server.field_index import FieldIndex
+from mcp_server.gateway import gateway
+from mcp_server.history_matrix import align, forward_fill, matrix_rows, returns
+from mcp_server.history_rules import HmdsHistoryRules, IserverHistoryRules
+from mcp_server.hmds import hmds_session
+from mcp_server.indicators import compute, parse_indicators
+from mcp_server.market_data_lines import line_manager
+from mcp_server.quotes import quote_service
+from mcp_server.streaming import ensure_stream
 
 router = APIRouter()
 
@@ -14,14 +28,140 @@ class UnsubscribeRequest(BaseModel):
     conid: str = Field(..., description="The contract ID to unsubscribe from.")
 
 
+class BackfillRequest(BaseModel):
+    """Request model for a long-range HMDS history backfill."""
+    conid: str = Field(..., description="The contract ID.")
+    bar: str = Field(..., description="The bar size, e.g. '1min', '5mins', '1h', '1d'.")
+    startTime: str = Field(..., description="Start of the range in 'YYYYMMDD-hh:mm:ss' (UTC) format.")
+    endTime: Optional[str] = Field(None, description="End of the range in 'YYYYMMDD-hh:mm:ss' (UTC) format. Defaults to now.")
+    barType: str = Field("trades", description="The type of data to return.")
+    outsideRth: bool = Field(False, description="Set to true to include data outside regular trading hours.")
+
+
 # --- Market Data Field and Availability Information ---
 
+# `type` is how the value decodes: "Number" and "Percent" fields become floats, "String" fields are kept as text.
 MARKET_DATA_FIELDS = [
-    {"field_code": "31", "type": "String", "name": "Last Price"},
-    # ... (omitted for brevity, same as before)
-    {"field_code": "7633", "type": "String", "name": "VWAP"},
+    {"field_code": "31", "type": "Number", "name": "Last Price"},
+    {"field_code": "55", "type": "String", "name": "Symbol"},
+    {"field_code": "58", "type": "String", "name": "Text"},
+    {"field_code": "70", "type": "Number", "name": "High"},
+    {"field_code": "71", "type": "Number", "name": "Low"},
+    {"field_code": "73", "type": "Number", "name": "Market Value"},
+    {"field_code": "74", "type": "Number", "name": "Average Price"},
+    {"field_code": "75", "type": "Number", "name": "Unrealized PnL"},
+    {"field_code": "76", "type": "String", "name": "Formatted Position"},
+    {"field_code": "77", "type": "String", "name": "Formatted Unrealized PnL"},
+    {"field_code": "78", "type": "Number", "name": "Daily PnL"},
+    {"field_code": "79", "type": "Number", "name": "Realized PnL"},
+    {"field_code": "80", "type": "Percent", "name": "Unrealized PnL %"},
+    {"field_code": "82", "type": "Number", "name": "Change"},
+    {"field_code": "83", "type": "Percent", "name": "Change %"},
+    {"field_code": "84", "type": "Number", "name": "Bid Price"},
+    {"field_code": "85", "type": "Number", "name": "Ask Size"},
+    {"field_code": "86", "type": "Number", "name": "Ask Price"},
+    {"field_code": "87", "type": "Number", "name": "Volume"},
+    {"field_code": "87_raw", "type": "Number", "name": "Volume Raw"},
+    {"field_code": "88", "type": "Number", "name": "Bid Size"},
+    {"field_code": "201", "type": "String", "name": "Right"},
+    {"field_code": "6004", "type": "String", "name": "Exchange"},
+    {"field_code": "6008", "type": "String", "name": "Conid"},
+    {"field_code": "6070", "type": "String", "name": "SecType"},
+    {"field_code": "6072", "type": "String", "name": "Months"},
+    {"field_code": "6073", "type": "String", "name": "Regular Expiry"},
+    {"field_code": "6119", "type": "String", "name": "Market Data Delivery Marker"},
+    {"field_code": "6457", "type": "String", "name": "Underlying Conid"},
+    {"field_code": "6508", "type": "String", "name": "Service Params"},
+    {"field_code": "6509", "type": "String", "name": "Market Data Availability"},
+    {"field_code": "7051", "type": "String", "name": "Company Name"},
+    {"field_code": "7057", "type": "String", "name": "Ask Exchange"},
+    {"field_code": "7058", "type": "String", "name": "Last Exchange"},
+    {"field_code": "7059", "type": "Number", "name": "Last Size"},
+    {"field_code": "7068", "type": "String", "name": "Bid Exchange"},
+    {"field_code": "7084", "type": "Percent", "name": "Implied Vol / Hist Vol %"},
+    {"field_code": "7085", "type": "Number", "name": "Put/Call Interest"},
+    {"field_code": "7086", "type": "Number", "name": "Put/Call Volume"},
+    {"field_code": "7087", "type": "Percent", "name": "Hist Vol %"},
+    {"field_code": "7088", "type": "Percent", "name": "Hist Vol Close %"},
+    {"field_code": "7089", "type": "Number", "name": "Option Volume"},
+    {"field_code": "7094", "type": "String", "name": "Conid + Exchange"},
+    {"field_code": "7184", "type": "Number", "name": "Can Be Traded"},
+    {"field_code": "7219", "type": "String", "name": "Contract Description"},
+    {"field_code": "7220", "type": "String", "name": "Contract Description Alt"},
+    {"field_code": "7221", "type": "String", "name": "Listing Exchange"},
+    {"field_code": "7280", "type": "String", "name": "Industry"},
+    {"field_code": "7281", "type": "String", "name": "Category"},
+    {"field_code": "7282", "type": "Number", "name": "Average Volume"},
+    {"field_code": "7283", "type": "Percent", "name": "Option Implied Vol %"},
+    {"field_code": "7284", "type": "Percent", "name": "Historical Vol %"},
+    {"field_code": "7285", "type": "Number", "name": "Put/Call Ratio"},
+    {"field_code": "7286", "type": "Number", "name": "Dividend Amount"},
+    {"field_code": "7287", "type": "Percent", "name": "Dividend Yield %"},
+    {"field_code": "7288", "type": "String", "name": "Ex-Dividend Date"},
+    {"field_code": "7289", "type": "Number", "name": "Market Cap"},
+    {"field_code": "7290", "type": "Number", "name": "P/E"},
+    {"field_code": "7291", "type": "Number", "name": "EPS"},
+    {"field_code": "7292", "type": "Number", "name": "Cost Basis"},
+    {"field_code": "7293", "type": "Number", "name": "52 Week High"},
+    {"field_code": "7294", "type": "Number", "name": "52 Week Low"},
+    {"field_code": "7295", "type": "Number", "name": "Open"},
+    {"field_code": "7296", "type": "Number", "name": "Close"},
+    {"field_code": "7308", "type": "Number", "name": "Delta"},
+    {"field_code": "7309", "type": "Number", "name": "Gamma"},
+    {"field_code": "7310", "type": "Number", "name": "Theta"},
+    {"field_code": "7311", "type": "Number", "name": "Vega"},
+    {"field_code": "7607", "type": "Percent", "name": "Option Volume Change %"},
+    {"field_code": "7633", "type": "Number", "name": "VWAP"},
+    {"field_code": "7635", "type": "Number", "name": "Mark"},
+    {"field_code": "7636", "type": "Number", "name": "Shortable Shares"},
+    {"field_code": "7637", "type": "Number", "name": "Fee Rate"},
+    {"field_code": "7638", "type": "Number", "name": "Option Open Interest"},
+    {"field_code": "7639", "type": "Percent", "name": "Percent of Mark Value"},
+    {"field_code": "7644", "type": "String", "name": "Shortable"},
+    {"field_code": "7655", "type": "String", "name": "Morningstar Rating"},
+    {"field_code": "7671", "type": "Number", "name": "Dividends"},
+    {"field_code": "7672", "type": "Number", "name": "Dividends TTM"},
+    {"field_code": "7674", "type": "Number", "name": "EMA 200"},
+    {"field_code": "7675", "type": "Number", "name": "EMA 100"},
+    {"field_code": "7676", "type": "Number", "name": "EMA 50"},
+    {"field_code": "7677", "type": "Number", "name": "EMA 20"},
+    {"field_code": "7678", "type": "Number", "name": "Price/EMA 200"},
+    {"field_code": "7679", "type": "Number", "name": "Price/EMA 100"},
+    {"field_code": "7724", "type": "Number", "name": "Price/EMA 50"},
+    {"field_code": "7681", "type": "Number", "name": "Price/EMA 20"},
+    {"field_code": "7682", "type": "Number", "name": "Change Since Open"},
+    {"field_code": "7683", "type": "String", "name": "Upcoming Event"},
+    {"field_code": "7684", "type": "String", "name": "Upcoming Event Date"},
+    {"field_code": "7685", "type": "String", "name": "Upcoming Analyst Meeting"},
+    {"field_code": "7686", "type": "String", "name": "Upcoming Earnings"},
+    {"field_code": "7687", "type": "String", "name": "Upcoming Misc Event"},
+    {"field_code": "7688", "type": "String", "name": "Recent Analyst Meeting"},
+    {"field_code": "7689", "type": "String", "name": "Recent Earnings"},
+    {"field_code": "7690", "type": "String", "name": "Recent Misc Event"},
+    {"field_code": "7694", "type": "Percent", "name": "Probability of Max Return"},
+    {"field_code": "7695", "type": "Number", "name": "Break Even"},
+    {"field_code": "7696", "type": "Number", "name": "SPX Delta"},
+    {"field_code": "7697", "type": "Number", "name": "Futures Open Interest"},
+    {"field_code": "7698", "type": "Percent", "name": "Last Yield"},
+    {"field_code": "7699", "type": "Percent", "name": "Bid Yield"},
+    {"field_code": "7702", "type": "Percent", "name": "Probability of Max Loss"},
+    {"field_code": "7703", "type": "Percent", "name": "Profit Probability"},
+    {"field_code": "7704", "type": "String", "name": "Organization Type"},
+    {"field_code": "7705", "type": "String", "name": "Debt Class"},
+    {"field_code": "7706", "type": "String", "name": "Ratings"},
+    {"field_code": "7707", "type": "String", "name": "Bond State Code"},
+    {"field_code": "7708", "type": "String", "name": "Bond Type"},
+    {"field_code": "7714", "type": "String", "name": "Last Trading Date"},
+    {"field_code": "7715", "type": "String", "name": "Issue Date"},
+    {"field_code": "7718", "type": "Number", "name": "Beta"},
+    {"field_code": "7720", "type": "Percent", "name": "Ask Yield"},
+    {"field_code": "7741", "type": "Number", "name": "Prior Close"},
+    {"field_code": "7762", "type": "Number", "name": "Volume Long"},
+    {"field_code": "7768", "type": "Number", "name": "Has Trading Permissions"},
 ]
 
+FIELD_INDEX = FieldIndex(MARKET_DATA_FIELDS)
+
 MARKET_DATA_AVAILABILITY = {
     "L": {"name": "Live", "description": "Real-time streaming data. Requires Market Data subscription."},
     # ... (omitted for brevity, same as before)
@@ -60,6 +200,99 @@ ISERVER_HISTORY_RULES = {
     }
 }
 
+# Executable forms of the tables above; every history request is normalized against them before going upstream.
+ISERVER_RULES = IserverHistoryRules(ISERVER_HISTORY_RULES)
+HMDS_RULES = HmdsHistoryRules(HMDS_HISTORY_RULES)
+
+
+# --- History Loading ---
+# Shared by the history tools and the tools computed over history. They return the gateway payload and the
+# bar store status (None when the store was bypassed), and let httpx errors propagate to the route.
+# Period and bar are first normalized against the history rules: illegal requests raise ValueError without
+# a gateway call, and corrections are listed under `adjusted` in the payload.
+
+def with_adjustments(payload: Any, adjusted: List[str]) -> Any:
+    if adjusted and isinstance(payload, dict):
+        payload["adjusted"] = adjusted
+    return payload
+
+
+async def load_iserver_history(
+    conid: str,
+    period: str,
+    bar: Optional[str],
+    exchange: Optional[str] = None,
+    outsideRth: Optional[bool] = False,
+    barType: Optional[str] = "trades",
+    startTime: Optional[str] = None,
+) -> Tuple[Any, Optional[str]]:
+    period, bar, adjusted = ISERVER_RULES.normalize(period, bar)
+    params = {
+        "conid": conid,
+        "period": period,
+        "outsideRth": str(outsideRth).lower()
+    }
+    if bar:
+        params["bar"] = bar
+    if exchange:
+        params["exchange"] = exchange
+    if barType:
+        params["barType"] = barType
+
+    async def fetch(fetch_period: str, fetch_start: Optional[str], fetch_bar: Optional[str] = None) -> Dict[str, Any]:
+        fetch_params = {**params, "period": fetch_period}
+        if fetch_bar:
+            fetch_params["bar"] = fetch_bar
+        if fetch_start:
+            fetch_params["startTime"] = fetch_start
+        response = await gateway.get("/iserver/marketdata/history", params=fetch_params)
+        response.raise_for_status()
+        return response.json()
+
+    if bar:
+        key = bar_store.key("iserver", conid, bar, barType, outsideRth, exchange)
+        payload, status = await bar_store.get(key, period, bar, fetch, start_time=startTime)
+        if payload is not None:
+            return with_adjustments(payload, adjusted), status
+    return with_adjustments(await fetch(period, startTime), adjusted), None
+
+
+async def load_hmds_history(
+    conid: str,
+    period: str,
+    bar: Optional[str],
+    outsideRth: Optional[bool] = False,
+    barType: Optional[str] = "trades",
+    startTime: Optional[str] = None,
+) -> Tuple[Any, Optional[str]]:
+    period, bar, adjusted = HMDS_RULES.normalize(period, bar)
+    params = {
+        "conid": conid,
+        "period": period,
+        "outsideRth": str(outsideRth).lower()
+    }
+    if bar:
+        params["bar"] = bar
+    if barType:
+        params["barType"] = barType
+
+    async def fetch(fetch_period: str, fetch_start: Optional[str], fetch_bar: Optional[str] = None) -> Dict[str, Any]:
+        fetch_params = {**params, "period": fetch_period}
+        if fetch_bar:
+            fetch_params["bar"] = fetch_bar
+        if fetch_start:
+            fetch_params["startTime"] = fetch_start
+        response = await hmds_session.get("/hmds/history", params=fetch_params)
+        response.raise_for_status()
+        return response.json()
+
+    if bar:
+        key = bar_store.key("hmds", conid, bar, barType, outsideRth)
+        payload, status = await bar_store.get(key, period, bar, fetch, hmds=True, start_time=startTime)
+        if payload is not None:
+            return with_adjustments(payload, adjusted), status
+    return with_adjustments(await fetch(period, startTime), adjusted), None
+
 
 # --- Market Data Router Endpoints ---
 
@@ -67,10 +300,10 @@ ISERVER_HISTORY_RULES = {
     "/iserver/marketdata/fields",
     tags=["Market Data"],
     summary="Available Market Data Fields",
-    description="Returns a list of all available fields for the Market Data Snapshot endpoint."
+    description="Returns a list of all available fields for the Market Data Snapshot endpoint, with the key each field can be requested and decoded by."
 )
 async def get_available_fields() -> List[Dict[str, str]]:
-    return MARKET_DATA_FIELDS
+    return FIELD_INDEX.describe()
 
 @router.get(
     "/iserver/marketdata/availability",
@@ -107,24 +340,38 @@ async def get_iserver_history_rules() -> Dict[str, Any]:
     description="Get a snapshot of market data for one or more contracts."
 )
 async def get_marketdata_snapshot(
+    http_response: Response,
     conids: str = Query(..., description="A comma-separated list of contract IDs."),
-    fields: str = Query(..., description="A comma-separated list of field codes.")
-) -> List[Dict[str, Any]]:
+    fields: str = Query(..., description="A comma-separated list of field codes or keys (e.g. '31,84' or 'last_price,bid_price')."),
+    max_age: Optional[float] = Query(None, description="Answer from the live quote cache when the cached fields are at most this many seconds old. The conids are then kept fresh by a background poller."),
+    decode: bool = Query(False, description="Return named, typed columns (numbers parsed, C/H markers split out) instead of the raw gateway rows.")
+) -> Union[List[Dict[str, Any]], Dict[str, Any]]:
     """
     ### Get Market Data Snapshot
-    Fetches a snapshot of market data. This endpoint is called twice internally to ensure data retrieval.
+    Fetches a snapshot of market data. Conids that are already subscribed are answered with a single call;
+    for new conids the gateway is polled with short backoff until the requested fields are populated.
+    The number of polls is returned in the `X-Snapshot-Polls` header.
+    Large conid lists are split into gateway-sized batches that are fetched concurrently and merged in input order;
+    a failed batch returns error rows for its conids instead of failing the whole call.
+    With `max_age`, fresh conids are served from the live quote cache without a gateway call; when websocket
+    streaming is enabled the cache is fed by the gateway stream instead of the poller.
+    Fields can be given by code or by key from `/iserver/marketdata/fields`. With `decode=true` the rows are
+    returned as one column per field key, with numeric values parsed and `C`/`H` prefixes reported in `markers`.
     """
-    params = {"conids": conids, "fields": fields}
-    async with httpx.AsyncClient(verify=False) as client:
-        try:
-            await client.get(f"{BASE_URL}/iserver/marketdata/snapshot", params=params, timeout=10)
-            response = await client.get(f"{BASE_URL}/iserver/marketdata/snapshot", params=params, timeout=10)
-            response.raise_for_status()
-            return response.json()
-        except httpx.HTTPStatusError as exc:
-            return {"error": "IBKR API Error", "status_code": exc.response.status_code, "detail": exc.response.text}
-        except httpx.RequestError as exc:
-            return {"error": "Request Error", "detail": str(exc)}
+    conid_list = [conid.strip() for conid in conids.split(",") if conid.strip()]
+    try:
+        field_list = FIELD_INDEX.resolve(field.strip() for field in fields.split(",") if field.strip())
+    except ValueError as exc:
+        return {"error": "Invalid Fields", "detail": str(exc)}
+    ensure_stream()
+    try:
+        rows, polls = await quote_service.snapshot(conid_list, field_list, max_age)
+        http_response.headers["X-Snapshot-Polls"] = str(polls)
+        return FIELD_INDEX.decode(rows, field_list) if decode else rows
+    except httpx.HTTPStatusError as exc:
+        return {"error": "IBKR API Error", "status_code": exc.response.status_code, "detail": exc.response.text}
+    except httpx.RequestError as exc:
+        return {"error": "Request Error", "detail": str(exc)}
 
 @router.get(
     "/md/snapshot",
@@ -134,20 +381,28 @@ async def get_marketdata_snapshot(
 )
 async def get_md_snapshot(
     conids: str = Query(..., description="A comma-separated list of contract IDs."),
-    fields: Optional[str] = Query(None, description="A comma-separated list of field codes.")
+    fields: Optional[str] = Query(None, description="A comma-separated list of field codes or keys."),
+    max_age: Optional[float] = Query(None, description="Answer from the live quote cache when the cached fields are at most this many seconds old. Requires fields."),
+    decode: bool = Query(False, description="Return named, typed columns instead of the raw gateway rows.")
 ):
-    params = {"conids": conids}
-    if fields:
-        params["fields"] = fields
-    async with httpx.AsyncClient(verify=False) as client:
-        try:
-            response = await client.get(f"{BASE_URL}/md/snapshot", params=params, timeout=10)
-            response.raise_for_status()
-            return response.json()
-        except httpx.HTTPStatusError as exc:
-            return {"error": "IBKR API Error", "status_code": exc.response.status_code, "detail": exc.response.text}
-        except httpx.RequestError as exc:
-            return {"error": "Request Error", "detail": str(exc)}
+    """
+    Fetches a non-streaming snapshot for the given conids. Large conid lists are split into gateway-sized
+    batches that are fetched concurrently and merged in input order.
+    With `max_age` and `fields`, fresh conids are served from the live quote cache without a gateway call.
+    `decode=true` returns named, typed columns as for `/iserver/marketdata/snapshot`.
+    """
+    conid_list = [conid.strip() for conid in conids.split(",") if conid.strip()]
+    try:
+        field_list = FIELD_INDEX.resolve(field.strip() for field in fields.split(",") if field.strip()) if fields else None
+    except ValueError as exc:
+        return {"error": "Invalid Fields", "detail": str(exc)}
+    try:
+        rows, _ = await quote_service.snapshot(conid_list, field_list, max_age, md=True)
+        return FIELD_INDEX.decode(rows, field_list) if decode else rows
+    except httpx.HTTPStatusError as exc:
+        return {"error": "IBKR API Error", "status_code": exc.response.status_code, "detail": exc.response.text}
+    except httpx.RequestError as exc:
+        return {"error": "Request Error", "detail": str(exc)}
 
 
 @router.get(
@@ -157,33 +412,34 @@ async def get_md_snapshot(
     description="Get historical market data for a contract. Use `/iserver/marketdata/history/rules` for valid parameters."
 )
 async def get_marketdata_history(
+    http_response: Response,
     conid: str = Query(..., description="The contract ID."),
     period: str = Query(..., description="The time period for the request, e.g., '1d', '2w'."),
     bar: Optional[str] = Query(None, description="The bar size, e.g., '1min', '1h'."),
     exchange: Optional[str] = Query(None, description="The exchange to query."),
     outsideRth: Optional[bool] = Query(False, description="Set to true to include data outside regular trading hours."),
-    barType: Optional[str] = Query("trades", description="The type of data to return, e.g., 'trades', 'midpoint'.")
+    barType: Optional[str] = Query("trades", description="The type of data to return, e.g., 'trades', 'midpoint'."),
+    startTime: Optional[str] = Query(None, description="End of the requested window in 'YYYYMMDD-hh:mm:ss' (UTC) format; defaults to now."),
+    response_format: str = Query("bars", alias="format", pattern="^(bars|columnar)$", description="'bars' (the gateway's list of bar objects) or 'columnar' (one array per field, timestamps as t0 plus deltas dt)."),
+    precision: Optional[int] = Query(None, ge=0, le=10, description="Round prices and volumes to at most this many decimals.")
 ):
-    params = {
-        "conid": conid,
-        "period": period,
-        "outsideRth": str(outsideRth).lower()
-    }
-    if bar:
-        params["bar"] = bar
-    if exchange:
-        params["exchange"] = exchange
-    if barType:
-        params["barType"] = barType
-    async with httpx.AsyncClient(verify=False) as client:
-        try:
-            response = await client.get(f"{BASE_URL}/iserver/marketdata/history", params=params, timeout=20)
-            response.raise_for_status()
-            return response.json()
-        except httpx.HTTPStatusError as exc:
-            return {"error": "IBKR API Error", "status_code": exc.response.status_code, "detail": exc.response.text}
-        except httpx.RequestError as exc:
-            return {"error": "Request Error", "detail": str(exc)}
+    """
+    Fetches historical bars. When `bar` is given, bars are served from the historical bar store and only
+    ranges not yet covered are requested from the gateway. Coarser bars are derived from cached finer bars
+    when possible. The `barStore` field (and `X-Bar-Store` header) reports hit, partial, miss or derived.
+    `format=columnar` returns one array per field with delta-encoded timestamps, which is much smaller for long series.
+    """
+    try:
+        payload, status = await load_iserver_history(conid, period, bar, exchange, outsideRth, barType, startTime)
+        if status:
+            http_response.headers["X-Bar-Store"] = status
+        return format_history(payload, response_format, precision)
+    except ValueError as exc:
+        return {"error": "Invalid History Request", "detail": str(exc)}
+    except httpx.HTTPStatusError as exc:
+        return {"error": "IBKR API Error", "status_code": exc.response.status_code, "detail": exc.response.text}
+    except httpx.RequestError as exc:
+        return {"error": "Request Error", "detail": str(exc)}
 
 
 @router.get(
@@ -193,37 +449,274 @@ async def get_marketdata_history(
     description="Get historical market data from the HMDS. Use `/hmds/history/rules` for valid parameters."
 )
 async def get_hmds_history(
+    http_response: Response,
     conid: str = Query(..., description="The contract ID."),
     period: str = Query(..., description="The time period. Note: units are case-sensitive."),
     bar: Optional[str] = Query(None, description="The bar size. Note: allowed units depend on the period."),
     outsideRth: Optional[bool] = Query(False, description="Set to true to include data outside regular trading hours."),
     barType: Optional[str] = Query("trades", description="The type of data to return."),
-    startTime: Optional[str] = Query(None, description="Specify the start time of the query in 'YYYYMMDD-hh:mm:ss' format.")
+    startTime: Optional[str] = Query(None, description="Specify the start time of the query in 'YYYYMMDD-hh:mm:ss' format."),
+    response_format: str = Query("bars", alias="format", pattern="^(bars|columnar)$", description="'bars' (the gateway's list of bar objects) or 'columnar' (one array per field, timestamps as t0 plus deltas dt)."),
+    precision: Optional[int] = Query(None, ge=0, le=10, description="Round prices and volumes to at most this many decimals.")
 ):
     """
-    Fetches deeper historical market data using the HMDS. It first calls /hmds/auth/init to authenticate the session.
+    Fetches deeper historical market data using the HMDS. The HMDS session is initialized once and re-initialized
+    only when the gateway reports it as not initialized.
+    When `bar` is given, bars are served from the historical bar store and only ranges not yet covered are
+    requested. Coarser bars are derived from cached finer bars when possible. The `barStore` field (and
+    `X-Bar-Store` header) reports hit, partial, miss or derived.
+    `format=columnar` returns one array per field with delta-encoded timestamps, which is much smaller for long series.
     """
-    params = {
+    try:
+        payload, status = await load_hmds_history(conid, period, bar, outsideRth, barType, startTime)
+        if status:
+            http_response.headers["X-Bar-Store"] = status
+        return format_history(payload, response_format, precision)
+    except ValueError as exc:
+        return {"error": "Invalid History Request", "detail": str(exc)}
+    except httpx.HTTPStatusError as exc:
+        return {"error": "IBKR API Error", "status_code": exc.response.status_code, "detail": exc.response.text}
+    except httpx.RequestError as exc:
+        return {"error": "Request Error", "detail": str(exc)}
+
+@router.get(
+    "/iserver/marketdata/indicators",
+    tags=["Market Data"],
+    summary="Technical Indicators",
+    description="Computes technical indicators over historical bars server-side and returns only the latest values. Indicators: sma:N, ema:N, rsi:N, atr:N, vwap, bb:N:K (Bollinger), vol:N (rolling volatility of log returns)."
+)
+async def get_indicators(
+    conid: str = Query(..., description="The contract ID."),
+    period: str = Query(..., description="The history period to compute over, e.g. '1y'. Use enough history for the longest window."),
+    bar: str = Query(..., description="The bar size, e.g. '1d', '1h', '5min'."),
+    indicators: str = Query(..., description="Comma-separated indicators with ':'-separated parameters, e.g. 'sma:200,ema:20,rsi:14,atr:14,vwap,bb:20:2,vol:20'."),
+    tail: int = Query(1, ge=1, le=500, description="Number of most recent values to return for each indicator."),
+    source: str = Query("iserver", description="History source: 'iserver' (/iserver/marketdata/history) or 'hmds' (/hmds/history)."),
+    outsideRth: Optional[bool] = Query(False, description="Set to true to include data outside regular trading hours."),
+    barType: Optional[str] = Query("trades", description="The type of data to compute over, e.g. 'trades', 'midpoint'."),
+    startTime: Optional[str] = Query(None, description="End of the history window in 'YYYYMMDD-hh:mm:ss' (UTC) format; defaults to now.")
+) -> Dict[str, Any]:
+    """
+    Loads the bars through the same bar store as the history tools (so cached or derivable bars cost no
+    gateway call), computes the indicators with vectorized NumPy over the full series, and returns only
+    the last `tail` values. Values are null until an indicator has enough bars.
+    """
+    try:
+        spec = parse_indicators(indicators)
+    except ValueError as exc:
+        return {"error": "Invalid Indicators", "detail": str(exc)}
+    if not spec:
+        return {"error": "Invalid Indicators", "detail": "No indicators requested."}
+    if source not in ("iserver", "hmds"):
+        return {"error": "Invalid Source", "detail": "source must be 'iserver' or 'hmds'."}
+    try:
+        if source == "hmds":
+            payload, status = await load_hmds_history(conid, period, bar, outsideRth, barType, startTime)
+        else:
+            payload, status = await load_iserver_history(conid, period, bar, None, outsideRth, barType, startTime)
+    except ValueError as exc:
+        return {"error": "Invalid History Request", "detail": str(exc)}
+    except httpx.HTTPStatusError as exc:
+        return {"error": "IBKR API Error", "status_code": exc.response.status_code, "detail": exc.response.text}
+    except httpx.RequestError as exc:
+        return {"error": "Request Error", "detail": str(exc)}
+    if not isinstance(payload, dict) or not isinstance(payload.get("data"), list):
+        return {"error": "No History", "detail": payload}
+    columns = bars_to_columns(payload["data"])
+    return {
         "conid": conid,
+        "symbol": payload.get("symbol"),
         "period": period,
-        "outsideRth": str(outsideRth).lower()
+        "bar": bar,
+        "source": source,
+        "barStore": status,
+        "bars": len(columns["t"]),
+        **compute(columns, spec, tail),
     }
-    if bar:
-        params["bar"] = bar
-    if barType:
-        params["barType"] = barType
-    if startTime:
-        params["startTime"] = startTime
-    async with httpx.AsyncClient(verify=False) as client:
-        try:
-            await client.get(f"{BASE_URL}/hmds/auth/init", timeout=10)
-            response = await client.get(f"{BASE_URL}/hmds/history", params=params, timeout=30)
-            response.raise_for_status()
-            return response.json()
-        except httpx.HTTPStatusError as exc:
-            return {"error": "IBKR API Error", "status_code": exc.response.status_code, "detail": exc.response.text}
-        except httpx.RequestError as exc:
-            return {"error": "Request Error", "detail": str(exc)}
+
+
+@router.get(
+    "/iserver/marketdata/history/batch",
+    tags=["Market Data"],
+    summary="Batch History Matrix",
+    description="Loads history for many contracts in one call and returns their closes or returns aligned on a common timestamp index, with a status per conid."
+)
+async def get_history_batch(
+    conids: str = Query(..., description="A comma-separated list of contract IDs."),
+    period: str = Query(..., description="The history period, e.g. '1y'."),
+    bar: str = Query(..., description="The bar size, e.g. '1d', '1h', '5min'."),
+    values: str = Query("close", pattern="^(close|returns|log_returns)$", description="Matrix values: 'close', 'returns' (simple) or 'log_returns'."),
+    join: str = Query("outer", pattern="^(outer|inner)$", description="'outer' keeps every timestamp (null where a contract has no bar), 'inner' only timestamps all contracts share."),
+    fill: bool = Query(False, description="Forward-fill missing closes before computing values."),
+    source: str = Query("iserver", description="History source: 'iserver' (/iserver/marketdata/history) or 'hmds' (/hmds/history)."),
+    outsideRth: Optional[bool] = Query(False, description="Set to true to include data outside regular trading hours."),
+    barType: Optional[str] = Query("trades", description="The type of data to return, e.g. 'trades', 'midpoint'."),
+    startTime: Optional[str] = Query(None, description="End of the history window in 'YYYYMMDD-hh:mm:ss' (UTC) format; defaults to now."),
+    precision: Optional[int] = Query(6, ge=0, le=10, description="Decimals kept in the matrix values.")
+) -> Dict[str, Any]:
+    """
+    Replaces one history call per contract. The conids are loaded concurrently through the bar store
+    (`HISTORY_BATCH_CONCURRENCY` at a time, each still paced by the gateway client), so cached and derivable
+    series cost no gateway call. `matrix` has one row per timestamp and one column per entry of `conids`
+    (contracts that failed are left out); timestamps are `t0` plus the deltas in `dt`, in epoch ms.
+    `status` reports the bar store status, bar count or error for every requested conid.
+    """
+    conid_list = list(dict.fromkeys(conid.strip() for conid in conids.split(",") if conid.strip()))
+    if not conid_list:
+        return {"error": "Invalid Conids", "detail": "No conids given."}
+    if len(conid_list) > HISTORY_BATCH_MAX_CONIDS:
+        return {"error": "Invalid Conids", "detail": f"At most {HISTORY_BATCH_MAX_CONIDS} conids per request."}
+    if source not in ("iserver", "hmds"):
+        return {"error": "Invalid Source", "detail": "source must be 'iserver' or 'hmds'."}
+    try:
+        period, bar, adjusted = (HMDS_RULES if source == "hmds" else ISERVER_RULES).normalize(period, bar)
+    except ValueError as exc:
+        return {"error": "Invalid History Request", "detail": str(exc)}
+    semaphore = asyncio.Semaphore(HISTORY_BATCH_CONCURRENCY)
+
+    async def load(conid: str) -> Tuple[Any, Optional[str]]:
+        async with semaphore:
+            if source == "hmds":
+                return await load_hmds_history(conid, period, bar, outsideRth, barType, startTime)
+            return await load_iserver_history(conid, period, bar, None, outsideRth, barType, startTime)
+
+    results = await asyncio.gather(*(load(conid) for conid in conid_list), return_exceptions=True)
+    status: List[Dict[str, Any]] = []
+    series: List[Dict[str, Any]] = []
+    loaded: List[str] = []
+    for conid, result in zip(conid_list, results):
+        if isinstance(result, httpx.HTTPStatusError):
+            status.append({"conid": conid, "status": "error", "error": "IBKR API Error", "status_code": result.response.status_code, "detail": result.response.text})
+            continue
+        if isinstance(result, BaseException):
+            status.append({"conid": conid, "status": "error", "error": "Request Error", "detail": str(result)})
+            continue
+        payload, store_status = result
+        if not isinstance(payload, dict) or not payload.get("data"):
+            status.append({"conid": conid, "status": "error", "error": "No History", "detail": payload})
+            continue
+        columns = bars_to_columns(payload["data"])
+        series.append(columns)
+        loaded.append(conid)
+        status.append({"conid": conid, "status": store_status or "bypass", "symbol": payload.get("symbol"), "bars": len(columns["t"])})
+
+    aligned = align(series, join)
+    closes = forward_fill(aligned["c"]) if fill else aligned["c"]
+    matrix = closes if values == "close" else returns(closes, log=values == "log_returns")
+    t = aligned["t"]
+    return {
+        "period": period,
+        "bar": bar,
+        "source": source,
+        "values": values,
+        "conids": loaded,
+        "points": len(t),
+        "t0": int(t[0]) if len(t) else None,
+        "dt": np.diff(t, prepend=t[:1]).tolist(),
+        "matrix": matrix_rows(matrix, precision),
+        "status": status,
+        **({"adjusted": adjusted} if adjusted else {}),
+    }
+
+
+@router.post(
+    "/hmds/history/backfill",
+    tags=["Market Data"],
+    summary="Start HMDS History Backfill",
+    description="Starts a background job that fetches a long date range of HMDS bars in parallel windows and stitches them into one series."
+)
+async def start_history_backfill(body: BackfillRequest = Body(...)) -> Dict[str, Any]:
+    """
+    Splits the range into the longest windows `/hmds/history/rules` allows for the bar size and fetches them
+    concurrently within pacing limits. Poll the returned job for progress and page through its bars when done.
+    The stitched series is also merged into the historical bar store used by `/hmds/history`.
+    """
+    try:
+        job = backfill_manager.create(body.conid, body.bar, body.startTime, body.endTime, body.barType, body.outsideRth, HMDS_HISTORY_RULES)
+    except ValueError as exc:
+        return {"error": "Invalid Backfill Request", "detail": str(exc)}
+    except OSError as exc:
+        return {"error": "Backfill Storage Error", "detail": str(exc)}
+    return job.progress()
+
+
+@router.get(
+    "/hmds/history/backfill",
+    tags=["Market Data"],
+    summary="List HMDS History Backfills",
+    description="Lists backfill jobs, newest first, including jobs interrupted by a server restart."
+)
+async def list_history_backfills() -> List[Dict[str, Any]]:
+    return [job.progress() for job in backfill_manager.list()]
+
+
+@router.get(
+    "/hmds/history/backfill/{jobId}",
+    tags=["Market Data"],
+    summary="HMDS History Backfill Progress",
+    description="Returns the status and progress of a backfill job."
+)
+async def get_history_backfill(
+    jobId: str = Path(..., description="The backfill job ID.")
+) -> Dict[str, Any]:
+    job = backfill_manager.get(jobId)
+    if job is None:
+        return {"error": "Unknown Backfill Job", "detail": jobId}
+    return job.progress()
+
+
+@router.get(
+    "/hmds/history/backfill/{jobId}/bars",
+    tags=["Market Data"],
+    summary="HMDS History Backfill Bars",
+    description="Returns a page of the stitched bars of a backfill job, in the /hmds/history format."
+)
+async def get_history_backfill_bars(
+    jobId: str = Path(..., description="The backfill job ID."),
+    offset: int = Query(0, ge=0, description="Index of the first bar to return."),
+    limit: int = Query(5000, ge=1, le=50000, description="Maximum number of bars to return.")
+) -> Dict[str, Any]:
+    """
+    While the job is running, the page covers the windows fetched so far.
+    """
+    job = backfill_manager.get(jobId)
+    if job is None:
+        return {"error": "Unknown Backfill Job", "detail": jobId}
+    return backfill_manager.bars(job, offset, limit)
+
+
+@router.post(
+    "/hmds/history/backfill/{jobId}/resume",
+    tags=["Market Data"],
+    summary="Resume HMDS History Backfill",
+    description="Restarts a failed, cancelled or interrupted backfill job; only windows not yet fetched are requested."
+)
+async def resume_history_backfill(
+    jobId: str = Path(..., description="The backfill job ID.")
+) -> Dict[str, Any]:
+    job = backfill_manager.get(jobId)
+    if job is None:
+        return {"error": "Unknown Backfill Job", "detail": jobId}
+    if job.status != "completed":
+        backfill_manager.start(job)
+    return job.progress()
+
+
+@router.delete(
+    "/hmds/history/backfill/{jobId}",
+    tags=["Market Data"],
+    summary="Cancel HMDS History Backfill",
+    description="Cancels a running backfill job. Fetched windows are kept, so the job can be resumed later."
+)
+async def cancel_history_backfill(
+    jobId: str = Path(..., description="The backfill job ID.")
+) -> Dict[str, Any]:
+    job = backfill_manager.get(jobId)
+    if job is None:
+        return {"error": "Unknown Backfill Job", "detail": jobId}
+    await backfill_manager.cancel(job)
+    return job.progress()
+
 
 @router.post(
     "/iserver/marketdata/unsubscribe",
@@ -232,15 +725,15 @@ async def get_hmds_history(
     description="Unsubscribes from a specific market data feed."
 )
 async def unsubscribe_market_data(body: UnsubscribeRequest = Body(...)):
-    async with httpx.AsyncClient(verify=False) as client:
-        try:
-            response = await client.post(f"{BASE_URL}/iserver/marketdata/unsubscribe", json=body.dict(), timeout=10)
-            response.raise_for_status()
-            return response.json()
-        except httpx.HTTPStatusError as exc:
-            return {"error": "IBKR API Error", "status_code": exc.response.status_code, "detail": exc.response.text}
-        except httpx.RequestError as exc:
-            return {"error": "Request Error", "detail": str(exc)}
+    try:
+        response = await gateway.post("/iserver/marketdata/unsubscribe", json=body.dict())
+        response.raise_for_status()
+        line_manager.release([body.conid])
+        return response.json()
+    except httpx.HTTPStatusError as exc:
+        return {"error": "IBKR API Error", "status_code": exc.response.status_code, "detail": exc.response.text}
+    except httpx.RequestError as exc:
+        return {"error": "Request Error", "detail": str(exc)}
 
 
 @router.post(
@@ -250,12 +743,12 @@ async def unsubscribe_market_data(body: UnsubscribeRequest = Body(...)):
     description="Unsubscribes from all current market data subscriptions."
 )
 async def unsubscribe_all_market_data():
-    async with httpx.AsyncClient(verify=False) as client:
-        try:
-            response = await client.post(f"{BASE_URL}/iserver/marketdata/unsubscribeall", timeout=10)
-            response.raise_for_status()
-            return response.json()
-        except httpx.HTTPStatusError as exc:
-            return {"error": "IBKR API Error", "status_code": exc.response.status_code, "detail": exc.response.text}
-        except httpx.RequestError as exc:
-            return {"error": "Request Error", "detail": str(exc)}
+    try:
+        response = await gateway.post("/iserver/marketdata/unsubscribeall")
+        response.raise_for_status()
+        line_manager.release()
+        return response.json()
+    except httpx.HTTPStatusError as exc:
+        return {"error": "IBKR API Error", "status_code": exc.response.status_code, "detail": exc.response.text}
+    except httpx.RequestError as exc:
+        return {"error": "Request Error", "detail": str(exc)}
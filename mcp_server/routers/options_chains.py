@@ -1,8 +1,14 @@
 # options_chains.py
 from fastapi import APIRouter, Query
-from typing import Optional
+from typing import Any, Dict, List, Optional
+import math
+import time
+from datetime import datetime, timezone
 import httpx
-from mcp_server.config import BASE_URL
+from mcp_server.chain_materializer import materialize
+from mcp_server.config import CHAIN_MAX_CONTRACTS
+from mcp_server.gateway import gateway
+from mcp_server.option_analytics import analyze, option_contracts, underlying_price
 
 router = APIRouter()
 
@@ -37,12 +43,125 @@ async def get_options_chains(
     if chainType:
         params["chainType"] = chainType
 
-    async with httpx.AsyncClient(verify=False) as client:
-        try:
-            response = await client.get(f"{BASE_URL}/trsrv/secdef/chains", params=params, timeout=30)
-            response.raise_for_status()
-            return response.json()
-        except httpx.HTTPStatusError as exc:
-            return {"error": "IBKR API Error", "status_code": exc.response.status_code, "detail": exc.response.text}
-        except httpx.RequestError as exc:
-            return {"error": "Request Error", "detail": str(exc)}
+    try:
+        response = await gateway.get("/trsrv/secdef/chains", params=params)
+        response.raise_for_status()
+        return response.json()
+    except httpx.HTTPStatusError as exc:
+        return {"error": "IBKR API Error", "status_code": exc.response.status_code, "detail": exc.response.text}
+    except httpx.RequestError as exc:
+        return {"error": "Request Error", "detail": str(exc)}
+
+
+@router.get(
+    "/iserver/secdef/chain",
+    tags=["Options Chains"],
+    summary="Materialize Option Chain",
+    description="Resolves an option chain for an underlying conid to a table of (expiry, strike, right, conid) rows for the given expiries and strike window."
+)
+async def materialize_option_chain(
+    conid: int = Query(..., description="The contract ID of the underlying."),
+    expiries: str = Query(..., description="Comma-separated expiries: months in 'MMMYY' format (e.g., JAN25) for every expiry of the month, or dates in 'YYYYMMDD' format."),
+    secType: str = Query("OPT", pattern="^(OPT|FOP|WAR)$", description="The derivative security type."),
+    exchange: str = Query("SMART", description="The exchange to query."),
+    rights: str = Query("CP", description="'C' for calls, 'P' for puts, or 'CP' for both."),
+    strikeMin: Optional[float] = Query(None, description="Lowest strike to include."),
+    strikeMax: Optional[float] = Query(None, description="Highest strike to include."),
+    center: Optional[float] = Query(None, description="Reference price, e.g. the underlying's last price. Use with width."),
+    width: Optional[int] = Query(None, ge=1, description="Number of strikes to keep on each side of center, per month and right.")
+) -> Dict[str, Any]:
+    """
+    Runs the /iserver/secdef/strikes -> /iserver/secdef/info pipeline for the whole window at once instead
+    of one call per month, strike and right. Requests run concurrently under the gateway pacing and are
+    cached for an hour. The underlying should have been searched with /iserver/secdef/search in the
+    session first, as IBKR requires before strikes can be listed.
+    """
+    try:
+        return await materialize(conid, secType, expiries, exchange, rights, strikeMin, strikeMax, center, width)
+    except ValueError as exc:
+        return {"error": "Invalid Chain Request", "detail": str(exc)}
+
+
+@router.get(
+    "/iserver/secdef/chain/greeks",
+    tags=["Options Chains"],
+    summary="Option Chain Greeks",
+    description="Computes implied volatility, delta, gamma, vega and theta for a whole option chain (or a list of option conids) from one batch of quotes."
+)
+async def get_chain_greeks(
+    conids: Optional[str] = Query(None, description="Comma-separated option conids. Alternatively give the underlying conid with expiries to materialize the chain."),
+    conid: Optional[int] = Query(None, description="The contract ID of the underlying. Required with expiries; defaults to the options' underlying when conids are given."),
+    expiries: Optional[str] = Query(None, description="Comma-separated expiries ('MMMYY' months or 'YYYYMMDD' dates) of the chain to materialize."),
+    secType: str = Query("OPT", pattern="^(OPT|FOP|WAR)$", description="The derivative security type, when materializing."),
+    exchange: str = Query("SMART", description="The exchange to query, when materializing."),
+    rights: str = Query("CP", description="'C' for calls, 'P' for puts, or 'CP' for both, when materializing."),
+    strikeMin: Optional[float] = Query(None, description="Lowest strike to include, when materializing."),
+    strikeMax: Optional[float] = Query(None, description="Highest strike to include, when materializing."),
+    width: Optional[int] = Query(None, ge=1, description="Number of strikes to keep on each side of the underlying price, when materializing."),
+    rate: float = Query(0.0, description="Continuously compounded risk-free rate, e.g. 0.045."),
+    dividendYield: float = Query(0.0, description="Continuous dividend yield of the underlying, e.g. 0.005."),
+    price: str = Query("mid", pattern="^(mid|last|bid|ask)$", description="Option price to solve implied volatility from. 'mid' falls back to the last price without a two-sided quote."),
+    underlyingPrice: Optional[float] = Query(None, gt=0, description="Underlying price to use instead of snapshotting the underlying."),
+    precision: int = Query(6, ge=0, le=10, description="Decimals kept in the numeric columns.")
+) -> Dict[str, Any]:
+    """
+    Values a chain in one pass instead of one snapshot per contract: quotes for every option are fetched in
+    a single batch snapshot, then implied volatility is solved and the greeks computed for all contracts at
+    once with NumPy. Greeks follow the gateway's conventions (vega per volatility point, theta per day).
+    """
+    now = time.time()
+    errors: List[Dict[str, Any]] = []
+    try:
+        if conids:
+            requested = list(dict.fromkeys(item.strip() for item in conids.split(",") if item.strip()))
+            if not all(item.isdigit() for item in requested):
+                raise ValueError("Contract IDs are numeric.")
+            if len(requested) > CHAIN_MAX_CONTRACTS:
+                raise ValueError(f"At most {CHAIN_MAX_CONTRACTS} contracts per request.")
+            contracts, underlyings, errors = await option_contracts(requested)
+            if conid is None:
+                distinct = {underlying for underlying in underlyings if underlying is not None}
+                if len(distinct) != 1 and underlyingPrice is None:
+                    raise ValueError("The options do not share one underlying; give conid or underlyingPrice.")
+                conid = distinct.pop() if len(distinct) == 1 else None
+        elif conid is not None and expiries:
+            center = None
+            if width is not None:
+                center = underlyingPrice or await underlying_price(conid, price)
+                if not math.isfinite(center):
+                    raise ValueError("No underlying price to center the strike window on; give strikeMin/strikeMax or underlyingPrice.")
+            chain = await materialize(conid, secType, expiries, exchange, rights, strikeMin, strikeMax, center, width)
+            if chain["count"] > CHAIN_MAX_CONTRACTS:
+                raise ValueError(
+                    f"The chain has {chain['count']} contracts (limit {CHAIN_MAX_CONTRACTS}). "
+                    "Narrow the strike range or the expiries."
+                )
+            contracts = [(row[3], row[0], row[1], row[2]) for row in chain["rows"]]
+            errors = chain["errors"]
+        else:
+            raise ValueError("Give option conids, or an underlying conid with expiries.")
+    except ValueError as exc:
+        return {"error": "Invalid Chain Request", "detail": str(exc)}
+    except httpx.HTTPStatusError as exc:
+        return {"error": "IBKR API Error", "status_code": exc.response.status_code, "detail": exc.response.text}
+    except httpx.RequestError as exc:
+        return {"error": "Request Error", "detail": str(exc)}
+
+    try:
+        spot = underlyingPrice or await underlying_price(conid, price)
+        if not math.isfinite(spot) or spot <= 0:
+            return {"error": "No Underlying Price", "detail": f"No {price} price for underlying {conid}; pass underlyingPrice."}
+        result = await analyze(contracts, spot, rate, dividendYield, price, now, precision)
+    except httpx.HTTPStatusError as exc:
+        return {"error": "IBKR API Error", "status_code": exc.response.status_code, "detail": exc.response.text}
+    except httpx.RequestError as exc:
+        return {"error": "Request Error", "detail": str(exc)}
+    return {
+        "at": datetime.fromtimestamp(now, timezone.utc).isoformat(),
+        "underlying": {"conid": conid, "price": spot},
+        "rate": rate,
+        "dividendYield": dividendYield,
+        "priceSource": price,
+        **result,
+        "errors": errors,
+    }
@@ -2,7 +2,8 @@
 from fastapi import APIRouter, Query, Path
 from typing import Optional
 import httpx
-from mcp_server.config import BASE_URL
+from mcp_server.gateway import gateway
+from mcp_server.streaming import TERMINAL_ORDER_STATUSES, ensure_stream
 
 router = APIRouter()
 
@@ -26,22 +27,30 @@ async def get_live_orders(
 ):
     """
     Fetches all live orders from the IBKR API. This endpoint provides a comprehensive view of order activity.
+    When websocket streaming is enabled and connected, orders filtered to working statuses are served from
+    the streamed order state without a gateway call (unless `force` is set). The stream does not keep
+    filled, cancelled or inactive orders, so unfiltered requests and those statuses go to the gateway.
     """
+    stream = ensure_stream()
+    statuses = {status.strip().lower() for status in filters.split(",")} if filters else None
+    if stream is not None and stream.orders_synced and not force and statuses and not statuses & TERMINAL_ORDER_STATUSES:
+        orders = [order for order in stream.orders.values() if str(order.get("status", "")).lower() in statuses]
+        return {"orders": orders, "snapshot": True}
+
     params = {}
     if filters:
         params["filters"] = filters
     if force:
         params["force"] = str(force).lower()
 
-    async with httpx.AsyncClient(verify=False) as client:
-        try:
-            response = await client.get(f"{BASE_URL}/iserver/account/orders", params=params, timeout=10)
-            response.raise_for_status()
-            return response.json()
-        except httpx.HTTPStatusError as exc:
-            return {"error": "IBKR API Error", "status_code": exc.response.status_code, "detail": exc.response.text}
-        except httpx.RequestError as exc:
-            return {"error": "Request Error", "detail": str(exc)}
+    try:
+        response = await gateway.get("/iserver/account/orders", params=params)
+        response.raise_for_status()
+        return response.json()
+    except httpx.HTTPStatusError as exc:
+        return {"error": "IBKR API Error", "status_code": exc.response.status_code, "detail": exc.response.text}
+    except httpx.RequestError as exc:
+        return {"error": "Request Error", "detail": str(exc)}
 
 
 @router.get(
@@ -56,15 +65,14 @@ async def get_order_status(
     """
     Fetches the latest status for a specific order. This is useful for tracking the lifecycle of an individual order.
     """
-    async with httpx.AsyncClient(verify=False) as client:
-        try:
-            response = await client.get(f"{BASE_URL}/iserver/account/order/status/{orderId}", timeout=10)
-            response.raise_for_status()
-            return response.json()
-        except httpx.HTTPStatusError as exc:
-            return {"error": "IBKR API Error", "status_code": exc.response.status_code, "detail": exc.response.text}
-        except httpx.RequestError as exc:
-            return {"error": "Request Error", "detail": str(exc)}
+    try:
+        response = await gateway.get(f"/iserver/account/order/status/{orderId}")
+        response.raise_for_status()
+        return response.json()
+    except httpx.HTTPStatusError as exc:
+        return {"error": "IBKR API Error", "status_code": exc.response.status_code, "detail": exc.response.text}
+    except httpx.RequestError as exc:
+        return {"error": "Request Error", "detail": str(exc)}
 
 
 @router.get(
@@ -83,12 +91,11 @@ async def get_trades(
     if days:
         params["days"] = days
         
-    async with httpx.AsyncClient(verify=False) as client:
-        try:
-            response = await client.get(f"{BASE_URL}/iserver/account/trades", params=params, timeout=10)
-            response.raise_for_status()
-            return response.json()
-        except httpx.HTTPStatusError as exc:
-            return {"error": "IBKR API Error", "status_code": exc.response.status_code, "detail": exc.response.text}
-        except httpx.RequestError as exc:
-            return {"error": "Request Error", "detail": str(exc)}
+    try:
+        response = await gateway.get("/iserver/account/trades", params=params)
+        response.raise_for_status()
+        return response.json()
+    except httpx.HTTPStatusError as exc:
+        return {"error": "IBKR API Error", "status_code": exc.response.status_code, "detail": exc.response.text}
+    except httpx.RequestError as exc:
+        return {"error": "Request Error", "detail": str(exc)}
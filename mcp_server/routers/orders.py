@@ -1,9 +1,11 @@
 # orders.py
 from fastapi import APIRouter, Query, Body, Path
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Tuple
 import httpx
 from pydantic import BaseModel, Field
-from mcp_server.config import BASE_URL
+from mcp_server.config import ORDER_VALIDATION
+from mcp_server.gateway import gateway
+from mcp_server.order_rules import validate_orders
 
 router = APIRouter()
 
@@ -43,6 +45,36 @@ class ReplyRequest(BaseModel):
     confirmed: bool = Field(..., description="Set to true to confirm and submit the order.")
 
 
+# --- Pre-trade Validation ---
+
+async def checked_orders(accountId: str, orders: List[OrderModel]) -> Tuple[List[Dict[str, Any]], Optional[Dict[str, Any]], List[Dict[str, Any]]]:
+    """
+    Checks orders against their contracts' cached trading rules before anything is sent. Returns the
+    orders to send (prices rounded to valid increments), a rejection payload if any order breaks a rule,
+    and the adjustments made.
+    """
+    payload = [order.dict(exclude_none=True) for order in orders]
+    if not ORDER_VALIDATION:
+        return payload, None, []
+    payload, rejected, adjusted = await validate_orders(payload, accountId)
+    if rejected:
+        return payload, {
+            "error": "Order Rejected",
+            "detail": "The order breaks the contract's trading rules and was not sent to IBKR.",
+            "orders": rejected,
+        }, adjusted
+    return payload, None, adjusted
+
+
+def with_adjustments(payload: Any, adjusted: List[Dict[str, Any]]) -> Any:
+    """Reports local price rounding alongside the gateway reply."""
+    if adjusted:
+        target = payload[0] if isinstance(payload, list) and payload else payload
+        if isinstance(target, dict):
+            target["adjusted"] = adjusted
+    return payload
+
+
 # --- Orders Router Endpoints ---
 
 @router.post(
@@ -56,21 +88,23 @@ async def place_order(
     body: OrdersRequest = Body(...)
 ):
     """
-    Places one or more orders for the specified account.
+    Places one or more orders for the specified account. Orders are checked locally against the
+    contract rules first; an order that would be rejected is refused without calling the gateway.
     """
-    async with httpx.AsyncClient(verify=False) as client:
-        try:
-            response = await client.post(
-                f"{BASE_URL}/iserver/account/{accountId}/orders",
-                json=body.dict(exclude_none=True),
-                timeout=10
-            )
-            response.raise_for_status()
-            return response.json()
-        except httpx.HTTPStatusError as exc:
-            return {"error": "IBKR API Error", "status_code": exc.response.status_code, "detail": exc.response.text}
-        except httpx.RequestError as exc:
-            return {"error": "Request Error", "detail": str(exc)}
+    orders, rejection, adjusted = await checked_orders(accountId, body.orders)
+    if rejection:
+        return rejection
+    try:
+        response = await gateway.post(
+            f"/iserver/account/{accountId}/orders",
+            json={"orders": orders}
+        )
+        response.raise_for_status()
+        return with_adjustments(response.json(), adjusted)
+    except httpx.HTTPStatusError as exc:
+        return {"error": "IBKR API Error", "status_code": exc.response.status_code, "detail": exc.response.text}
+    except httpx.RequestError as exc:
+        return {"error": "Request Error", "detail": str(exc)}
 
 
 @router.post(
@@ -85,20 +119,22 @@ async def preview_order(
 ):
     """
     Previews an order to see its potential impact on the account before placing it.
+    Runs the same local rule checks as order placement.
     """
-    async with httpx.AsyncClient(verify=False) as client:
-        try:
-            response = await client.post(
-                f"{BASE_URL}/iserver/account/{accountId}/orders/whatif",
-                json=body.dict(exclude_none=True),
-                timeout=10
-            )
-            response.raise_for_status()
-            return response.json()
-        except httpx.HTTPStatusError as exc:
-            return {"error": "IBKR API Error", "status_code": exc.response.status_code, "detail": exc.response.text}
-        except httpx.RequestError as exc:
-            return {"error": "Request Error", "detail": str(exc)}
+    orders, rejection, adjusted = await checked_orders(accountId, body.orders)
+    if rejection:
+        return rejection
+    try:
+        response = await gateway.post(
+            f"/iserver/account/{accountId}/orders/whatif",
+            json={"orders": orders}
+        )
+        response.raise_for_status()
+        return with_adjustments(response.json(), adjusted)
+    except httpx.HTTPStatusError as exc:
+        return {"error": "IBKR API Error", "status_code": exc.response.status_code, "detail": exc.response.text}
+    except httpx.RequestError as exc:
+        return {"error": "Request Error", "detail": str(exc)}
 
 
 @router.post(
@@ -113,21 +149,23 @@ async def modify_order(
     body: OrderModel = Body(...)
 ):
     """
-    Modifies an existing active order. The request body should contain the updated order details.
+    Modifies an existing active order. The request body should contain the updated order details,
+    which are checked locally against the contract rules before they are sent.
     """
-    async with httpx.AsyncClient(verify=False) as client:
-        try:
-            response = await client.post(
-                f"{BASE_URL}/iserver/account/{accountId}/order/{orderId}",
-                json=body.dict(exclude_none=True),
-                timeout=10
-            )
-            response.raise_for_status()
-            return response.json()
-        except httpx.HTTPStatusError as exc:
-            return {"error": "IBKR API Error", "status_code": exc.response.status_code, "detail": exc.response.text}
-        except httpx.RequestError as exc:
-            return {"error": "Request Error", "detail": str(exc)}
+    orders, rejection, adjusted = await checked_orders(accountId, [body])
+    if rejection:
+        return rejection
+    try:
+        response = await gateway.post(
+            f"/iserver/account/{accountId}/order/{orderId}",
+            json=orders[0]
+        )
+        response.raise_for_status()
+        return with_adjustments(response.json(), adjusted)
+    except httpx.HTTPStatusError as exc:
+        return {"error": "IBKR API Error", "status_code": exc.response.status_code, "detail": exc.response.text}
+    except httpx.RequestError as exc:
+        return {"error": "Request Error", "detail": str(exc)}
 
 
 @router.delete(
@@ -143,18 +181,16 @@ async def cancel_order(
     """
     Cancels an active order by its ID.
     """
-    async with httpx.AsyncClient(verify=False) as client:
-        try:
-            response = await client.delete(
-                f"{BASE_URL}/iserver/account/{accountId}/order/{orderId}",
-                timeout=10
-            )
-            response.raise_for_status()
-            return response.json()
-        except httpx.HTTPStatusError as exc:
-            return {"error": "IBKR API Error", "status_code": exc.response.status_code, "detail": exc.response.text}
-        except httpx.RequestError as exc:
-            return {"error": "Request Error", "detail": str(exc)}
+    try:
+        response = await gateway.delete(
+            f"/iserver/account/{accountId}/order/{orderId}"
+        )
+        response.raise_for_status()
+        return response.json()
+    except httpx.HTTPStatusError as exc:
+        return {"error": "IBKR API Error", "status_code": exc.response.status_code, "detail": exc.response.text}
+    except httpx.RequestError as exc:
+        return {"error": "Request Error", "detail": str(exc)}
 
 
 @router.post(
@@ -170,16 +206,14 @@ async def place_order_reply(
     """
     Confirms an order that requires a secondary confirmation (e.g., due to price or size constraints).
     """
-    async with httpx.AsyncClient(verify=False) as client:
-        try:
-            response = await client.post(
-                f"{BASE_URL}/iserver/reply/{replyId}",
-                json=body.dict(),
-                timeout=10
-            )
-            response.raise_for_status()
-            return response.json()
-        except httpx.HTTPStatusError as exc:
-            return {"error": "IBKR API Error", "status_code": exc.response.status_code, "detail": exc.response.text}
-        except httpx.RequestError as exc:
-            return {"error": "Request Error", "detail": str(exc)}
+    try:
+        response = await gateway.post(
+            f"/iserver/reply/{replyId}",
+            json=body.dict()
+        )
+        response.raise_for_status()
+        return response.json()
+    except httpx.HTTPStatusError as exc:
+        return {"error": "IBKR API Error", "status_code": exc.response.status_code, "detail": exc.response.text}
+    except httpx.RequestError as exc:
+        return {"error": "Request Error", "detail": str(exc)}
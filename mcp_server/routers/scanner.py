@@ -4,7 +4,9 @@ from fastapi.responses import Response
 from typing import List, Optional, Any
 import httpx
 from pydantic import BaseModel, Field, ConfigDict
-from mcp_server.config import BASE_URL
+from mcp_server.gateway import gateway
+from mcp_server.hmds import hmds_session
+from mcp_server.response_cache import cached
 
 router = APIRouter()
 
@@ -73,20 +75,20 @@ class HmdsScannerRequest(BaseModel):
     summary="Get Scanner Parameters",
     description="Returns an XML file containing all available scanner parameters for the iServer scanner."
 )
+@cached(ttl=86400, max_entries=1, max_bytes=8_000_000)
 async def get_scanner_params():
     """
     Retrieves the iServer scanner parameters as an XML file. This information is needed to correctly configure an iServer scanner request.
     """
-    async with httpx.AsyncClient(verify=False) as client:
-        try:
-            response = await client.get(f"{BASE_URL}/iserver/scanner/params", timeout=10)
-            response.raise_for_status()
-            # Return the raw XML content with the correct media type
-            return Response(content=response.text, media_type="application/xml")
-        except httpx.HTTPStatusError as exc:
-            return {"error": "IBKR API Error", "status_code": exc.response.status_code, "detail": exc.response.text}
-        except httpx.RequestError as exc:
-            return {"error": "Request Error", "detail": str(exc)}
+    try:
+        response = await gateway.get("/iserver/scanner/params")
+        response.raise_for_status()
+        # Return the raw XML content with the correct media type
+        return Response(content=response.text, media_type="application/xml")
+    except httpx.HTTPStatusError as exc:
+        return {"error": "IBKR API Error", "status_code": exc.response.status_code, "detail": exc.response.text}
+    except httpx.RequestError as exc:
+        return {"error": "Request Error", "detail": str(exc)}
 
 @router.post(
     "/iserver/scanner/run",
@@ -110,20 +112,18 @@ async def run_scanner(body: ScannerSubscription = Body(...)):
 
     headers = {"Content-Type": "application/xml"}
 
-    async with httpx.AsyncClient(verify=False) as client:
-        try:
-            response = await client.post(
-                f"{BASE_URL}/iserver/scanner/run",
-                content=xml_string,
-                headers=headers,
-                timeout=30
-            )
-            response.raise_for_status()
-            return response.json()
-        except httpx.HTTPStatusError as exc:
-            return {"error": "IBKR API Error", "status_code": exc.response.status_code, "detail": exc.response.text}
-        except httpx.RequestError as exc:
-            return {"error": "Request Error", "detail": str(exc)}
+    try:
+        response = await gateway.post(
+            "/iserver/scanner/run",
+            content=xml_string,
+            headers=headers
+        )
+        response.raise_for_status()
+        return response.json()
+    except httpx.HTTPStatusError as exc:
+        return {"error": "IBKR API Error", "status_code": exc.response.status_code, "detail": exc.response.text}
+    except httpx.RequestError as exc:
+        return {"error": "Request Error", "detail": str(exc)}
 
 @router.post(
     "/hmds/scanner",
@@ -134,27 +134,19 @@ async def run_scanner(body: ScannerSubscription = Body(...)):
 async def run_hmds_scanner(body: HmdsScannerRequest = Body(...)):
     """
     ### Run HMDS Scanner
-    Submits a scanner request to the HMDS. As per the documentation, this endpoint
-    first calls `/hmds/auth/init` to authenticate the session before running the scan.
+    Submits a scanner request to the HMDS. The HMDS session (`/hmds/auth/init`) is initialized once and
+    re-initialized only when the gateway reports it as not initialized.
 
     The request body should be a JSON object specifying the scanner parameters.
     """
-    async with httpx.AsyncClient(verify=False) as client:
-        try:
-            # Initialize HMDS session to prevent 404 error on the first call
-            # This is a prerequisite for all /hmds endpoints.
-            init_response = await client.get(f"{BASE_URL}/hmds/auth/init", timeout=10)
-            init_response.raise_for_status() # Ensure the init call was successful
-
-            # Now, make the actual scanner request
-            scanner_response = await client.post(
-                f"{BASE_URL}/hmds/scanner",
-                json=body.dict(),
-                timeout=30
-            )
-            scanner_response.raise_for_status()
-            return scanner_response.json()
-        except httpx.HTTPStatusError as exc:
-            return {"error": "IBKR API Error", "status_code": exc.response.status_code, "detail": exc.response.text}
-        except httpx.RequestError as exc:
-            return {"error": "Request Error", "detail": str(exc)}
+    try:
+        scanner_response = await hmds_session.post(
+            "/hmds/scanner",
+            json=body.dict()
+        )
+        scanner_response.raise_for_status()
+        return scanner_response.json()
+    except httpx.HTTPStatusError as exc:
+        return {"error": "IBKR API Error", "status_code": exc.response.status_code, "detail": exc.response.text}
+    except httpx.RequestError as exc:
+        return {"error": "Request Error", "detail": str(exc)}
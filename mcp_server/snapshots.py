@@ -0,0 +1,190 @@
+# snapshots.py
+import asyncio
+import time
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+import httpx
+from mcp_server.config import SNAPSHOT_CHUNK_SIZE, SNAPSHOT_WARM_TTL, SNAPSHOT_WARMUP_DEADLINE
+from mcp_server.gateway import gateway
+from mcp_server.market_data_lines import LineManager, line_manager
+
+SNAPSHOT_PATH = "/iserver/marketdata/snapshot"
+
+# Backoff between warm-up polls for cold conids, in seconds.
+INITIAL_BACKOFF = 0.05
+MAX_BACKOFF = 0.5
+
+
+def row_has_fields(row: Dict[str, Any], fields: Iterable[str]) -> bool:
+    """True if a snapshot row carries a non-empty value for every requested field code."""
+    return all(row.get(field) not in (None, "") for field in fields)
+
+
+def chunked(items: List[str], size: int) -> List[List[str]]:
+    return [items[start:start + size] for start in range(0, len(items), size)]
+
+
+def chunk_error(exc: Exception) -> Dict[str, Any]:
+    """Error payload for a failed batch, shaped like the routers' error responses."""
+    if isinstance(exc, httpx.HTTPStatusError):
+        return {"error": "IBKR API Error", "status_code": exc.response.status_code, "detail": exc.response.text}
+    return {"error": "Request Error", "detail": str(exc)}
+
+
+def merge_chunks(chunks: List[List[str]], results: List[Any]) -> List[Dict[str, Any]]:
+    """
+    Merges per-batch results into one list in input conid order. Conids of a failed batch get an
+    error row each, so one bad batch does not fail the whole call.
+    """
+    by_conid: Dict[str, Dict[str, Any]] = {}
+    extra: List[Any] = []
+    for chunk, result in zip(chunks, results):
+        if isinstance(result, Exception):
+            error = chunk_error(result)
+            for conid in chunk:
+                by_conid[conid] = {"conid": int(conid) if conid.isdigit() else conid, **error}
+            continue
+        if not isinstance(result, list):
+            extra.append(result)
+            continue
+        for row in result:
+            if isinstance(row, dict) and row.get("conid") is not None:
+                by_conid[str(row["conid"])] = row
+            else:
+                extra.append(row)
+    ordered = [by_conid[conid] for chunk in chunks for conid in chunk if conid in by_conid]
+    return ordered + extra
+
+
+def _raise_if_all_failed(results: List[Any]) -> None:
+    if results and all(isinstance(result, Exception) for result in results):
+        raise results[0]
+
+
+class SnapshotEngine:
+    """
+    Subscription-aware wrapper around /iserver/marketdata/snapshot.
+
+    The first snapshot request for a conid only opens the streaming subscription and usually comes back
+    without the requested fields. The engine remembers which conids (and fields) are already subscribed:
+    warm conids are answered with a single call, while cold conids are polled with short, growing backoff
+    until the requested fields are present or the warm-up deadline passes.
+
+    Large conid lists are split into gateway-sized batches (no larger than the line manager's target) that
+    run concurrently under the pacing scheduler. Each batch reserves its market data lines with the line
+    manager first, which releases older lines or holds the batch back until earlier batches are done.
+    """
+
+    def __init__(
+        self,
+        warm_ttl: float = SNAPSHOT_WARM_TTL,
+        deadline: float = SNAPSHOT_WARMUP_DEADLINE,
+        chunk_size: int = SNAPSHOT_CHUNK_SIZE,
+        lines: LineManager = line_manager,
+    ):
+        self.warm_ttl = warm_ttl
+        self.deadline = deadline
+        self.chunk_size = chunk_size
+        self._subscribed: Dict[str, Tuple[float, Set[str]]] = {}  # conid -> (last used, fields requested)
+        self._poll_histogram: Dict[int, int] = {}
+        self._requests = 0
+        self._timeouts = 0
+        self.lines = lines
+        lines.on_release(self.forget)
+
+    def is_warm(self, conid: str, fields: Iterable[str]) -> bool:
+        entry = self._subscribed.get(conid)
+        if entry is None:
+            return False
+        last_used, known_fields = entry
+        return time.monotonic() - last_used < self.warm_ttl and set(fields) <= known_fields
+
+    def mark_subscribed(self, conids: Iterable[str], fields: Iterable[str]) -> None:
+        now = time.monotonic()
+        for conid in conids:
+            _, known_fields = self._subscribed.get(conid, (now, set()))
+            self._subscribed[conid] = (now, known_fields | set(fields))
+
+    def forget(self, conids: Optional[Iterable[str]] = None) -> None:
+        """Drops subscription state for the given conids, or for all conids when None (e.g. after unsubscribe)."""
+        if conids is None:
+            self._subscribed.clear()
+            return
+        for conid in conids:
+            self._subscribed.pop(str(conid), None)
+
+    async def fetch(self, conids: List[str], fields: List[str]) -> Tuple[List[Dict[str, Any]], int]:
+        """
+        Returns the snapshot rows for `conids`, in input order, and the largest number of gateway polls
+        any batch needed. A failed batch yields error rows for its conids; if every batch fails the
+        first httpx error is raised unchanged.
+        """
+        chunks = chunked(conids, min(self.chunk_size, self.lines.target))
+        results = await asyncio.gather(*(self._fetch_chunk(chunk, fields) for chunk in chunks), return_exceptions=True)
+        _raise_if_all_failed(results)
+        polls = max((result[1] for result in results if not isinstance(result, Exception)), default=0)
+        return merge_chunks(chunks, [result if isinstance(result, Exception) else result[0] for result in results]), polls
+
+    async def fetch_md(self, conids: List[str], fields: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """Batched /md/snapshot: one request per batch, merged in input order with per-batch error rows."""
+        async def fetch_chunk(chunk: List[str]) -> Any:
+            params = {"conids": ",".join(chunk)}
+            if fields:
+                params["fields"] = ",".join(fields)
+            response = await gateway.get("/md/snapshot", params=params)
+            response.raise_for_status()
+            return response.json()
+
+        chunks = chunked(conids, self.chunk_size)
+        results = await asyncio.gather(*(fetch_chunk(chunk) for chunk in chunks), return_exceptions=True)
+        _raise_if_all_failed(results)
+        if len(chunks) == 1:
+            return results[0]
+        return merge_chunks(chunks, results)
+
+    async def _fetch_chunk(self, conids: List[str], fields: List[str]) -> Tuple[Any, int]:
+        await self.lines.reserve(conids)
+        try:
+            return await self._poll_chunk(conids, fields)
+        finally:
+            await self.lines.finish(conids)
+
+    async def _poll_chunk(self, conids: List[str], fields: List[str]) -> Tuple[Any, int]:
+        cold = {conid for conid in conids if not self.is_warm(conid, fields)}
+        params = {"conids": ",".join(conids), "fields": ",".join(fields)}
+        deadline = time.monotonic() + self.deadline
+        backoff = INITIAL_BACKOFF
+        polls = 0
+        while True:
+            response = await gateway.get(SNAPSHOT_PATH, params=params)
+            polls += 1
+            response.raise_for_status()
+            rows = response.json()
+            if not isinstance(rows, list):
+                break
+            ready = {str(row.get("conid")) for row in rows if isinstance(row, dict) and row_has_fields(row, fields)}
+            cold -= ready
+            if not cold:
+                break
+            if time.monotonic() + backoff > deadline:
+                self._timeouts += 1
+                break
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, MAX_BACKOFF)
+        self.mark_subscribed(conids, fields)
+        self._requests += 1
+        self._poll_histogram[polls] = self._poll_histogram.get(polls, 0) + 1
+        return rows, polls
+
+    def stats(self) -> Dict[str, Any]:
+        total_polls = sum(polls * count for polls, count in self._poll_histogram.items())
+        return {
+            "requests": self._requests,
+            "avg_polls": round(total_polls / self._requests, 3) if self._requests else 0.0,
+            "polls_histogram": {str(polls): count for polls, count in sorted(self._poll_histogram.items())},
+            "warmup_deadline_hits": self._timeouts,
+            "subscribed_conids": len(self._subscribed),
+        }
+
+
+snapshot_engine = SnapshotEngine()
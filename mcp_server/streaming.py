@@ -0,0 +1,234 @@
+# streaming.py
+import asyncio
+import json
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional
+
+from mcp_server.config import STREAMING_ENABLED, STREAMING_HEARTBEAT, STREAMING_URL
+from mcp_server.gateway import gateway
+from mcp_server.quotes import quote_service
+
+# Reconnect backoff bounds in seconds.
+MIN_RECONNECT_DELAY = 1.0
+MAX_RECONNECT_DELAY = 30.0
+# Order statuses after which an order never changes again; such orders are not kept in the stream state.
+TERMINAL_ORDER_STATUSES = {"filled", "cancelled", "apicancelled", "inactive"}
+
+
+def _message_text(message: Any) -> Optional[str]:
+    """Extracts the text payload from an aiohttp WSMessage, or from a plain str/bytes frame."""
+    data = getattr(message, "data", message)
+    if isinstance(data, (bytes, bytearray)):
+        return data.decode("utf-8", errors="replace")
+    return data if isinstance(data, str) else None
+
+
+class GatewayStream:
+    """
+    Websocket consumer for the Client Portal gateway `/ws` endpoint.
+
+    Subscribes to market data (`smd+conid`), live order updates (`sor`) and P&L (`spl`) and decodes the
+    messages into server-side state: quotes go into the live quote cache, orders and P&L are kept here.
+    Tools read that state instead of making REST calls. The connection is re-established with backoff
+    and every topic is re-subscribed after a reconnect.
+
+    `connect` is an async factory returning a websocket-like object (send_str, close, async iteration);
+    it defaults to aiohttp and can be replaced with an in-process socket (tests/fake_gateway_socket.py).
+    """
+
+    def __init__(
+        self,
+        url: str = STREAMING_URL,
+        connect: Optional[Callable[[str], Awaitable[Any]]] = None,
+        heartbeat: float = STREAMING_HEARTBEAT,
+    ):
+        self.url = url
+        self._connect = connect or self._aiohttp_connect
+        self.heartbeat = heartbeat
+        self._session = None
+        self._ws = None
+        self._task: Optional[asyncio.Task] = None
+        self._quote_fields: Dict[str, frozenset] = {}  # conid -> subscribed field codes
+        self.orders: Dict[str, Dict[str, Any]] = {}
+        self.pnl: Dict[str, Dict[str, Any]] = {}
+        self.connected = False
+        self.orders_synced = False
+        self.pnl_synced = False
+        self.messages = 0
+        self.reconnects = 0
+        self.last_message_at: Optional[float] = None
+
+    # --- Connection ---
+
+    async def _aiohttp_connect(self, url: str) -> Any:
+        import aiohttp
+
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession()
+        ws = await self._session.ws_connect(url, ssl=False)
+        # The gateway ties the socket to the brokerage session id reported by /tickle.
+        response = await gateway.get("/tickle")
+        session_id = response.json().get("session") if response.status_code == 200 else None
+        if session_id:
+            await ws.send_str(json.dumps({"session": session_id}))
+        return ws
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+            quote_service.attach_stream(self)
+
+    async def stop(self) -> None:
+        quote_service.attach_stream(None)
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def _run(self) -> None:
+        delay = MIN_RECONNECT_DELAY
+        while True:
+            heartbeat = None
+            try:
+                self._ws = await self._connect(self.url)
+                await self._subscribe_all()
+                self.connected = True
+                delay = MIN_RECONNECT_DELAY
+                heartbeat = asyncio.get_running_loop().create_task(self._heartbeat())
+                async for message in self._ws:
+                    text = _message_text(message)
+                    if text is None:
+                        break  # closed or error frame
+                    self.handle_message(text)
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                print(f"⚠️ Warning: gateway websocket error: {exc}")
+            finally:
+                self.connected = False
+                # Updates missed while disconnected are not replayed, so the order state starts over.
+                self.orders.clear()
+                self.orders_synced = False
+                self.pnl_synced = False
+                if heartbeat is not None:
+                    heartbeat.cancel()
+                if self._ws is not None:
+                    try:
+                        await self._ws.close()
+                    except Exception:
+                        pass
+                    self._ws = None
+            self.reconnects += 1
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, MAX_RECONNECT_DELAY)
+
+    async def _heartbeat(self) -> None:
+        while True:
+            await asyncio.sleep(self.heartbeat)
+            await self._send("tic")
+
+    async def _send(self, text: str) -> None:
+        if self._ws is not None:
+            await self._ws.send_str(text)
+
+    async def _subscribe_all(self) -> None:
+        await self._send("sor+{}")
+        await self._send("spl+{}")
+        for conid, fields in self._quote_fields.items():
+            await self._send(f"smd+{conid}+{json.dumps({'fields': sorted(fields)})}")
+
+    # --- Market Data Topics ---
+
+    def want_quotes(self, conids: Iterable[str], fields: Iterable[str]) -> None:
+        """Adds `smd` subscriptions for conids whose requested fields are not yet streamed."""
+        fields = frozenset(fields)
+        changed: List[str] = []
+        for conid in conids:
+            known = self._quote_fields.get(conid, frozenset())
+            if not fields <= known:
+                self._quote_fields[conid] = known | fields
+                changed.append(conid)
+        if changed and self.connected:
+            asyncio.get_running_loop().create_task(self._send_quote_topics(changed))
+
+    async def _send_quote_topics(self, conids: List[str]) -> None:
+        for conid in conids:
+            await self._send(f"smd+{conid}+{json.dumps({'fields': sorted(self._quote_fields[conid])})}")
+
+    def drop_quotes(self, conids: Iterable[str]) -> None:
+        """Removes `smd` subscriptions, e.g. when conids age out of the quote cache."""
+        dropped = [conid for conid in conids if self._quote_fields.pop(conid, None) is not None]
+        if dropped and self.connected:
+            asyncio.get_running_loop().create_task(self._send_many(f"umd+{conid}+{{}}" for conid in dropped))
+
+    async def _send_many(self, messages: Iterable[str]) -> None:
+        for message in messages:
+            await self._send(message)
+
+    def covers(self, conid: str, fields: Iterable[str]) -> bool:
+        """True if the stream is connected and already delivers these fields for the conid."""
+        return self.connected and frozenset(fields) <= self._quote_fields.get(conid, frozenset())
+
+    # --- Decoding ---
+
+    def handle_message(self, text: str) -> None:
+        try:
+            message = json.loads(text)
+        except ValueError:
+            return
+        if not isinstance(message, dict):
+            return
+        self.messages += 1
+        self.last_message_at = time.time()
+        topic = message.get("topic", "")
+        if topic.startswith("smd+"):
+            conid = message.get("conid") or topic[4:]
+            fields = {key: value for key, value in message.items() if key.isdigit()}
+            if fields:
+                quote_service.update([{"conid": conid, **fields}])
+        elif topic == "sor":
+            for order in message.get("args") or []:
+                if isinstance(order, dict) and order.get("orderId") is not None:
+                    order_id = str(order["orderId"])
+                    merged = {**self.orders.get(order_id, {}), **order}
+                    if str(merged.get("status", "")).lower() in TERMINAL_ORDER_STATUSES:
+                        self.orders.pop(order_id, None)
+                    else:
+                        self.orders[order_id] = merged
+            self.orders_synced = True
+        elif topic == "spl":
+            args = message.get("args")
+            if isinstance(args, dict):
+                self.pnl.update(args)
+            self.pnl_synced = True
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self._task is not None,
+            "connected": self.connected,
+            "url": self.url,
+            "messages": self.messages,
+            "reconnects": self.reconnects,
+            "last_message_at": self.last_message_at,
+            "quote_topics": len(self._quote_fields),
+            "orders": len(self.orders),
+            "pnl_accounts": len(self.pnl),
+        }
+
+
+gateway_stream = GatewayStream()
+
+
+def ensure_stream() -> Optional[GatewayStream]:
+    """Starts the stream on first use when STREAMING_ENABLED is set; returns it only while it is connected."""
+    if not STREAMING_ENABLED:
+        return None
+    gateway_stream.start()
+    return gateway_stream if gateway_stream.connected else None
+
@@ -0,0 +1,280 @@
+# symbol_index.py
+import re
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from mcp_server.config import SYMBOL_INDEX_MAX_ENTRIES
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+# Match kinds, best first. Results are ranked by kind, then by edit distance and symbol length.
+EXACT, PREFIX, NAME, FUZZY = "exact", "prefix", "name", "fuzzy"
+_RANK = {EXACT: 0, PREFIX: 1, NAME: 2, FUZZY: 3}
+FUZZY_MAX_NODES = 10_000
+
+
+def name_tokens(text: Optional[str]) -> List[str]:
+    return _TOKEN.findall((text or "").lower())
+
+
+def max_edits(term: str) -> int:
+    """Edit budget for fuzzy matching: none for 1-2 characters, one up to 5, two beyond."""
+    return 0 if len(term) <= 2 else 1 if len(term) <= 5 else 2
+
+
+# --- Trie ---
+
+class _Node:
+    __slots__ = ("children", "ids", "key")
+
+    def __init__(self):
+        self.children: Dict[str, "_Node"] = {}
+        self.ids: Set[str] = set()
+        self.key: Optional[str] = None  # the full key, on nodes that end one
+
+
+class Trie:
+    """Character trie from string keys to sets of conids, with prefix walks and bounded edit-distance search."""
+
+    def __init__(self):
+        self.root = _Node()
+
+    def add(self, key: str, conid: str) -> None:
+        node = self.root
+        for char in key:
+            node = node.children.setdefault(char, _Node())
+        node.key = key
+        node.ids.add(conid)
+
+    def remove(self, key: str, conid: str) -> None:
+        path = [self.root]
+        for char in key:
+            node = path[-1].children.get(char)
+            if node is None:
+                return
+            path.append(node)
+        path[-1].ids.discard(conid)
+        # Prune nodes left without ids or children, bottom up.
+        for depth in range(len(key), 0, -1):
+            node = path[depth]
+            if node.ids or node.children:
+                break
+            del path[depth - 1].children[key[depth - 1]]
+
+    def get(self, key: str) -> Set[str]:
+        node = self._find(key)
+        return node.ids if node else set()
+
+    def _find(self, key: str) -> Optional[_Node]:
+        node = self.root
+        for char in key:
+            node = node.children.get(char)
+            if node is None:
+                return None
+        return node
+
+    def prefix(self, prefix: str, limit: int) -> Iterator[Tuple[str, Set[str]]]:
+        """Keys under `prefix` with their ids, shortest keys first, stopping after `limit` keys."""
+        start = self._find(prefix)
+        level = [start] if start else []
+        found = 0
+        while level and found < limit:
+            next_level = []
+            for node in level:
+                if node.ids:
+                    yield node.key, node.ids
+                    found += 1
+                    if found >= limit:
+                        return
+                next_level.extend(node.children.values())
+            level = next_level
+
+    def fuzzy(self, term: str, edits: int, max_nodes: int = FUZZY_MAX_NODES) -> List[Tuple[str, Set[str], int]]:
+        """
+        Keys within `edits` edits of `term`, counting insertions, deletions, substitutions and swaps of two
+        adjacent characters. Walks the trie carrying the last two rows of the distance matrix and abandons a
+        branch as soon as every cell of its row exceeds the budget. Only keys sharing the first character
+        are considered (typos there are rare and it is what keeps the walk small), and the walk stops after
+        visiting `max_nodes` nodes.
+        """
+        matches: List[Tuple[str, Set[str], int]] = []
+        start = self.root.children.get(term[:1])
+        if start is None:
+            return matches
+        visited = 0
+
+        def walk(node: _Node, char: str, previous_char: str, previous: List[int], before: Optional[List[int]]) -> None:
+            nonlocal visited
+            visited += 1
+            if visited > max_nodes:
+                return
+            row = [previous[0] + 1]
+            for column in range(1, len(term) + 1):
+                cost = min(row[column - 1] + 1, previous[column] + 1, previous[column - 1] + (term[column - 1] != char))
+                if before and column > 1 and char == term[column - 2] and previous_char == term[column - 1]:
+                    cost = min(cost, before[column - 2] + 1)
+                row.append(cost)
+            if node.ids and row[-1] <= edits:
+                matches.append((node.key, node.ids, row[-1]))
+            if min(row) <= edits:
+                for next_char, child in node.children.items():
+                    walk(child, next_char, char, row, previous)
+
+        walk(start, term[0], "", list(range(len(term) + 1)), None)
+        return matches
+
+
+# --- Symbol Index ---
+
+class SymbolIndex:
+    """
+    In-memory resolver from symbols and company names to contracts. Symbols live in a trie (exact, prefix
+    and fuzzy lookups); company names are split into tokens held in a second trie, so "apple" or "micro"
+    resolve without the gateway. Entries are fed from secdef searches, /trsrv/stocks and /trsrv/futures
+    responses and from the contract master, and the least recently used are evicted past `max_entries`.
+    """
+
+    def __init__(self, max_entries: int = SYMBOL_INDEX_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self.symbols = Trie()
+        self.tokens = Trie()
+        self.loaded = False
+        self.lookups = 0
+        self.hits = 0
+        self.evictions = 0
+
+    # --- Population ---
+
+    def add(self, conid: Any, symbol: Optional[str], name: Optional[str] = None, sec_type: Optional[str] = None,
+            exchange: Optional[str] = None, item: Optional[Dict[str, Any]] = None) -> None:
+        """
+        Adds or refreshes a contract. `item` keeps the raw /iserver/secdef/search result so it can be
+        returned as the gateway would; entries from other sources only carry the identity fields.
+        """
+        conid = str(conid)
+        if not conid.isdigit() or not symbol:
+            return
+        previous = self.entries.pop(conid, None)
+        if previous:
+            self._unlink(conid, previous)
+            item = item or previous.get("item")
+            name = name or previous.get("name")
+        entry = {"conid": conid, "symbol": symbol.upper(), "name": name, "sec_type": sec_type, "exchange": exchange, "item": item}
+        self.entries[conid] = entry
+        self.symbols.add(entry["symbol"], conid)
+        for token in set(name_tokens(name)):
+            self.tokens.add(token, conid)
+        while len(self.entries) > self.max_entries:
+            old_conid, old_entry = self.entries.popitem(last=False)
+            self._unlink(old_conid, old_entry)
+            self.evictions += 1
+
+    def _unlink(self, conid: str, entry: Dict[str, Any]) -> None:
+        self.symbols.remove(entry["symbol"], conid)
+        for token in set(name_tokens(entry["name"])):
+            self.tokens.remove(token, conid)
+
+    def add_search_results(self, results: Any) -> None:
+        for item in results if isinstance(results, list) else []:
+            if isinstance(item, dict) and item.get("conid") is not None:
+                sections = item.get("sections") or [{}]
+                self.add(item["conid"], item.get("symbol"), item.get("companyName"), sections[0].get("secType"), item.get("description"), item)
+
+    def add_stocks(self, data: Any) -> None:
+        for symbol, entries in (data.items() if isinstance(data, dict) else []):
+            for entry in entries if isinstance(entries, list) else []:
+                for contract in entry.get("contracts", []) if isinstance(entry, dict) else []:
+                    if contract.get("conid") is not None:
+                        self.add(contract["conid"], symbol, entry.get("name"), entry.get("assetClass") or "STK", contract.get("exchange"))
+
+    def add_futures(self, data: Any) -> None:
+        for symbol, contracts in (data.items() if isinstance(data, dict) else []):
+            for contract in contracts if isinstance(contracts, list) else []:
+                if isinstance(contract, dict) and contract.get("conid") is not None:
+                    self.add(contract["conid"], contract.get("symbol") or symbol, None, "FUT", contract.get("exchange"))
+
+    def load(self, store: Any) -> None:
+        """Warms the index once from the contract master: identity rows first, then stored search results."""
+        if self.loaded:
+            return
+        self.loaded = True
+        for row in store.iter_contracts(self.max_entries):
+            self.add(row["conid"], row["symbol"], row["name"], row["sec_type"], row["exchange"])
+        for results in store.iter_lookups("secdef_search"):
+            self.add_search_results(results)
+
+    # --- Lookup ---
+
+    def search(self, query: str, sec_type: Optional[str] = None, limit: int = 10, fuzzy: bool = True,
+               kinds: Iterable[str] = (EXACT, PREFIX, NAME, FUZZY)) -> List[Dict[str, Any]]:
+        """
+        Resolves a symbol or company-name query to at most `limit` entries, each annotated with `match`
+        (exact, prefix, name or fuzzy) and `distance`. Exact symbol matches win outright; prefix and name
+        matches come next, and fuzzy matches (bounded edit distance) only when nothing else matched.
+        """
+        self.lookups += 1
+        kinds = set(kinds)
+        symbol = query.strip().upper()
+        tokens = name_tokens(query)
+        found: Dict[str, Tuple[str, int]] = {}
+
+        def collect(ids: Iterable[str], kind: str, distance: int = 0) -> None:
+            for conid in ids:
+                if conid not in found or (_RANK[kind], distance) < (_RANK[found[conid][0]], found[conid][1]):
+                    found[conid] = (kind, distance)
+
+        if EXACT in kinds:
+            collect(self.symbols.get(symbol), EXACT)
+        if PREFIX in kinds and len(found) < limit:
+            for _, ids in self.symbols.prefix(symbol, limit * 4):
+                collect(ids, PREFIX)
+        if NAME in kinds and tokens:
+            collect(self._name_matches(tokens, limit * 20), NAME)
+        if fuzzy and FUZZY in kinds and not found and len(tokens) == 1:
+            for _, ids, distance in self.symbols.fuzzy(symbol, max_edits(symbol)) if max_edits(symbol) else []:
+                collect(ids, FUZZY, distance)
+            for _, ids, distance in self.tokens.fuzzy(tokens[0], max_edits(tokens[0])) if max_edits(tokens[0]) else []:
+                collect(ids, FUZZY, distance)
+
+        matches = []
+        for conid, (kind, distance) in found.items():
+            entry = self.entries.get(conid)
+            if entry and (not sec_type or (entry["sec_type"] or "").upper() == sec_type.upper()):
+                matches.append({**entry, "match": kind, "distance": distance})
+        matches.sort(key=lambda match: (_RANK[match["match"]], match["distance"], len(match["symbol"]), match["symbol"]))
+        matches = matches[:limit]
+        for match in matches:
+            self.entries.move_to_end(match["conid"])
+        if matches:
+            self.hits += 1
+        return matches
+
+    def _name_matches(self, tokens: List[str], cap: int) -> Set[str]:
+        """Conids whose name contains every query token; the last token may be a prefix (as while typing)."""
+        ids: Optional[Set[str]] = None
+        for position, token in enumerate(tokens):
+            if position == len(tokens) - 1:
+                token_ids: Set[str] = set()
+                for _, matched in self.tokens.prefix(token, cap):
+                    token_ids |= matched
+            else:
+                token_ids = self.tokens.get(token)
+            ids = token_ids if ids is None else ids & token_ids
+            if not ids:
+                return set()
+        return ids or set()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self.entries),
+            "max_entries": self.max_entries,
+            "loaded": self.loaded,
+            "lookups": self.lookups,
+            "hits": self.hits,
+            "hit_rate": round(self.hits / self.lookups, 4) if self.lookups else 0.0,
+            "evictions": self.evictions,
+        }
+
+
+symbol_index = SymbolIndex()
@@ -0,0 +1,174 @@
+# trading_hours.py
+import bisect
+import time
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+DEFAULT_TIMEZONE = "America/New_York"
+TEMPLATE_DAYS = 7  # days covered by weekday templates (the 2000010x pseudo-dates) beyond the dated records
+MIN_LOOKAHEAD = 86400  # a schedule is refreshed once less than this much of its horizon (seconds) is left
+
+Intervals = Tuple[List[float], List[float]]  # sorted open times and matching close times, epoch seconds
+
+
+def _zone(name: Optional[str]) -> ZoneInfo:
+    try:
+        return ZoneInfo(name or DEFAULT_TIMEZONE)
+    except (ZoneInfoNotFoundError, ValueError):
+        return ZoneInfo(DEFAULT_TIMEZONE)
+
+
+def _merge(intervals: List[Tuple[float, float]]) -> Intervals:
+    """Sorts intervals and joins overlapping or touching ones, e.g. sessions that run across midnight."""
+    opens: List[float] = []
+    closes: List[float] = []
+    for start, end in sorted(intervals):
+        if closes and start <= closes[-1]:
+            closes[-1] = max(closes[-1], end)
+        else:
+            opens.append(start)
+            closes.append(end)
+    return opens, closes
+
+
+def _hhmm(day: date, value: str, zone: ZoneInfo) -> float:
+    return datetime(day.year, day.month, day.day, int(value[:2]), int(value[2:4]), tzinfo=zone).timestamp()
+
+
+def _day_intervals(day: date, times: List[Dict[str, Any]], zone: ZoneInfo) -> List[Tuple[float, float]]:
+    """'openingTime'/'closingTime' (HHMM, exchange time) pairs for one day; a close at or before the open is the next day."""
+    intervals = []
+    for item in times or []:
+        opening, closing = str(item.get("openingTime", "")), str(item.get("closingTime", ""))
+        if len(opening) < 4 or len(closing) < 4:
+            continue
+        start = _hhmm(day, opening, zone)
+        end = _hhmm(day + timedelta(days=1) if closing <= opening else day, closing, zone)
+        intervals.append((start, end))
+    return intervals
+
+
+def _span(intervals: List[Tuple[float, float]]) -> float:
+    return sum(end - start for start, end in intervals)
+
+
+class Schedule:
+    """Regular and extended trading intervals of one contract's venue, answering status queries by bisection."""
+
+    __slots__ = ("exchange", "timezone", "regular", "extended", "horizon")
+
+    def __init__(self, exchange: Optional[str], timezone: str, regular: Intervals, extended: Intervals, horizon: float):
+        self.exchange = exchange
+        self.timezone = timezone
+        self.regular = regular
+        self.extended = extended
+        self.horizon = horizon  # epoch seconds up to which the intervals are known
+
+    def _iso(self, epoch: Optional[float]) -> Optional[str]:
+        return datetime.fromtimestamp(epoch, _zone(self.timezone)).isoformat() if epoch is not None else None
+
+    def status(self, at: float, hours: str = "regular") -> Dict[str, Any]:
+        """Whether the venue is open at `at`, and when it next opens and closes (ISO times in exchange time)."""
+        opens, closes = self.regular if hours == "regular" else self.extended
+        index = bisect.bisect_right(opens, at) - 1
+        is_open = index >= 0 and at < closes[index]
+        upcoming = index + 1
+        next_open = opens[upcoming] if upcoming < len(opens) else None
+        if is_open:
+            next_close = closes[index]
+        else:
+            next_close = closes[upcoming] if upcoming < len(closes) else None
+        return {
+            "open": is_open if at < self.horizon else None,
+            "nextOpen": self._iso(next_open),
+            "nextClose": self._iso(next_close),
+        }
+
+
+def parse_schedule(payload: Any, exchange: Optional[str], now: float) -> Optional[Schedule]:
+    """
+    Builds a Schedule from a /trsrv/secdef/schedule response. Dated records apply to their day; the
+    20000101-20000107 pseudo-dates are weekday templates (Saturday to Friday) used for the other days up to
+    TEMPLATE_DAYS ahead. IBKR lists both `sessions` and `tradingtimes` per day; which of them holds the
+    liquid hours differs between venues, so the narrower one is taken as regular hours and the wider as
+    extended hours.
+    """
+    entries = payload if isinstance(payload, list) else [payload] if isinstance(payload, dict) else []
+    entries = [entry for entry in entries if isinstance(entry, dict) and isinstance(entry.get("schedules"), list)]
+    if exchange:
+        entries = [entry for entry in entries if entry.get("exchange") in (None, exchange)] or entries
+    if not entries:
+        return None
+    entry = entries[0]
+    timezone = entry.get("timezone") or entry.get("tz") or DEFAULT_TIMEZONE
+    zone = _zone(timezone)
+
+    templates: Dict[int, Dict[str, Any]] = {}
+    dated: Dict[date, Dict[str, Any]] = {}
+    for record in entry["schedules"]:
+        raw = str(record.get("tradingScheduleDate", ""))
+        try:
+            day = datetime.strptime(raw, "%Y%m%d").date()
+        except ValueError:
+            continue
+        if day.year == 2000 and day.month == 1 and day.day <= 7:
+            templates[day.weekday()] = record
+        else:
+            dated[day] = record
+
+    today = datetime.fromtimestamp(now, zone).date()
+    first = min([today - timedelta(days=1), *dated])
+    last = max([today + timedelta(days=TEMPLATE_DAYS), *dated])
+    regular: List[Tuple[float, float]] = []
+    extended: List[Tuple[float, float]] = []
+    day = first
+    while day <= last:
+        record = dated.get(day) or templates.get(day.weekday())
+        if record:
+            sessions = _day_intervals(day, record.get("sessions"), zone)
+            trading = _day_intervals(day, record.get("tradingtimes"), zone)
+            narrow, wide = sorted((sessions, trading), key=_span)
+            regular.extend(narrow or wide)
+            extended.extend(wide)
+        day += timedelta(days=1)
+    horizon = datetime(last.year, last.month, last.day, tzinfo=zone).timestamp() + 86400
+    return Schedule(entry.get("exchange") or exchange, timezone, _merge(regular), _merge(extended), horizon)
+
+
+class ScheduleIndex:
+    """
+    Parsed trading schedules keyed by (asset class, symbol, exchange). Each is kept until less than
+    MIN_LOOKAHEAD of its horizon is left, so open/close questions are answered without the gateway.
+    """
+
+    def __init__(self):
+        self.schedules: Dict[Tuple[str, str, str], Schedule] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Tuple[str, str, str], now: Optional[float] = None) -> Optional[Schedule]:
+        schedule = self.schedules.get(key)
+        if schedule is not None and schedule.horizon - (now or time.time()) >= MIN_LOOKAHEAD:
+            self.hits += 1
+            return schedule
+        self.misses += 1
+        return None
+
+    def put(self, key: Tuple[str, str, str], payload: Any, now: Optional[float] = None) -> Optional[Schedule]:
+        schedule = parse_schedule(payload, key[2] or None, now or time.time())
+        if schedule is not None:
+            self.schedules[key] = schedule
+        return schedule
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "schedules": len(self.schedules),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+schedule_index = ScheduleIndex()
@@ -0,0 +1,19 @@
+# conftest.py
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA = tempfile.mkdtemp(prefix="ib_mcp_tests_")
+
+# mcp_server.config reads these at import time; point it at the repo's routers and throwaway stores.
+os.environ.setdefault("ROUTERS_PATH", os.path.join(ROOT, "mcp_server", "routers"))
+os.environ.setdefault("MCP_SERVER_PORT", "5002")
+os.environ.setdefault("GATEWAY_INTERNAL_BASE_URL", "https://localhost")
+os.environ.setdefault("GATEWAY_PORT", "5055")
+os.environ.setdefault("GATEWAY_ENDPOINT", "/v1/api")
+os.environ.setdefault("CONTRACT_STORE_PATH", os.path.join(DATA, "contracts.sqlite"))
+os.environ.setdefault("BAR_STORE_PATH", os.path.join(DATA, "bars"))
+
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
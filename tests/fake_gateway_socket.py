@@ -0,0 +1,49 @@
+# fake_gateway_socket.py
+import asyncio
+import json
+from typing import Any, List, Optional
+
+
+class FakeGatewaySocket:
+    """
+    In-process stand-in for the gateway websocket, for tests and local development without a gateway.
+
+        fake = FakeGatewaySocket()
+        stream = GatewayStream(connect=fake.connect)
+        stream.start()
+        fake.push({"topic": "smd+265598", "31": "187.50"})
+
+    Frames pushed with `push` are delivered to the consumer; everything the consumer sends is kept in `sent`.
+    `drop()` closes the current connection so reconnect and re-subscribe logic can be exercised.
+    """
+
+    def __init__(self):
+        self.sent: List[str] = []
+        self.connections = 0
+        self._queue: Optional[asyncio.Queue] = None
+
+    async def connect(self, url: str) -> "FakeGatewaySocket":
+        self.connections += 1
+        self._queue = asyncio.Queue()
+        return self
+
+    def push(self, message: Any) -> None:
+        self._queue.put_nowait(message if isinstance(message, (str, bytes)) else json.dumps(message))
+
+    def drop(self) -> None:
+        self._queue.put_nowait(None)
+
+    async def send_str(self, text: str) -> None:
+        self.sent.append(text)
+
+    async def close(self) -> None:
+        pass
+
+    def __aiter__(self) -> "FakeGatewaySocket":
+        return self
+
+    async def __anext__(self) -> Any:
+        message = await self._queue.get()
+        if message is None:
+            raise StopAsyncIteration
+        return message
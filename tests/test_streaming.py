@@ -0,0 +1,54 @@
+# test_streaming.py
+import asyncio
+import json
+
+from fake_gateway_socket import FakeGatewaySocket
+from mcp_server import streaming
+from mcp_server.quotes import quote_service
+from mcp_server.streaming import GatewayStream
+
+
+async def wait_for(condition, timeout: float = 2.0) -> None:
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not condition():
+        assert asyncio.get_running_loop().time() < deadline, "condition not reached"
+        await asyncio.sleep(0.005)
+
+
+def test_stream_subscribes_decodes_and_resubscribes_after_reconnect(monkeypatch):
+    monkeypatch.setattr(streaming, "MIN_RECONNECT_DELAY", 0.01)
+
+    async def scenario() -> None:
+        fake = FakeGatewaySocket()
+        stream = GatewayStream(url="wss://fake/ws", connect=fake.connect, heartbeat=0.02)
+        stream.start()
+        try:
+            await wait_for(lambda: stream.connected)
+            assert fake.sent[:2] == ["sor+{}", "spl+{}"]
+
+            stream.want_quotes(["265598"], ["31", "84"])
+            topic = 'smd+265598+' + json.dumps({"fields": ["31", "84"]})
+            await wait_for(lambda: topic in fake.sent)
+            assert stream.covers("265598", ["31"])
+
+            fake.push({"topic": "smd+265598", "conid": 265598, "31": "187.50", "84": "187.45"})
+            fake.push({"topic": "sor", "args": [{"orderId": 1, "status": "Submitted"}, {"orderId": 2, "status": "Submitted"}]})
+            fake.push({"topic": "sor", "args": [{"orderId": 2, "status": "Filled"}]})
+            fake.push(b'{"topic": "spl", "args": {"U1.Core": {"dpl": 12.5}}}')
+            await wait_for(lambda: stream.pnl_synced and stream.messages == 4)
+            assert quote_service.get("265598", ["31", "84"], max_age=60)["31"] == 187.5
+            assert list(stream.orders) == ["1"]
+            assert stream.pnl == {"U1.Core": {"dpl": 12.5}}
+            await wait_for(lambda: "tic" in fake.sent)
+
+            sent_before = len(fake.sent)
+            fake.drop()
+            await wait_for(lambda: fake.connections == 2 and stream.connected)
+            assert stream.orders == {} and not stream.orders_synced
+            assert stream.reconnects == 1
+            assert {"sor+{}", "spl+{}", topic} <= set(fake.sent[sent_before:])
+        finally:
+            await stream.stop()
+            await quote_service.stop()
+
+    asyncio.run(scenario())